@@ -1,44 +1,228 @@
+import os
 import streamlit as st
-import requests
 import pandas as pd
+from firebase_client import get_client
+from firebase_async import FirebaseRequestError
+from firebase_stream import FirebaseMirror
+from user_directory import UserDirectory
+from envelope import EnvelopeError, describe, open_text
+from key_store import KeyStore, master_key_path
+from crypto_backends import cpu_features
+from bench_history import BenchHistory, fetch_runs, history_path
+from metrics_panel import enable_metrics, show_metrics_panel
 
 # -------------------------------
 # CONFIG
 # -------------------------------
-FIREBASE_URL = "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app"
-USER_ID = "UID12345"   # Change to test other users if needed
+FIREBASE_URL = os.getenv("FIREBASE_URL", "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app")
+USER_ID = "UID12345"   # user selected on first load; kept live by the streaming mirror
+MIRROR_POLL = 2        # seconds between checks of the mirror for new deltas
 
 # -------------------------------
 # PAGE SETUP
 # -------------------------------
 st.set_page_config(page_title="🔐 AES vs DES Encryption Dashboard", page_icon="🧠", layout="wide")
 st.title("🔐 AES vs DES Encryption & Benchmark Dashboard")
+enable_metrics()
 
 # -------------------------------
 # FETCH FIREBASE DATA
 # -------------------------------
+@st.cache_resource
+def get_mirror():
+    """Background streaming listener; keeps the watched user current without a GET per rerun."""
+    return FirebaseMirror(FIREBASE_URL, [f"users/{USER_ID}"]).start()
+
+
+@st.cache_resource
+def get_directory():
+    """Shared paged user listing and record cache (one per server process)."""
+    return UserDirectory(FIREBASE_URL)
+
+
 def get_firebase_data(user_id):
-    """Fetch AES/DES and benchmark data from Firebase."""
+    """Fetch AES/DES and benchmark data: from the live mirror, else the directory's record cache."""
+    mirror = get_mirror()
+    path = f"users/{user_id}"
+    if mirror.covers(path) and (mirror.is_ready(path) or mirror.wait_ready(timeout=5)):
+        return mirror.get(path)
     try:
-        url = f"{FIREBASE_URL}/users/{user_id}.json"
-        res = requests.get(url)
-        if res.status_code == 200:
-            return res.json()
-        else:
-            st.error(f"⚠️ Firebase returned status code {res.status_code}")
-            return None
+        return get_directory().get(user_id)
+    except FirebaseRequestError as e:
+        st.error(f"⚠️ Firebase returned status code {e.status}")
+        return None
     except Exception as e:
         st.error(f"❌ Error fetching data: {e}")
         return None
 
 
+@st.cache_resource
+def get_history():
+    """Local benchmark history; when there is none, the runs mirrored to Firebase."""
+    path = history_path(create=False)
+    if os.path.exists(path):
+        return BenchHistory(path)
+    history = BenchHistory(":memory:")
+    try:
+        history.import_runs(fetch_runs(get_client(FIREBASE_URL)))
+    except Exception as e:
+        st.warning(f"⚠️ No local benchmark history and Firebase runs could not be loaded: {e}")
+    return history
+
+
+def latest_legacy_ms(history, user_data):
+    """(AES_ms, DES_ms) for 1000 round trips: the user's own stored result, else the latest recorded run."""
+    bench = (user_data or {}).get("benchmark") or {}
+    if bench.get("AES_ms") is not None and bench.get("DES_ms") is not None:
+        return bench["AES_ms"], bench["DES_ms"]
+    times = {}
+    for algorithm in ("AES", "DES"):
+        trend = history.trend(f"{algorithm}/roundtrip")
+        if trend:
+            times[algorithm] = trend[-1]["mean_ns"] * 1000 / 1e6
+    return times.get("AES"), times.get("DES")
+
+
+@st.cache_data(ttl=300, show_spinner="Reading benchmark results of every user...")
+def user_benchmarks():
+    """One row per user with a stored benchmark (only that field is fetched)."""
+    return pd.DataFrame([dict(bench, uid=uid) for uid, bench in get_directory().benchmarks()])
+
+
+def envelope_label(text):
+    if not text:
+        return ""
+    header = describe(text)
+    return f"{header.algorithm}-{header.mode} · {len(text)} B" if header else f"legacy · {len(text)} B"
+
+
+def user_rows(records):
+    """Summary table rows for one page of user records."""
+    rows = []
+    for uid, rec in records.items():
+        rec = rec if isinstance(rec, dict) else {}
+        bench = rec.get("benchmark") or {}
+        rows.append({
+            "uid": uid,
+            "AES": envelope_label(rec.get("portfolio_AES")),
+            "DES": envelope_label(rec.get("portfolio_DES")),
+            "holdings": len(rec.get("holdings_AES") or {}),
+            "AES_ms": bench.get("AES_ms"),
+            "DES_ms": bench.get("DES_ms"),
+        })
+    return pd.DataFrame(rows).set_index("uid") if rows else pd.DataFrame()
+
+
+@st.cache_resource
+def get_key_store():
+    """Per-user key store; None when this host has no master secret (nothing to decrypt with).
+
+    KeyStore() would generate a fresh master key, which can never decrypt existing data.
+    """
+    if not (os.getenv("MASTER_KEY") or os.path.exists(master_key_path(create=False))):
+        return None
+    try:
+        return KeyStore()
+    except Exception:
+        return None
+
+
+def decrypt_portfolio(text, user_id):
+    """Plaintext of a stored envelope using the user's derived key, or None."""
+    header = describe(text) if text else None
+    keys = get_key_store()
+    if not (header and keys):
+        return None
+    try:
+        return open_text(keys.resolver(user_id, header.algorithm), text).decode()
+    except (ValueError, KeyError, EnvelopeError):   # wrong key, unknown key version, corrupt envelope
+        return None
+
+
+def show_ciphertext(text, user_id=None):
+    """Show stored ciphertext plus its envelope header; decrypt it if the user's key is derivable."""
+    if not text:
+        st.code("N/A", language="text")
+        return
+    st.code(text[:200] + ("..." if len(text) > 200 else ""), language="text")
+    header = describe(text)
+    if not header:
+        st.caption("Legacy base64 ciphertext")
+        return
+    st.caption(f"Envelope v{header.version} · {header.algorithm}-{header.mode} · "
+               f"compression: {header.compression or 'none'} · "
+               f"{'' if header.key_version is None else f'key v{header.key_version} · '}"
+               f"{header.original_length} B plaintext → {len(text)} B stored")
+    if user_id:
+        plaintext = decrypt_portfolio(text, user_id)
+        if plaintext is None:
+            st.caption("🔒 Not decryptable with this host's key store")
+        else:
+            st.write(f"🔓 Decrypted: `{plaintext[:200]}`")
+
+
+# -------------------------------
+# USERS (lazy listing, paged concurrent fetches)
+# -------------------------------
+directory = get_directory()
+try:
+    uids = directory.uids()
+except Exception as e:
+    st.error(f"❌ Could not list users: {e}")
+    uids = []
+
+# everything below pages the listing fetched above, so an unreachable Firebase means an empty sidebar
+page_size = directory.page_size
+page_count = max(1, -(-len(uids) // page_size))
+st.sidebar.header("👥 Users")
+st.sidebar.caption(f"{len(uids)} users")
+prefix = st.sidebar.text_input("Search uid prefix", "")
+if prefix:
+    candidates = directory.search(prefix) if uids else []
+    page = 0
+else:
+    page = st.sidebar.number_input("Page", min_value=1, max_value=page_count, value=1) - 1
+    candidates = uids[page * page_size:(page + 1) * page_size]
+    if page + 1 < page_count:
+        directory.prefetch(uids[(page + 1) * page_size:(page + 2) * page_size])
+page_uids = candidates
+if USER_ID in uids and USER_ID not in candidates:
+    candidates = [USER_ID] + candidates
+selected = st.sidebar.selectbox("User", candidates) if candidates else USER_ID
+if st.sidebar.button("🔄 Refresh"):
+    directory.invalidate()
+    try:
+        directory.uids(refresh=True)
+    except Exception as e:
+        st.error(f"❌ Could not list users: {e}")
+
+with st.expander(f"📋 Users — page {page + 1} of {page_count}", expanded=False):
+    st.dataframe(user_rows(directory.fetch(page_uids)), use_container_width=True)
+
+# -------------------------------
+# LIVE UPDATES (rerun when the mirrored user changes)
+# -------------------------------
+@st.fragment(run_every=MIRROR_POLL)
+def watch_mirror(user_id):
+    """Cheap version check on a timer; the page reruns only when the mirror applied a delta."""
+    mirror = get_mirror()
+    if not mirror.covers(f"users/{user_id}"):
+        return
+    version = mirror.version
+    if st.session_state.setdefault("mirror_version", version) != version:
+        st.session_state.mirror_version = version
+        st.rerun()
+
+
+watch_mirror(selected)
+
 # -------------------------------
 # DISPLAY DATA
 # -------------------------------
-data = get_firebase_data(USER_ID)
+data = get_firebase_data(selected)
 
 if data:
-    st.success(f"✅ Data successfully fetched for user `{USER_ID}`")
+    st.success(f"✅ Data successfully fetched for user `{selected}`")
     st.markdown("---")
 
     # ========== BASIC DISPLAY ==========
@@ -47,24 +231,24 @@ if data:
 
     with col1:
         st.markdown("**Plaintext Portfolio**")
-        st.code("BTC=0.25, ETH=1.5", language="text")
+        plaintext = (decrypt_portfolio(data.get("portfolio_AES"), selected)
+                     or decrypt_portfolio(data.get("portfolio_DES"), selected))
+        st.code(plaintext or "🔒 not decryptable on this host", language="text")
 
     with col2:
         st.markdown("**AES Encrypted (from Firebase)**")
-        st.code(data.get("portfolio_AES", "N/A"), language="text")
+        show_ciphertext(data.get("portfolio_AES"), selected)
 
     with col3:
         st.markdown("**DES Encrypted (from Firebase)**")
-        st.code(data.get("portfolio_DES", "N/A"), language="text")
+        show_ciphertext(data.get("portfolio_DES"), selected)
 
     st.markdown("---")
 
     # ========== BENCHMARK RESULTS ==========
     st.subheader("⏱️ Encryption Time Benchmark (1000 cycles)")
-    bench = data.get("benchmark", {})
-
-    aes_time = bench.get("AES_ms", None)
-    des_time = bench.get("DES_ms", None)
+    history = get_history()
+    aes_time, des_time = latest_legacy_ms(history, data)
 
     if aes_time is not None and des_time is not None:
         c1, c2 = st.columns(2)
@@ -88,12 +272,21 @@ if data:
         faster = "AES" if aes_time < des_time else "DES"
         slower = "DES" if aes_time < des_time else "AES"
         ratio = round(max(aes_time, des_time) / min(aes_time, des_time), 2)
+        cpu = cpu_features()
+        if cpu["aes_hw"] is None:
+            hw_note = "Could not read this host's CPU flags, so AES hardware support is unknown."
+        elif cpu["aes_hw"]:
+            hw_note = (f"This host (`{cpu['cpu'] or cpu['machine']}`) has **AES instructions**"
+                       f"{' and **carry-less multiply** (fast GCM)' if cpu['clmul_hw'] else ''}, "
+                       "which PyCryptodome and OpenSSL use automatically.")
+        else:
+            hw_note = "This host has **no AES instructions**, so AES runs in software here."
 
         st.markdown(f"""
         - ✅ **{faster}** performed faster than **{slower}** by roughly **{ratio}×**.
         - AES uses **128-bit keys**, offering much stronger security.
         - DES (56-bit effective key) is **outdated** and vulnerable to brute-force attacks.
-        - AES’s efficiency improves with modern CPU hardware and optimized libraries.
+        - {hw_note} Compare backends with `python crypto_firebase_benchmark.py --backends`.
         """)
 
     else:
@@ -102,6 +295,64 @@ if data:
 else:
     st.error("❌ Could not load Firebase data. Check your Firebase URL or internet connection.")
 
+# -------------------------------
+# AGGREGATES ACROSS USERS AND HOSTS
+# -------------------------------
+st.markdown("---")
+st.subheader("🌐 Benchmarks Across Users & Hosts")
+if st.toggle("Aggregate over every user (one small GET per user)", value=False):
+    per_user = user_benchmarks()
+    if per_user.empty:
+        st.info("No user has a stored benchmark.")
+    else:
+        cols = [c for c in ("AES_ms", "DES_ms") if c in per_user]
+        st.dataframe(per_user[cols].describe(percentiles=[0.5, 0.95]).T)
+        st.bar_chart(per_user.set_index("uid")[cols])
+
+by_host = pd.DataFrame([dict(row, algorithm=alg) for alg in ("AES", "DES")
+                        for row in get_history().trend(f"{alg}/roundtrip")])
+if not by_host.empty:
+    by_host["ms_per_1000"] = by_host["mean_ns"] * 1000 / 1e6
+    st.dataframe(by_host.groupby(["host", "algorithm"])["ms_per_1000"]
+                 .agg(["count", "median", "min", "max"]).round(2))
+
+# -------------------------------
+# BENCHMARK HISTORY
+# -------------------------------
+st.markdown("---")
+st.subheader("📈 Benchmark History & Regressions")
+history = get_history()
+hosts = history.hosts()
+
+if hosts:
+    host = st.selectbox("Host", hosts)
+    regressions = history.regressions(host)
+    if regressions:
+        st.error(f"🚨 {len(regressions)} statistically significant slowdown(s) in the latest run")
+        st.dataframe(pd.DataFrame(regressions)[["series", "size_bytes", "previous_p50_ns", "latest_p50_ns",
+                                                "slowdown_pct", "p_value"]])
+    else:
+        st.success("✅ No significant slowdowns between the last two runs of any series")
+
+    series = history.series(host)
+    names = sorted({name for name, _ in series})
+    chosen = st.multiselect("Series", names, default=names[:2])
+    sizes = sorted({size for name, size in series if name in chosen and size is not None})
+    size = st.selectbox("Payload size (bytes)", sizes) if sizes else None
+    trend = pd.DataFrame([dict(row, series=name) for name in chosen for row in history.trend(name, size, host)])
+    if not trend.empty:
+        trend["timestamp"] = pd.to_datetime(trend["timestamp"])
+        trend["p50_us"] = trend["p50_ns"] / 1000
+        st.line_chart(trend.pivot_table(index="timestamp", columns="series", values="p50_us"), y_label="p50 (µs)")
+else:
+    st.info("No benchmark runs recorded yet. Run `crypto_firebase_benchmark.py` (any mode) first.")
+
+# -------------------------------
+# LIVE PERFORMANCE
+# -------------------------------
+st.markdown("---")
+show_metrics_panel()
+
 # -------------------------------
 # FOOTER
 # -------------------------------
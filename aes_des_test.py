@@ -1,45 +1,31 @@
-from Crypto.Cipher import AES, DES
-from Crypto.Random import get_random_bytes
+from crypto_core import new_key, encrypt_bytes, decrypt_bytes
 import base64, time
 
-# Padding function (DES needs 8-byte multiples, AES needs 16-byte multiples)
-def pad(data, block_size):
-    padding_len = block_size - len(data) % block_size
-    return data + chr(padding_len) * padding_len
-
-def unpad(data):
-    padding_len = ord(data[-1])
-    return data[:-padding_len]
-
 # Test string
-plaintext = "BTC=0.25, ETH=1.5"
+plaintext = b"BTC=0.25, ETH=1.5"
 
 # --- AES Test ---
-key_aes = get_random_bytes(16)   # AES requires 16 bytes = 128-bit key
-cipher_aes = AES.new(key_aes, AES.MODE_ECB) # create AES cipher in ECB mode
+key_aes = new_key("AES")   # AES requires 16 bytes = 128-bit key
 
 start = time.time() # start timer
-ciphertext_aes = cipher_aes.encrypt(pad(plaintext, 16).encode()) # encrypt padded text
+ciphertext_aes = encrypt_bytes("AES", key_aes, plaintext) # pad + encrypt in ECB mode (timed as crypto.encrypt)
 end = time.time() # stop timer
 
 print("AES Encrypted:", base64.b64encode(ciphertext_aes).decode()) # print cipher text (base64)
 print("AES Time:", (end - start) * 1000, "ms") # print time taken
 
-decipher_aes = AES.new(key_aes, AES.MODE_ECB)
-decrypted_aes = unpad(decipher_aes.decrypt(ciphertext_aes).decode())
+decrypted_aes = decrypt_bytes("AES", key_aes, ciphertext_aes).decode() # decrypt + unpad (timed as crypto.decrypt)
 print("AES Decrypted:", decrypted_aes)
 
 # --- DES Test ---
-key_des = get_random_bytes(8)   # DES is 8 bytes = 64-bit key
-cipher_des = DES.new(key_des, DES.MODE_ECB)
+key_des = new_key("DES")   # DES is 8 bytes = 64-bit key
 
 start = time.time()
-ciphertext_des = cipher_des.encrypt(pad(plaintext, 8).encode())
+ciphertext_des = encrypt_bytes("DES", key_des, plaintext)
 end = time.time()
 
 print("\nDES Encrypted:", base64.b64encode(ciphertext_des).decode())
 print("DES Time:", (end - start) * 1000, "ms")
 
-decipher_des = DES.new(key_des, DES.MODE_ECB)
-decrypted_des = unpad(decipher_des.decrypt(ciphertext_des).decode())
+decrypted_des = decrypt_bytes("DES", key_des, ciphertext_des).decode()
 print("DES Decrypted:", decrypted_des)
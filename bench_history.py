@@ -0,0 +1,220 @@
+import json
+import math
+import os
+import sqlite3
+import statistics
+import uuid
+from datetime import datetime, timezone
+from data_dir import data_path
+
+# -------------------
+# CONFIG
+# -------------------
+HISTORY_DB = os.getenv("BENCH_HISTORY")   # default: history_path() under the per-user data directory
+FIREBASE_PATH = "benchmarks/runs"     # dedicated tree; never under users/
+ALPHA = 0.01                          # one-sided significance level for a slowdown
+MIN_SLOWDOWN = 0.05                   # ...and the median must be at least 5% slower
+MIN_SAMPLES = 5                       # below this a rank test says nothing
+
+# fields of a result row that identify a comparable series, in display order
+SERIES_FIELDS = ("backend", "workload", "scheme", "algorithm", "kdf", "direction", "key_state")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id    TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    host      TEXT,
+    kind      TEXT,
+    meta      TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id     TEXT NOT NULL REFERENCES runs(run_id),
+    series     TEXT NOT NULL,
+    size_bytes INTEGER,
+    p50_ns     REAL,
+    p95_ns     REAL,
+    p99_ns     REAL,
+    mean_ns    REAL,
+    stdev_ns   REAL,
+    mb_per_s   REAL,
+    samples    TEXT
+);
+CREATE INDEX IF NOT EXISTS results_series ON results(series, size_bytes);
+"""
+
+
+def series_key(row):
+    """Stable name for what a result row measured, e.g. "AES/encrypt/warm"."""
+    return "/".join(str(row[f]) for f in SERIES_FIELDS if row.get(f) is not None)
+
+
+def new_run_id(timestamp=None):
+    """Sortable id that is also a valid Firebase key (no . $ # [ ] /)."""
+    ts = datetime.fromisoformat(timestamp) if timestamp else datetime.now(timezone.utc)
+    return f"{ts.strftime('%Y%m%dT%H%M%S%fZ')}-{uuid.uuid4().hex[:6]}"
+
+
+# -------------------
+# Statistics
+# -------------------
+def mann_whitney_greater(before, after):
+    """One-sided p-value that `after` tends to be larger (slower) than `before`.
+
+    Mann-Whitney U with the normal approximation and tie correction. It makes no
+    normality assumption, which suits skewed latency samples.
+    """
+    n1, n2 = len(before), len(after)
+    pooled = sorted([(v, 0) for v in before] + [(v, 1) for v in after])
+    ranks, ties, i = [0.0] * len(pooled), 0.0, 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    rank_after = sum(r for r, (_, group) in zip(ranks, pooled) if group)
+    u = rank_after - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return 1 - statistics.NormalDist().cdf(z)
+
+
+def history_path(create=True):
+    """BENCH_HISTORY, else benchmark_history.sqlite3 in the data directory (resolved on use)."""
+    return HISTORY_DB or data_path("benchmark_history.sqlite3", create)
+
+
+# -------------------
+# Store
+# -------------------
+class BenchHistory:
+    """Append-only benchmark history in SQLite: one runs row per invocation,
+    one results row per (series, payload size), raw samples kept for testing."""
+
+    def __init__(self, path=None):
+        path = path or history_path()
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- writes ----
+    def record(self, meta, results, kind="sweep", run_id=None):
+        """Append one run; returns its run_id."""
+        run_id = run_id or new_run_id(meta.get("timestamp"))
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+                (run_id, meta["timestamp"], meta.get("host"), kind, json.dumps(meta)))
+            self.conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, series_key(r), r.get("size_bytes"), r.get("p50_ns"), r.get("p95_ns"), r.get("p99_ns"),
+                  r.get("mean_ns"), r.get("stdev_ns"), r.get("mb_per_s"), json.dumps(r.get("samples_ns") or []))
+                 for r in results])
+        return run_id
+
+    def import_runs(self, runs):
+        """Load runs mirrored to Firebase ({run_id: {"kind", "meta", "results"}}), skipping known ids."""
+        known = {row[0] for row in self.conn.execute("SELECT run_id FROM runs")}
+        for run_id, run in sorted((runs or {}).items()):
+            if run_id not in known:
+                self.record(run["meta"], run.get("results") or [], run.get("kind", "sweep"), run_id)
+
+    # ---- reads ----
+    def runs(self, host=None, limit=None):
+        sql = "SELECT run_id, timestamp, host, kind FROM runs"
+        args = []
+        if host:
+            sql += " WHERE host = ?"
+            args.append(host)
+        sql += " ORDER BY timestamp DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def hosts(self):
+        return [r[0] for r in self.conn.execute("SELECT DISTINCT host FROM runs ORDER BY host")]
+
+    def series(self, host=None):
+        """[(series, size_bytes)] that have at least one result."""
+        sql = "SELECT DISTINCT series, size_bytes FROM results JOIN runs USING (run_id)"
+        args = []
+        if host:
+            sql += " WHERE host = ?"
+            args.append(host)
+        return [tuple(r) for r in self.conn.execute(sql + " ORDER BY series, size_bytes", args)]
+
+    def trend(self, series, size_bytes=None, host=None):
+        """Time-ordered summary rows for one series (optionally one size and host)."""
+        sql = ("SELECT run_id, timestamp, host, size_bytes, p50_ns, p95_ns, p99_ns, mean_ns, mb_per_s"
+               " FROM results JOIN runs USING (run_id) WHERE series = ?")
+        args = [series]
+        if size_bytes is not None:
+            sql += " AND size_bytes = ?"
+            args.append(size_bytes)
+        if host:
+            sql += " AND host = ?"
+            args.append(host)
+        return [dict(r) for r in self.conn.execute(sql + " ORDER BY timestamp", args)]
+
+    def _samples(self, series, size_bytes, host):
+        sql = ("SELECT run_id, timestamp, samples, p50_ns FROM results JOIN runs USING (run_id)"
+               " WHERE series = ? AND size_bytes IS ? AND host IS ? ORDER BY timestamp DESC LIMIT 2")
+        return [(r["run_id"], r["timestamp"], json.loads(r["samples"]), r["p50_ns"])
+                for r in self.conn.execute(sql, (series, size_bytes, host))]
+
+    def regressions(self, host=None, alpha=ALPHA, min_slowdown=MIN_SLOWDOWN):
+        """Series whose latest run is significantly slower than the run before it on the same host.
+
+        A regression needs both a one-sided Mann-Whitney p < alpha on the raw
+        samples and a median slowdown of at least min_slowdown, so tiny but
+        "significant" shifts on quiet machines are not flagged.
+        """
+        found = []
+        for h in ([host] if host else self.hosts()):
+            for series, size in self.series(h):
+                pair = self._samples(series, size, h)
+                if len(pair) < 2:
+                    continue
+                (new_id, new_ts, new, new_p50), (old_id, old_ts, old, old_p50) = pair
+                if len(new) < MIN_SAMPLES or len(old) < MIN_SAMPLES or not old_p50:
+                    continue
+                slowdown = new_p50 / old_p50 - 1
+                if slowdown < min_slowdown:
+                    continue
+                p = mann_whitney_greater(old, new)
+                if p < alpha:
+                    found.append({
+                        "host": h, "series": series, "size_bytes": size,
+                        "previous_run": old_id, "latest_run": new_id,
+                        "previous_p50_ns": old_p50, "latest_p50_ns": new_p50,
+                        "slowdown_pct": round(100 * slowdown, 1), "p_value": p,
+                    })
+        return sorted(found, key=lambda r: -r["slowdown_pct"])
+
+
+# -------------------
+# Firebase mirror
+# -------------------
+def mirror_run(client, run_id, meta, results, kind="sweep", path=FIREBASE_PATH):
+    """PUT one run under path/run_id (a dedicated tree, so user data is never touched)."""
+    client.put(f"{path}/{run_id}", {"kind": kind, "meta": meta, "results": results})
+
+
+def fetch_runs(client, path=FIREBASE_PATH):
+    return client.get(path) or {}
@@ -0,0 +1,372 @@
+import argparse
+import base64
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from itertools import islice, tee, zip_longest
+from Crypto.Random import get_random_bytes
+from crypto_core import BLOCK_SIZES, CIPHERS, encrypt_bytes, decrypt_bytes, new_key
+from envelope import MODES, key_version, open_value, seal_value
+from key_store import KeyStore
+
+# -------------------
+# CONFIG
+# -------------------
+DB_FILE = "POC_Database.json"
+CHUNK_SIZE = 256                      # records per task sent to a worker
+SEGMENT_SIZE = 4 * 1024 * 1024        # bytes per CTR segment for one large payload
+PORTFOLIO = "BTC=0.25, ETH=1.5"
+
+
+# -------------------
+# Input helpers
+# -------------------
+def record_plaintext(value):
+    """Plaintext for one user record: strings as-is, anything else as compact JSON."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"), sort_keys=True)
+
+
+def load_users(path=DB_FILE):
+    """Return the `users` map from a Firebase export such as POC_Database.json."""
+    with open(path) as f:
+        return json.load(f).get("users", {})
+
+
+def iter_jsonl(source, field=None):
+    """Yield (uid, value) from JSON lines of {"uid": ..., "portfolio": ...}.
+
+    source is a path or an open text file, read line by line, so millions of
+    records never sit in memory at once. value is the record's portfolio (the
+    whole record if it has none), or record[field] when field is given, e.g. a
+    stored ciphertext to decrypt.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source) as f:
+            yield from iter_jsonl(f, field)
+        return
+    for line in source:
+        line = line.strip()
+        if line:
+            rec = json.loads(line)
+            yield rec["uid"], rec.get(field) if field else rec.get("portfolio", rec)
+
+
+def synthetic_users(count):
+    """Yield `count` fake (uid, portfolio) pairs for load and scaling runs."""
+    for i in range(count):
+        yield f"UID{i:08d}", f"{PORTFOLIO}, SOL={i % 97}.{i % 10}"
+
+
+def prepared(records, store, batch=CHUNK_SIZE):
+    """Pass records through, creating key-store metadata for each batch of new uids
+    just before it is used: one transaction per batch, without listing every uid up front."""
+    for chunk in chunked(records, batch):
+        store.prepare(uid for uid, _ in chunk)
+        yield from chunk
+
+
+def chunked(records, size):
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# -------------------
+# Worker functions (top level so they pickle)
+# -------------------
+def _as_pair(resolved):
+    """(key, key version) from a key callable's result."""
+    return resolved if isinstance(resolved, tuple) else (resolved, None)
+
+
+def _record_key(key, own):
+    """The shared key, or the (key[, key version]) a per-user record carries."""
+    if key is not None:
+        return key, None
+    return own[0], own[1] if len(own) > 1 else None
+
+
+def _encrypt_chunk(args):
+    algorithm, key, chunk, mode = args
+    out = []
+    for uid, value, *own in chunk:
+        k, version = _record_key(key, own)
+        if mode is None:
+            out.append((uid, base64.b64encode(encrypt_bytes(algorithm, k, value)).decode()))
+        else:
+            out.append((uid, seal_value(algorithm, k, value, mode=mode, key_version=version)))
+    return out
+
+
+def _decrypt_chunk(args):
+    algorithm, key, chunk, envelope = args
+    out = []
+    for uid, stored, *own in chunk:
+        k, _ = _record_key(key, own)
+        try:
+            if envelope:
+                value = open_value(k, stored)
+            else:
+                value = decrypt_bytes(algorithm, k, base64.b64decode(stored)).decode()
+        except (ValueError, TypeError):   # wrong key, corrupt or missing ciphertext
+            value = None
+        out.append((uid, value))
+    return out
+
+
+def _tasks(records, key, algorithm, chunk_size, option, versioned=False):
+    """Worker tasks; a callable key is resolved here in the parent, so the derived-key
+    cache is shared by every chunk. It returns a key or, like KeyStore.keyring(), a
+    (key, key version) pair; versioned passes it the version each stored envelope names."""
+    if callable(key):
+        key_for, key = key, None
+
+        def resolve(uid, value):
+            if versioned and isinstance(value, str):
+                return _as_pair(key_for(uid, key_version(value)))
+            return _as_pair(key_for(uid))
+        records = ((uid, value, *resolve(uid, value)) for uid, value in records)
+    return ((algorithm, key, chunk, option) for chunk in chunked(records, chunk_size))
+
+
+def _ctr_segment(args):
+    """Encrypt one segment of a shared-memory buffer in place; only offsets cross the process boundary."""
+    algorithm, key, nonce, name, offset, length = args
+    module = CIPHERS[algorithm]
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[offset:offset + length]
+        module.new(key, module.MODE_CTR, nonce=nonce,
+                   initial_value=offset // BLOCK_SIZES[algorithm]).encrypt(view, output=view)
+        view.release()
+    finally:
+        shm.close()
+    return length
+
+
+def parallel_map(fn, tasks, workers):
+    """Ordered map over a process pool keeping at most 2*workers tasks in flight."""
+    if workers <= 1:
+        for task in tasks:
+            yield fn(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# -------------------
+# Bulk record API
+# -------------------
+def encrypt_records(records, key, algorithm="AES", workers=None, chunk_size=CHUNK_SIZE, mode=None):
+    """Yield (uid, ciphertext) for an iterable of (uid, plaintext) pairs.
+
+    key is one key for every record, a uid -> key or (key, key version) callable
+    (e.g. KeyStore.keyring()), or None when each
+    record carries its own as (uid, plaintext, key[, key version]). Without a
+    mode the ciphertext is legacy base64 ECB of a string; with one it is an
+    envelope (envelope.seal_value) of a string or any JSON value.
+    """
+    workers = workers or os.cpu_count() or 1
+    for result in parallel_map(_encrypt_chunk, _tasks(records, key, algorithm, chunk_size, mode), workers):
+        yield from result
+
+
+def decrypt_records(records, key, algorithm="AES", workers=None, chunk_size=CHUNK_SIZE, envelope=False):
+    """Yield (uid, plaintext) for an iterable of (uid, ciphertext) pairs; keys as for
+    encrypt_records (a callable is given the key version each envelope names). A record
+    that cannot be decrypted (wrong key, corrupt or missing ciphertext) yields None."""
+    workers = workers or os.cpu_count() or 1
+    tasks = _tasks(records, key, algorithm, chunk_size, envelope, versioned=envelope)
+    for result in parallel_map(_decrypt_chunk, tasks, workers):
+        yield from result
+
+
+def encrypt_users(users, key, algorithm="AES", workers=None, chunk_size=CHUNK_SIZE):
+    """Encrypt a whole users map; returns {uid: {"portfolio_<ALG>": ciphertext}}."""
+    records = ((uid, record_plaintext(value)) for uid, value in users.items())
+    field = f"portfolio_{algorithm}"
+    return {uid: {field: ct} for uid, ct in encrypt_records(records, key, algorithm, workers, chunk_size)}
+
+
+# -------------------
+# Counter-mode segmented encryption of one large payload
+# -------------------
+def ctr_crypt(data, key, nonce, algorithm="AES", workers=None, segment_size=SEGMENT_SIZE):
+    """Encrypt (or decrypt, CTR is symmetric) one large buffer in parallel segments.
+
+    Each segment starts its keystream at the block counter it would have reached
+    in a single pass, so the output is identical to a serial CTR encryption.
+    The input is copied once into shared memory and workers encrypt their
+    segments there in place; with one worker, or a payload of at most one
+    segment, it is a single serial pass.
+    """
+    block = BLOCK_SIZES[algorithm]
+    if segment_size % block:
+        raise ValueError(f"segment_size must be a multiple of {block}")
+    workers = workers or os.cpu_count() or 1
+    size = len(memoryview(data).cast("B"))
+    if workers <= 1 or size <= segment_size:
+        module = CIPHERS[algorithm]
+        return module.new(key, module.MODE_CTR, nonce=nonce, initial_value=0).encrypt(data)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        shm.buf[:size] = memoryview(data).cast("B")
+        tasks = ((algorithm, key, nonce, shm.name, offset, min(segment_size, size - offset))
+                 for offset in range(0, size, segment_size))
+        for _ in parallel_map(_ctr_segment, tasks, min(workers, -(-size // segment_size))):
+            pass
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def new_ctr_nonce(algorithm="AES"):
+    """Half a block of nonce; the other half is the block counter."""
+    return get_random_bytes(BLOCK_SIZES[algorithm] // 2)
+
+
+# -------------------
+# Scaling report
+# -------------------
+def measure(records, key, algorithm, workers, chunk_size, mode=None):
+    """Encrypt then decrypt `records`; return throughput numbers for one worker count.
+    With a mode the records are sealed as envelopes (see encrypt_records)."""
+    records = list(records)
+    start = time.perf_counter()
+    encrypted = list(encrypt_records(records, key, algorithm, workers, chunk_size, mode=mode))
+    enc_s = time.perf_counter() - start
+    start = time.perf_counter()
+    decrypted = list(decrypt_records(encrypted, key, algorithm, workers, chunk_size, envelope=mode is not None))
+    dec_s = time.perf_counter() - start
+    if decrypted != records:
+        raise ValueError("Round trip mismatch")
+    return {
+        "workers": workers,
+        "records": len(records),
+        "encrypt_s": round(enc_s, 4),
+        "decrypt_s": round(dec_s, 4),
+        "encrypt_records_per_s": round(len(records) / enc_s, 1),
+        "decrypt_records_per_s": round(len(records) / dec_s, 1),
+    }
+
+
+def measure_stream(records, key, algorithm="AES", workers=None, chunk_size=CHUNK_SIZE, mode=None):
+    """Stream records through encrypt_records and straight back through decrypt_records,
+    checking each against its input.
+
+    Only the chunks in flight are held in memory, so this works for inputs of any
+    size; the encrypt and decrypt pools run side by side, so the figure is round-trip
+    throughput rather than separate encrypt/decrypt rates.
+    """
+    originals, inputs = tee(records)
+    start = time.perf_counter()
+    encrypted = encrypt_records(inputs, key, algorithm, workers, chunk_size, mode=mode)
+    decrypted = decrypt_records(encrypted, key, algorithm, workers, chunk_size, envelope=mode is not None)
+    count = 0
+    for expected, got in zip_longest(originals, decrypted):
+        if expected != got:
+            raise ValueError(f"Round trip mismatch for {(expected or got)[0]}")
+        count += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "workers": workers or os.cpu_count() or 1,
+        "records": count,
+        "roundtrip_s": round(elapsed, 4),
+        "roundtrip_records_per_s": round(count / elapsed, 1) if elapsed else None,
+    }
+
+
+def scaling_report(records, key, algorithm="AES", worker_counts=None, chunk_size=CHUNK_SIZE, mode=None):
+    """Throughput per worker count plus speedup relative to one worker."""
+    records = list(records)
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    rows = [measure(records, key, algorithm, w, chunk_size, mode) for w in worker_counts]
+    base = rows[0]["encrypt_records_per_s"]
+    for row in rows:
+        row["speedup"] = round(row["encrypt_records_per_s"] / base, 2)
+    return rows
+
+
+# -------------------
+# MAIN
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk multi-core portfolio encryption")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=DB_FILE, help="Firebase export with a users map")
+    source.add_argument("--jsonl", help="JSON-lines file of {uid, portfolio} records")
+    source.add_argument("--synthetic", type=int, help="generate N fake users")
+    parser.add_argument("--algorithm", default="AES", choices=sorted(CIPHERS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--scaling", action="store_true",
+                        help="report throughput for 1..N workers (in-memory: every record is held for the "
+                             "repeated passes)")
+    parser.add_argument("--ctr-mb", type=int, help="also time segmented CTR over one payload of this many MB")
+    parser.add_argument("--per-user-keys", action="store_true",
+                        help="derive each user's key from the local key store instead of one random key; "
+                             "records are then sealed as envelopes naming the key version")
+    parser.add_argument("--mode", choices=sorted(MODES),
+                        help="seal records as envelopes in this mode (default: legacy base64 ECB records, "
+                             "or ECB envelopes with --per-user-keys)")
+    args = parser.parse_args(argv)
+    mode = args.mode or ("ECB" if args.per_user_keys else None)
+
+    def source():
+        """A fresh pass over the input; jsonl and synthetic records are generated lazily,
+        and per-user key metadata is created batch by batch as they stream past."""
+        if args.synthetic:
+            records = synthetic_users(args.synthetic)
+        elif args.jsonl:
+            records = ((uid, record_plaintext(v)) for uid, v in iter_jsonl(args.jsonl))
+        else:
+            records = ((uid, record_plaintext(v)) for uid, v in load_users(args.db).items())
+        return prepared(records, store) if args.per_user_keys else records
+
+    key = new_key(args.algorithm)
+    if args.per_user_keys:
+        store = KeyStore()
+        keyring = store.keyring(args.algorithm)
+
+    if args.scaling:   # in-memory mode: repeated passes per worker count need every record
+        for row in scaling_report(list(source()), keyring if args.per_user_keys else key, args.algorithm,
+                                  chunk_size=args.chunk_size, mode=mode):
+            print(json.dumps(row))
+    else:
+        print(json.dumps(measure_stream(source(), keyring if args.per_user_keys else key, args.algorithm,
+                                        args.workers, args.chunk_size, mode)))
+    if args.per_user_keys:
+        print(json.dumps({"key_cache": store.cache.stats()}))
+
+    if args.ctr_mb:
+        payload = (PORTFOLIO.encode() * (args.ctr_mb * 1024 * 1024 // len(PORTFOLIO) + 1))[:args.ctr_mb * 1024 * 1024]
+        nonce = new_ctr_nonce(args.algorithm)
+        for workers in (1, args.workers):
+            start = time.perf_counter()
+            ct = ctr_crypt(payload, key, nonce, args.algorithm, workers)
+            elapsed = time.perf_counter() - start
+            if ctr_crypt(ct, key, nonce, args.algorithm, workers) != payload:
+                raise ValueError("CTR round trip mismatch")
+            print(json.dumps({"ctr_workers": workers, "mb": args.ctr_mb,
+                              "mb_per_s": round(args.ctr_mb / elapsed, 1)}))
+
+
+if __name__ == "__main__":
+    main()
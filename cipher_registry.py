@@ -0,0 +1,282 @@
+from abc import ABC, abstractmethod
+from Crypto.Cipher import AES, ChaCha20_Poly1305
+from Crypto.Random import get_random_bytes
+from crypto_core import (BLOCK_SIZES, CIPHERS, KEY_SIZES, StreamDecryptor, StreamEncryptor, get_cipher, new_key,
+                         pad, to_bytes, unpad)
+
+# -------------------
+# Schemes
+# -------------------
+# Every scheme exposes the same calls:
+#   encrypt(key, plaintext, nonce=None) -> (nonce, ciphertext)   ciphertext includes the tag for AEAD
+#   decrypt(key, nonce, ciphertext)     -> plaintext
+#   seal(key, plaintext) / open(key, blob) for a self-contained nonce || ciphertext blob
+# Only ECB cipher objects are stateless, so only ECB goes through the shared
+# CipherCache; CBC/CTR/GCM/ChaCha20 objects carry per-message state (IV, counter,
+# MAC) and are built fresh for each message.
+
+
+class _CipherStream:
+    """update/finalize wrapper for ciphers that need no padding (CTR)."""
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def update(self, chunk):
+        return self._fn(to_bytes(chunk))
+
+    def finalize(self):
+        return b""
+
+
+class _AEADEncryptStream:
+    """Ciphertext from update(); finalize() returns the tag, which goes after it."""
+
+    def __init__(self, cipher):
+        self._cipher = cipher
+
+    def update(self, chunk):
+        return self._cipher.encrypt(to_bytes(chunk))
+
+    def finalize(self):
+        return self._cipher.digest()
+
+
+class _AEADDecryptStream:
+    """Holds back the last tag_size bytes (the tag) and verifies them in finalize().
+
+    Plaintext from update() is not authenticated until finalize() returns, so
+    callers must discard their output if it raises.
+    """
+
+    def __init__(self, cipher, tag_size):
+        self._cipher = cipher
+        self._tag_size = tag_size
+        self._buffer = b""
+
+    def update(self, chunk):
+        data = self._buffer + to_bytes(chunk)
+        n = max(len(data) - self._tag_size, 0)
+        self._buffer = data[n:]
+        return self._cipher.decrypt(data[:n]) if n else b""
+
+    def finalize(self):
+        if len(self._buffer) != self._tag_size:
+            raise ValueError("Ciphertext too short for its tag")
+        self._cipher.verify(self._buffer)
+        return b""
+
+
+class Scheme(ABC):
+    """Base class: one cipher/mode combination under a registry name.
+
+    Subclasses must implement encrypt/decrypt and encryptor/decryptor; an
+    incomplete scheme fails when it is instantiated, not mid-encryption.
+    """
+
+    mode = None
+    nonce_size = 0
+    tag_size = 0
+    padded = False
+
+    def __init__(self, name, algorithm, key_size):
+        self.name = name
+        self.algorithm = algorithm
+        self.key_size = key_size
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+    @property
+    def block_size(self):
+        return BLOCK_SIZES.get(self.algorithm, 1)
+
+    def new_key(self):
+        if KEY_SIZES.get(self.algorithm) == self.key_size:
+            return new_key(self.algorithm)     # DES/3DES parity handling lives there
+        return get_random_bytes(self.key_size)
+
+    def new_nonce(self):
+        return get_random_bytes(self.nonce_size) if self.nonce_size else b""
+
+    def overhead(self, size):
+        """Stored bytes beyond the plaintext for a size-byte message (nonce, padding, tag)."""
+        padding = self.block_size - size % self.block_size if self.padded else 0
+        return self.nonce_size + padding + self.tag_size
+
+    @abstractmethod
+    def encrypt(self, key, plaintext, nonce=None):
+        """(nonce, ciphertext); a fresh nonce is drawn unless one is given."""
+
+    @abstractmethod
+    def decrypt(self, key, nonce, ciphertext):
+        """Plaintext, or ValueError for bad padding / a failed tag check."""
+
+    @abstractmethod
+    def encryptor(self, key, nonce=None):
+        """(nonce, stream) for incremental encryption."""
+
+    @abstractmethod
+    def decryptor(self, key, nonce):
+        """Stream for incremental decryption."""
+
+    def seal(self, key, plaintext):
+        nonce, ciphertext = self.encrypt(key, plaintext)
+        return nonce + ciphertext
+
+    def open(self, key, blob):
+        blob = to_bytes(blob)
+        return self.decrypt(key, blob[:self.nonce_size], blob[self.nonce_size:])
+
+
+class ECBScheme(Scheme):
+    """Block cipher in ECB mode with PKCS#7 padding; uses the cached key schedule."""
+
+    mode = "ECB"
+    padded = True
+
+    def encrypt(self, key, plaintext, nonce=None):
+        return b"", get_cipher(self.algorithm, key).encrypt(pad(plaintext, self.block_size))
+
+    def decrypt(self, key, nonce, ciphertext):
+        return unpad(get_cipher(self.algorithm, key).decrypt(to_bytes(ciphertext)), self.block_size)
+
+    def encryptor(self, key, nonce=None):
+        return b"", StreamEncryptor(self.algorithm, key)
+
+    def decryptor(self, key, nonce):
+        return StreamDecryptor(self.algorithm, key)
+
+
+class CBCScheme(Scheme):
+    """Block cipher in CBC mode with PKCS#7 padding and a random IV per message."""
+
+    mode = "CBC"
+    padded = True
+
+    @property
+    def nonce_size(self):
+        return self.block_size
+
+    def _new(self, key, iv):
+        module = CIPHERS[self.algorithm]
+        return module.new(key, module.MODE_CBC, iv=iv)
+
+    def encrypt(self, key, plaintext, nonce=None):
+        iv = nonce or self.new_nonce()
+        return iv, self._new(key, iv).encrypt(pad(plaintext, self.block_size))
+
+    def decrypt(self, key, nonce, ciphertext):
+        return unpad(self._new(key, bytes(nonce)).decrypt(to_bytes(ciphertext)), self.block_size)
+
+    def encryptor(self, key, nonce=None):
+        iv = nonce or self.new_nonce()
+        return iv, StreamEncryptor(self.algorithm, key, self._new(key, iv))
+
+    def decryptor(self, key, nonce):
+        return StreamDecryptor(self.algorithm, key, self._new(key, bytes(nonce)))
+
+
+class CTRScheme(Scheme):
+    """Block cipher in CTR mode: a stream cipher, so no padding."""
+
+    mode = "CTR"
+
+    @property
+    def nonce_size(self):
+        return self.block_size // 2      # the other half is the block counter
+
+    def _new(self, key, nonce):
+        module = CIPHERS[self.algorithm]
+        return module.new(key, module.MODE_CTR, nonce=nonce)
+
+    def encrypt(self, key, plaintext, nonce=None):
+        nonce = nonce or self.new_nonce()
+        return nonce, self._new(key, nonce).encrypt(to_bytes(plaintext))
+
+    def decrypt(self, key, nonce, ciphertext):
+        return self._new(key, bytes(nonce)).decrypt(to_bytes(ciphertext))
+
+    def encryptor(self, key, nonce=None):
+        nonce = nonce or self.new_nonce()
+        return nonce, _CipherStream(self._new(key, nonce).encrypt)
+
+    def decryptor(self, key, nonce):
+        return _CipherStream(self._new(key, bytes(nonce)).decrypt)
+
+
+class AEADScheme(Scheme):
+    """Authenticated encryption (GCM or ChaCha20-Poly1305); the tag is appended
+    to the ciphertext and checked before any plaintext is returned."""
+
+    nonce_size = 12
+    tag_size = 16
+
+    def __init__(self, name, algorithm, key_size, mode):
+        super().__init__(name, algorithm, key_size)
+        self.mode = mode
+
+    def _new(self, key, nonce):
+        if self.algorithm == "ChaCha20":
+            return ChaCha20_Poly1305.new(key=key, nonce=nonce)
+        return AES.new(key, AES.MODE_GCM, nonce=nonce, mac_len=self.tag_size)
+
+    def encrypt(self, key, plaintext, nonce=None):
+        nonce = nonce or self.new_nonce()
+        ciphertext, tag = self._new(key, nonce).encrypt_and_digest(to_bytes(plaintext))
+        return nonce, ciphertext + tag
+
+    def decrypt(self, key, nonce, ciphertext):
+        ciphertext = to_bytes(ciphertext)
+        body, tag = ciphertext[:-self.tag_size], ciphertext[-self.tag_size:]
+        return self._new(key, bytes(nonce)).decrypt_and_verify(body, tag)
+
+    def encryptor(self, key, nonce=None):
+        nonce = nonce or self.new_nonce()
+        return nonce, _AEADEncryptStream(self._new(key, nonce))
+
+    def decryptor(self, key, nonce):
+        return _AEADDecryptStream(self._new(key, bytes(nonce)), self.tag_size)
+
+
+# -------------------
+# Registry
+# -------------------
+SCHEMES = {}
+
+
+def register(scheme):
+    """Add (or replace) a scheme under scheme.name and return it."""
+    SCHEMES[scheme.name] = scheme
+    return scheme
+
+
+def get_scheme(name):
+    try:
+        return SCHEMES[name]
+    except KeyError:
+        raise ValueError(f"Unknown cipher scheme {name!r}; choose from {', '.join(SCHEMES)}") from None
+
+
+def find_scheme(algorithm, mode, key_size=None):
+    """Scheme for an (algorithm, mode) pair; key_size picks among AES-128/192/256."""
+    for scheme in SCHEMES.values():
+        if scheme.algorithm == algorithm and scheme.mode == mode and key_size in (None, scheme.key_size):
+            return scheme
+    raise ValueError(f"No {algorithm}-{mode} scheme for {key_size}-byte keys")
+
+
+def scheme_names(algorithms=None, modes=None):
+    return [name for name, s in SCHEMES.items()
+            if (algorithms is None or s.algorithm in algorithms) and (modes is None or s.mode in modes)]
+
+
+for _bits in (128, 192, 256):
+    register(ECBScheme(f"AES-{_bits}-ECB", "AES", _bits // 8))
+    register(CBCScheme(f"AES-{_bits}-CBC", "AES", _bits // 8))
+    register(CTRScheme(f"AES-{_bits}-CTR", "AES", _bits // 8))
+    register(AEADScheme(f"AES-{_bits}-GCM", "AES", _bits // 8, "GCM"))
+for _alg in ("DES", "3DES"):
+    register(ECBScheme(f"{_alg}-ECB", _alg, 8 if _alg == "DES" else 24))
+    register(CBCScheme(f"{_alg}-CBC", _alg, 8 if _alg == "DES" else 24))
+register(AEADScheme("ChaCha20-Poly1305", "ChaCha20", 32, "Poly1305"))
@@ -0,0 +1,357 @@
+import os
+import platform
+import re
+import subprocess
+from Crypto.Cipher import AES, ChaCha20_Poly1305
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    import cryptography
+except ImportError:   # the OpenSSL backend is optional
+    cryptography = None
+
+# -------------------
+# CONFIG
+# -------------------
+# Workloads run raw (unpadded, block-aligned payloads, fixed nonce) so every
+# backend does exactly the same cipher work; padding and nonce handling are
+# measured separately by the --matrix benchmark.
+WORKLOADS = {
+    "AES-128-ECB": 16,
+    "AES-256-ECB": 32,
+    "AES-128-CBC": 16,
+    "AES-128-CTR": 16,
+    "AES-128-GCM": 16,
+    "ChaCha20-Poly1305": 32,
+}
+BENCH_NONCE = bytes(12)
+BENCH_IV = bytes(16)
+
+# CPU flags worth reporting, by the name /proc/cpuinfo uses
+X86_FLAGS = ("aes", "pclmulqdq", "vaes", "vpclmulqdq", "avx", "avx2", "avx512f", "sha_ni")
+ARM_FLAGS = ("aes", "pmull", "sha1", "sha2", "neon", "asimd")
+
+
+# -------------------
+# CPU feature detection
+# -------------------
+def _linux_cpuinfo():
+    try:
+        with open("/proc/cpuinfo") as f:
+            text = f.read()
+    except OSError:
+        return None, set()
+    model = re.search(r"^(?:model name|Model|Hardware)\s*:\s*(.+)$", text, re.M)
+    flags = re.search(r"^(?:flags|Features)\s*:\s*(.+)$", text, re.M)
+    return (model.group(1).strip() if model else None), set(flags.group(1).split() if flags else ())
+
+
+def _sysctl(name):
+    try:
+        return subprocess.run(["sysctl", "-n", name], capture_output=True, text=True, timeout=2).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _macos_cpuinfo():
+    model = _sysctl("machdep.cpu.brand_string") or None
+    flags = set(" ".join((_sysctl("machdep.cpu.features"), _sysctl("machdep.cpu.leaf7_features"))).lower().split())
+    if _sysctl("hw.optional.arm.FEAT_AES") == "1":    # Apple silicon
+        flags |= {"aes", "neon"}
+    if _sysctl("hw.optional.arm.FEAT_PMULL") == "1":
+        flags.add("pmull")
+    return model, flags
+
+
+def _pycryptodome_features():
+    """What PyCryptodome itself detected via CPUID (x86 only)."""
+    try:
+        from Crypto.Util import _cpu_features
+        return {"aes_ni": bool(_cpu_features.have_aes_ni()), "clmul": bool(_cpu_features.have_clmul())}
+    except Exception:
+        return None
+
+
+def cpu_features():
+    """Host CPU and the crypto-relevant instruction set extensions it advertises.
+
+    "aes_hw" / "clmul_hw" summarise AES-NI or ARMv8 AES and PCLMULQDQ or PMULL,
+    which is what makes AES-GCM fast; None means the flags could not be read.
+    """
+    system = platform.system()
+    if system == "Linux":
+        model, flags = _linux_cpuinfo()
+    elif system == "Darwin":
+        model, flags = _macos_cpuinfo()
+    else:
+        model, flags = platform.processor() or None, set()
+    known = X86_FLAGS + ARM_FLAGS
+    pycryptodome = _pycryptodome_features()
+    aes_hw = "aes" in flags or bool(pycryptodome and pycryptodome["aes_ni"])
+    clmul_hw = bool(flags & {"pclmulqdq", "pmull"}) or bool(pycryptodome and pycryptodome["clmul"])
+    readable = bool(flags) or pycryptodome is not None
+    return {
+        "machine": platform.machine(),
+        "system": system,
+        "cpu": model,
+        "cores": os.cpu_count(),
+        "flags": sorted(f for f in flags if f in known),
+        "aes_hw": aes_hw if readable else None,
+        "clmul_hw": clmul_hw if readable else None,
+        "pycryptodome_detected": pycryptodome,
+    }
+
+
+# -------------------
+# Pure-Python AES reference (FIPS-197), table driven
+# -------------------
+def _xtime(a):
+    a <<= 1
+    return a ^ 0x11B if a & 0x100 else a
+
+
+def _gmul(a, b):
+    out = 0
+    while b:
+        if b & 1:
+            out ^= a
+        a, b = _xtime(a), b >> 1
+    return out
+
+
+def _build_tables():
+    sbox = [0] * 256
+    p = q = 1
+    while True:       # walk the multiplicative group with generator 3
+        p ^= _xtime(p) & 0xFF
+        q ^= q << 1
+        q ^= q << 2
+        q ^= q << 4
+        q &= 0xFF
+        if q & 0x80:
+            q ^= 0x09
+        x = q ^ (q << 1 | q >> 7) ^ (q << 2 | q >> 6) ^ (q << 3 | q >> 5) ^ (q << 4 | q >> 4)
+        sbox[p] = (x ^ 0x63) & 0xFF
+        if p == 1:
+            break
+    sbox[0] = 0x63
+    inv = [0] * 256
+    for i, s in enumerate(sbox):
+        inv[s] = i
+    te = [(_gmul(s, 2) << 24) | (s << 16) | (s << 8) | _gmul(s, 3) for s in sbox]
+    td = [(_gmul(s, 14) << 24) | (_gmul(s, 9) << 16) | (_gmul(s, 13) << 8) | _gmul(s, 11) for s in inv]
+    return sbox, inv, te, td
+
+
+SBOX, INV_SBOX, _TE, _TD = _build_tables()
+
+
+def _rot(table, n):
+    return [((t >> n) | (t << (32 - n))) & 0xFFFFFFFF for t in table]
+
+
+_TE1, _TE2, _TE3 = _rot(_TE, 8), _rot(_TE, 16), _rot(_TE, 24)
+_TD1, _TD2, _TD3 = _rot(_TD, 8), _rot(_TD, 16), _rot(_TD, 24)
+
+
+class ReferenceAES:
+    """Slow but dependency-free AES block cipher, used as the no-acceleration baseline."""
+
+    def __init__(self, key):
+        if len(key) not in (16, 24, 32):
+            raise ValueError("AES key must be 16, 24 or 32 bytes")
+        nk = len(key) // 4
+        self.rounds = nk + 6
+        w = [int.from_bytes(key[4 * i:4 * i + 4], "big") for i in range(nk)]
+        rcon = 1
+        for i in range(nk, 4 * (self.rounds + 1)):
+            t = w[i - 1]
+            if i % nk == 0:
+                t = ((t << 8) | (t >> 24)) & 0xFFFFFFFF
+                t = self._sub_word(t) ^ (rcon << 24)
+                rcon = _xtime(rcon)
+            elif nk > 6 and i % nk == 4:
+                t = self._sub_word(t)
+            w.append(w[i - nk] ^ t)
+        self._ek = [w[4 * r:4 * r + 4] for r in range(self.rounds + 1)]
+        # equivalent inverse cipher: InvMixColumns applied to the middle round keys
+        dk = [self._ek[self.rounds]]
+        for r in range(self.rounds - 1, 0, -1):
+            dk.append([_TD[SBOX[k >> 24]] ^ _TD1[SBOX[k >> 16 & 0xFF]] ^ _TD2[SBOX[k >> 8 & 0xFF]]
+                       ^ _TD3[SBOX[k & 0xFF]] for k in self._ek[r]])
+        dk.append(self._ek[0])
+        self._dk = dk
+
+    @staticmethod
+    def _sub_word(t):
+        return (SBOX[t >> 24] << 24) | (SBOX[t >> 16 & 0xFF] << 16) | (SBOX[t >> 8 & 0xFF] << 8) | SBOX[t & 0xFF]
+
+    def encrypt_block(self, block):
+        k = self._ek
+        s0, s1, s2, s3 = (int.from_bytes(block[i:i + 4], "big") ^ k[0][i // 4] for i in (0, 4, 8, 12))
+        for r in range(1, self.rounds):
+            rk = k[r]
+            s0, s1, s2, s3 = (
+                _TE[s0 >> 24] ^ _TE1[s1 >> 16 & 0xFF] ^ _TE2[s2 >> 8 & 0xFF] ^ _TE3[s3 & 0xFF] ^ rk[0],
+                _TE[s1 >> 24] ^ _TE1[s2 >> 16 & 0xFF] ^ _TE2[s3 >> 8 & 0xFF] ^ _TE3[s0 & 0xFF] ^ rk[1],
+                _TE[s2 >> 24] ^ _TE1[s3 >> 16 & 0xFF] ^ _TE2[s0 >> 8 & 0xFF] ^ _TE3[s1 & 0xFF] ^ rk[2],
+                _TE[s3 >> 24] ^ _TE1[s0 >> 16 & 0xFF] ^ _TE2[s1 >> 8 & 0xFF] ^ _TE3[s2 & 0xFF] ^ rk[3],
+            )
+        rk = k[self.rounds]
+        out = (
+            (SBOX[s0 >> 24] << 24 | SBOX[s1 >> 16 & 0xFF] << 16 | SBOX[s2 >> 8 & 0xFF] << 8 | SBOX[s3 & 0xFF]) ^ rk[0],
+            (SBOX[s1 >> 24] << 24 | SBOX[s2 >> 16 & 0xFF] << 16 | SBOX[s3 >> 8 & 0xFF] << 8 | SBOX[s0 & 0xFF]) ^ rk[1],
+            (SBOX[s2 >> 24] << 24 | SBOX[s3 >> 16 & 0xFF] << 16 | SBOX[s0 >> 8 & 0xFF] << 8 | SBOX[s1 & 0xFF]) ^ rk[2],
+            (SBOX[s3 >> 24] << 24 | SBOX[s0 >> 16 & 0xFF] << 16 | SBOX[s1 >> 8 & 0xFF] << 8 | SBOX[s2 & 0xFF]) ^ rk[3],
+        )
+        return b"".join(w.to_bytes(4, "big") for w in out)
+
+    def decrypt_block(self, block):
+        k = self._dk
+        s0, s1, s2, s3 = (int.from_bytes(block[i:i + 4], "big") ^ k[0][i // 4] for i in (0, 4, 8, 12))
+        for r in range(1, self.rounds):
+            rk = k[r]
+            s0, s1, s2, s3 = (
+                _TD[s0 >> 24] ^ _TD1[s3 >> 16 & 0xFF] ^ _TD2[s2 >> 8 & 0xFF] ^ _TD3[s1 & 0xFF] ^ rk[0],
+                _TD[s1 >> 24] ^ _TD1[s0 >> 16 & 0xFF] ^ _TD2[s3 >> 8 & 0xFF] ^ _TD3[s2 & 0xFF] ^ rk[1],
+                _TD[s2 >> 24] ^ _TD1[s1 >> 16 & 0xFF] ^ _TD2[s0 >> 8 & 0xFF] ^ _TD3[s3 & 0xFF] ^ rk[2],
+                _TD[s3 >> 24] ^ _TD1[s2 >> 16 & 0xFF] ^ _TD2[s1 >> 8 & 0xFF] ^ _TD3[s0 & 0xFF] ^ rk[3],
+            )
+        rk = k[self.rounds]
+        IS = INV_SBOX
+        out = (
+            (IS[s0 >> 24] << 24 | IS[s3 >> 16 & 0xFF] << 16 | IS[s2 >> 8 & 0xFF] << 8 | IS[s1 & 0xFF]) ^ rk[0],
+            (IS[s1 >> 24] << 24 | IS[s0 >> 16 & 0xFF] << 16 | IS[s3 >> 8 & 0xFF] << 8 | IS[s2 & 0xFF]) ^ rk[1],
+            (IS[s2 >> 24] << 24 | IS[s1 >> 16 & 0xFF] << 16 | IS[s0 >> 8 & 0xFF] << 8 | IS[s3 & 0xFF]) ^ rk[2],
+            (IS[s3 >> 24] << 24 | IS[s2 >> 16 & 0xFF] << 16 | IS[s1 >> 8 & 0xFF] << 8 | IS[s0 & 0xFF]) ^ rk[3],
+        )
+        return b"".join(w.to_bytes(4, "big") for w in out)
+
+    # ---- modes ----
+    def encrypt_ecb(self, data):
+        return b"".join(self.encrypt_block(data[i:i + 16]) for i in range(0, len(data), 16))
+
+    def decrypt_ecb(self, data):
+        return b"".join(self.decrypt_block(data[i:i + 16]) for i in range(0, len(data), 16))
+
+    def encrypt_cbc(self, iv, data):
+        out, prev = [], int.from_bytes(iv, "big")
+        for i in range(0, len(data), 16):
+            block = self.encrypt_block((int.from_bytes(data[i:i + 16], "big") ^ prev).to_bytes(16, "big"))
+            prev = int.from_bytes(block, "big")
+            out.append(block)
+        return b"".join(out)
+
+    def decrypt_cbc(self, iv, data):
+        out, prev = [], int.from_bytes(iv, "big")
+        for i in range(0, len(data), 16):
+            block = data[i:i + 16]
+            out.append((int.from_bytes(self.decrypt_block(block), "big") ^ prev).to_bytes(16, "big"))
+            prev = int.from_bytes(block, "big")
+        return b"".join(out)
+
+    def ctr(self, nonce, data):
+        """PyCryptodome-compatible CTR: 8-byte nonce followed by a 64-bit big-endian counter."""
+        out = []
+        for n, i in enumerate(range(0, len(data), 16)):
+            stream = self.encrypt_block(bytes(nonce) + n.to_bytes(8, "big"))
+            chunk = data[i:i + 16]
+            out.append((int.from_bytes(chunk, "big") ^ int.from_bytes(stream[:len(chunk)], "big"))
+                       .to_bytes(len(chunk), "big"))
+        return b"".join(out)
+
+
+# -------------------
+# Backends: workload -> (encrypt(data), decrypt(ciphertext)) callables
+# -------------------
+def _pycryptodome(workload, key):
+    if workload.endswith("ECB"):
+        c = AES.new(key, AES.MODE_ECB)
+        return c.encrypt, c.decrypt
+    if workload.endswith("CBC"):
+        return (lambda d: AES.new(key, AES.MODE_CBC, iv=BENCH_IV).encrypt(d),
+                lambda d: AES.new(key, AES.MODE_CBC, iv=BENCH_IV).decrypt(d))
+    if workload.endswith("CTR"):
+        return (lambda d: AES.new(key, AES.MODE_CTR, nonce=BENCH_NONCE[:8]).encrypt(d),
+                lambda d: AES.new(key, AES.MODE_CTR, nonce=BENCH_NONCE[:8]).decrypt(d))
+    if workload.endswith("GCM"):
+        new = lambda: AES.new(key, AES.MODE_GCM, nonce=BENCH_NONCE)
+        return (lambda d: b"".join(new().encrypt_and_digest(d)),
+                lambda d: new().decrypt_and_verify(d[:-16], d[-16:]))
+    new = lambda: ChaCha20_Poly1305.new(key=key, nonce=BENCH_NONCE)
+    return (lambda d: b"".join(new().encrypt_and_digest(d)),
+            lambda d: new().decrypt_and_verify(d[:-16], d[-16:]))
+
+
+def _openssl(workload, key):
+    if workload.endswith("GCM") or workload.startswith("ChaCha20"):
+        aead = AESGCM(key) if workload.endswith("GCM") else ChaCha20Poly1305(key)
+        return (lambda d: aead.encrypt(BENCH_NONCE, d, None),
+                lambda d: aead.decrypt(BENCH_NONCE, d, None))
+    mode = {"ECB": lambda: modes.ECB(), "CBC": lambda: modes.CBC(BENCH_IV),
+            "CTR": lambda: modes.CTR(BENCH_NONCE[:8] + bytes(8))}[workload[-3:]]
+    cipher = lambda: Cipher(algorithms.AES(key), mode())
+    return (lambda d: (lambda e: e.update(d) + e.finalize())(cipher().encryptor()),
+            lambda d: (lambda e: e.update(d) + e.finalize())(cipher().decryptor()))
+
+
+def _reference(workload, key):
+    if workload not in REFERENCE_WORKLOADS:
+        raise ValueError(f"The reference backend does not implement {workload}")
+    aes = ReferenceAES(key)
+    return {
+        "ECB": (aes.encrypt_ecb, aes.decrypt_ecb),
+        "CBC": (lambda d: aes.encrypt_cbc(BENCH_IV, d), lambda d: aes.decrypt_cbc(BENCH_IV, d)),
+        "CTR": (lambda d: aes.ctr(BENCH_NONCE[:8], d), lambda d: aes.ctr(BENCH_NONCE[:8], d)),
+    }[workload[-3:]]
+
+
+BACKENDS = {
+    "pycryptodome": _pycryptodome,
+    "cryptography": _openssl,
+    "reference": _reference,
+}
+REFERENCE_WORKLOADS = {"AES-128-ECB", "AES-256-ECB", "AES-128-CBC", "AES-128-CTR"}
+
+
+def available_backends():
+    return [name for name in BACKENDS if name != "cryptography" or cryptography is not None]
+
+
+def supports(backend, workload):
+    return backend != "reference" or workload in REFERENCE_WORKLOADS
+
+
+def backend_versions():
+    import Crypto
+    from ssl import OPENSSL_VERSION
+    versions = {"pycryptodome": Crypto.__version__, "reference": "pure-python"}
+    if cryptography is not None:
+        from cryptography.hazmat.backends.openssl.backend import backend as openssl
+        versions["cryptography"] = f"{cryptography.__version__} ({openssl.openssl_version_text()})"
+    versions["python_ssl"] = OPENSSL_VERSION
+    return versions
+
+
+def make_backend(backend, workload, key):
+    """(encrypt, decrypt) callables for workload on backend."""
+    if workload not in WORKLOADS:
+        raise ValueError(f"Unknown workload {workload!r}; choose from {', '.join(WORKLOADS)}")
+    if backend not in available_backends():
+        raise ValueError(f"Backend {backend!r} is not available on this host")
+    if not supports(backend, workload):
+        raise ValueError(f"Backend {backend!r} does not implement {workload}")
+    return BACKENDS[backend](workload, key)
+
+
+def fastest(results):
+    """{workload: backend with the best median encrypt throughput}."""
+    best = {}
+    for row in results:
+        if row["direction"] != "encrypt" or row["mb_per_s"] is None:
+            continue
+        current = best.get(row["workload"])
+        if current is None or row["mb_per_s"] > current["mb_per_s"]:
+            best[row["workload"]] = row
+    return {w: r["backend"] for w, r in best.items()}
@@ -0,0 +1,417 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from bulk_crypto import CHUNK_SIZE, decrypt_records, encrypt_records, iter_jsonl
+from cipher_registry import SCHEMES, find_scheme
+from crypto_core import STREAM_CHUNK_SIZE
+from envelope import ALGORITHMS, MODES, key_version, open_stream, seal_stream
+from key_store import KeyStore
+
+# -------------------
+# CONFIG
+# -------------------
+TREE = "users"                      # member of a Firebase export holding one record per uid
+PROGRESS_INTERVAL = 0.5             # seconds between progress updates on a terminal
+PROGRESS_INTERVAL_LOG = 5.0         # ...and when stderr is redirected to a file
+JSON_READ_SIZE = 64 * 1024          # characters read per step when parsing an export
+DEFAULT_MODES = {"AES": "GCM", "DES": "CBC", "3DES": "CBC", "ChaCha20": "Poly1305"}   # ECB only on request
+
+_WHITESPACE = re.compile(r"\s*")
+_DECODER = json.JSONDecoder()
+
+
+# -------------------
+# Progress reporting
+# -------------------
+class Progress:
+    """Live bytes, MB/s and records/sec on stderr, redrawn at most every interval seconds."""
+
+    def __init__(self, label, stream=sys.stderr, enabled=True):
+        self.label = label
+        self.stream = stream
+        self.enabled = enabled
+        self.tty = stream.isatty()
+        self.interval = PROGRESS_INTERVAL if self.tty else PROGRESS_INTERVAL_LOG
+        self.bytes = self.records = self.errors = 0
+        self.start = self._last = time.perf_counter()
+
+    def add(self, nbytes, records=0, errors=0):
+        self.bytes += nbytes
+        self.records += records
+        self.errors += errors
+        now = time.perf_counter()
+        if self.enabled and now - self._last >= self.interval:
+            self._last = now
+            self._render(now)
+
+    def _render(self, now, end=None):
+        elapsed = max(now - self.start, 1e-9)
+        line = (f"{self.label}: {self.bytes / 1e6:,.1f} MB  {self.bytes / 1e6 / elapsed:,.1f} MB/s")
+        if self.records:
+            line += f"  {self.records:,} records  {self.records / elapsed:,.0f} rec/s  {self.errors:,} errors"
+        if self.tty:
+            self.stream.write("\r" + line + (end or ""))
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        """Final line plus a summary dict."""
+        now = time.perf_counter()
+        if self.enabled:
+            self._render(now, "\n")
+        elapsed = now - self.start
+        return {
+            "operation": self.label,
+            "bytes": self.bytes,
+            "records": self.records,
+            "errors": self.errors,
+            "seconds": round(elapsed, 3),
+            "mb_per_s": round(self.bytes / 1e6 / elapsed, 1) if elapsed else None,
+            "records_per_s": round(self.records / elapsed, 1) if elapsed and self.records else None,
+        }
+
+
+# -------------------
+# Incremental JSON reading (exports far larger than memory)
+# -------------------
+class JSONReader:
+    """Pull parser for nested JSON objects: iterate an object's keys without
+    decoding its values, so one member (e.g. `users`) can be walked record by
+    record while the rest is decoded normally."""
+
+    def __init__(self, f, read_size=JSON_READ_SIZE):
+        self.f = f
+        self.read_size = read_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ("" at end of input)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        found = self.peek()
+        if found != ch:
+            raise ValueError(f"Expected {ch!r} in JSON input, found {found or 'end of input'!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the complete value at the current position."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer may continue in the next read
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def keys(self):
+        """Yield the keys of the object at the current position; the caller must
+        consume each value (value() or a nested keys()) before asking for the next key."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"Expected ',' or '}}' in JSON input, found {ch or 'end of input'!r}")
+
+
+# -------------------
+# Records
+# -------------------
+def process_records(records, key, algorithm, mode, workers, progress, decrypting=False, chunk_size=CHUNK_SIZE):
+    """Yield (uid, result) in input order through bulk_crypto's record workers; a
+    record that fails to decrypt yields None.
+
+    key is one key or a UserKeys resolved here, in the parent, so the derived-key
+    cache is shared. Progress counts ciphertext bytes: read when decrypting,
+    written when encrypting.
+    """
+    if decrypting:
+        records = _counted(records, progress)
+    if isinstance(key, UserKeys):
+        keys, key = key, None
+        if decrypting:
+            records = ((uid, stored, keys.opening(uid, key_version(stored) if isinstance(stored, str) else None))
+                       for uid, stored in records)
+        else:
+            records = ((uid, value, *keys.sealing(uid)) for uid, value in records)
+    if decrypting:
+        results = decrypt_records(records, key, algorithm, workers, chunk_size, envelope=True)
+    else:
+        results = encrypt_records(records, key, algorithm, workers, chunk_size, mode=mode)
+    for uid, result in results:
+        progress.add(0 if decrypting or result is None else len(result), 1, result is None)
+        yield uid, result
+
+
+def _counted(records, progress):
+    for uid, stored in records:
+        progress.add(len(stored) if isinstance(stored, str) else 0)
+        yield uid, stored
+
+
+# -------------------
+# Commands
+# -------------------
+def _records_in(reader, field, decrypting):
+    """(uid, record) to encrypt, or (uid, stored text) to decrypt, from one users-style object."""
+    for uid in reader.keys():
+        value = reader.value()
+        if decrypting:
+            yield uid, value.get(field) if isinstance(value, dict) else value
+        else:
+            yield uid, value
+
+
+def run_json(src, dst, decrypting, key, algorithm, mode, field, workers, progress, tree=TREE):
+    """Rewrite an export, transforming each member of `tree` and copying everything else."""
+    reader = JSONReader(src)
+    dst.write("{")
+    for n, name in enumerate(reader.keys()):
+        dst.write(f'{"," if n else ""}\n  {json.dumps(name)}: ')
+        if name != tree or reader.peek() != "{":
+            json.dump(reader.value(), dst)
+            continue
+        dst.write("{")
+        records = _records_in(reader, field, decrypting)
+        results = process_records(records, key, algorithm, mode, workers, progress, decrypting)
+        for i, (uid, result) in enumerate(results):
+            value = result if decrypting else {field: result}
+            dst.write(f'{"," if i else ""}\n    {json.dumps(uid)}: {json.dumps(value)}')
+        dst.write("\n  }")
+    dst.write("\n}\n")
+
+
+def run_jsonl(src, dst, decrypting, key, algorithm, mode, field, workers, progress):
+    """{"uid", "portfolio"} lines <-> {"uid", field} lines."""
+    records = iter_jsonl(src, field if decrypting else None)
+    for uid, result in process_records(records, key, algorithm, mode, workers, progress, decrypting):
+        dst.write(json.dumps({"uid": uid, ("portfolio" if decrypting else field): result}) + "\n")
+
+
+def run_raw(src, dst, decrypting, key, algorithm, mode, progress, chunk_size=STREAM_CHUNK_SIZE):
+    """One file or pipe as a stream envelope (see envelope.seal_stream)."""
+    def counted():
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                return
+            progress.add(len(chunk))
+            yield chunk
+
+    if isinstance(key, UserKeys):
+        keys = key
+        if decrypting:
+            key = lambda version: keys.opening(None, version)    # version read from the stream header
+            version = None
+        else:
+            key, version = keys.sealing(None)
+    else:
+        version = None
+    if decrypting:
+        out = open_stream(key, counted(), chunk_size)
+    else:
+        out = seal_stream(algorithm, key, counted(), mode, chunk_size, key_version=version)
+    for chunk in out:
+        dst.write(chunk)
+
+
+# -------------------
+# Keys and I/O
+# -------------------
+def detect_format(path):
+    if path.endswith(".jsonl"):
+        return "jsonl"
+    if path.endswith(".json"):
+        return "json"
+    return "raw"
+
+
+def default_mode(algorithm):
+    """Mode used when -m is not given: authenticated or randomised (GCM, CBC, Poly1305),
+    never ECB, which leaks repeated plaintext blocks in files and streams."""
+    return DEFAULT_MODES.get(algorithm) or next(s.mode for s in SCHEMES.values()
+                                                if s.algorithm == algorithm and s.mode != "ECB")
+
+
+class UserKeys:
+    """Key-store keys for --uid (one user) or --per-user-keys (each record's uid).
+
+    Sealing uses the user's latest key version and records it in the envelope;
+    opening derives whichever version the envelope names, so rotated data stays readable.
+    """
+
+    def __init__(self, store, algorithm, key_size, uid=None):
+        self.store = store
+        self.algorithm = algorithm
+        self.key_size = key_size
+        self.uid = uid
+
+    def sealing(self, uid):
+        """(key, key version) to seal uid's record with."""
+        version, key = self.store.latest(self.uid or uid, self.algorithm, self.key_size)
+        return key, version
+
+    def opening(self, uid, version):
+        return self.store.key_for(self.uid or uid, self.algorithm, self.key_size, version)
+
+
+def resolve_key(args, scheme):
+    """One key (bytes), a UserKeys for --uid/--per-user-keys, or a usage error."""
+    if args.key_file:
+        with open(args.key_file, "rb") as f:
+            return f.read()
+    if args.key_hex:
+        return bytes.fromhex(args.key_hex)
+    if args.uid or args.per_user_keys:
+        return UserKeys(KeyStore(), scheme.algorithm, scheme.key_size, args.uid)
+    raise SystemExit("No key: pass --key-file, --key-hex, --uid or --per-user-keys")
+
+
+def _open_in(path, binary):
+    if path == "-":
+        return sys.stdin.buffer if binary else sys.stdin
+    return open(path, "rb" if binary else "r", encoding=None if binary else "utf-8")
+
+
+def _run(args, decrypting):
+    fmt = args.format or ("raw" if args.input == "-" else detect_format(args.input))
+    if fmt == "raw" and args.per_user_keys:
+        raise SystemExit("--per-user-keys needs --format json or jsonl")
+    mode = args.mode or default_mode(args.algorithm)
+    key_size = args.key_bits // 8 if args.key_bits else None
+    if args.key_file or args.key_hex:
+        key = resolve_key(args, None)
+        find_scheme(args.algorithm, mode, key_size or len(key))     # fail early on a bad key length
+    else:
+        key = resolve_key(args, find_scheme(args.algorithm, mode, key_size))
+    field = args.field or f"portfolio_{args.algorithm}"
+    binary = fmt == "raw"
+    progress = Progress("decrypt" if decrypting else "encrypt", enabled=not args.quiet)
+
+    # write next to the target and rename on success, so a failed run (or a bad AEAD tag) leaves nothing behind
+    tmp = None if args.output == "-" else f"{args.output}.part"
+    src = _open_in(args.input, binary)
+    dst = (sys.stdout.buffer if binary else sys.stdout) if tmp is None else \
+        open(tmp, "wb" if binary else "w", encoding=None if binary else "utf-8")
+    try:
+        if fmt == "raw":
+            run_raw(src, dst, decrypting, key, args.algorithm, mode, progress)
+        else:
+            run = run_json if fmt == "json" else run_jsonl
+            run(src, dst, decrypting, key, args.algorithm, mode, field, args.workers, progress)
+    except BaseException as exc:
+        if tmp:
+            dst.close()
+            os.remove(tmp)
+        if isinstance(exc, ValueError):    # bad key, corrupt input or failed tag check
+            raise SystemExit(f"{progress.label} failed: {exc}") from exc
+        raise
+    finally:
+        if src is not sys.stdin and src is not sys.stdin.buffer:
+            src.close()
+    if tmp:
+        dst.close()
+        os.replace(tmp, args.output)
+    else:
+        dst.flush()
+    summary = progress.finish()
+    if not args.quiet:
+        print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+def keygen(args):
+    scheme = find_scheme(args.algorithm, args.mode or default_mode(args.algorithm),
+                         args.key_bits // 8 if args.key_bits else None)
+    key = scheme.new_key()
+    if args.output == "-":
+        print(key.hex())
+        return 0
+    fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    print(f"{scheme.name} key written to {args.output}", file=sys.stderr)
+    return 0
+
+
+# -------------------
+# MAIN
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encrypt or decrypt files, pipes and Firebase exports")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-a", "--algorithm", default="AES", choices=list(ALGORITHMS))
+    common.add_argument("-m", "--mode", choices=list(MODES), help="default: GCM for AES, CBC for DES/3DES, Poly1305 for ChaCha20; "
+                             "ECB only when asked for")
+    common.add_argument("--key-bits", type=int, choices=(64, 128, 192, 256),
+                        help="key size for derived or generated keys (default: the algorithm's first scheme, "
+                             "e.g. AES-128)")
+
+    files = argparse.ArgumentParser(add_help=False, parents=[common])
+    files.add_argument("input", nargs="?", default="-", help="file to read, - for stdin (default)")
+    files.add_argument("-o", "--output", default="-", help="file to write, - for stdout (default)")
+    files.add_argument("-f", "--format", choices=("raw", "json", "jsonl"),
+                    help="raw: any bytes as one stream envelope; json: Firebase export, records under "
+                         f"'{TREE}' handled one by one; jsonl: one {{uid, portfolio}} per line "
+                         "(default: by file extension, raw for stdin)")
+    files.add_argument("--field", help="record field holding the ciphertext (default portfolio_<ALGORITHM>)")
+    files.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                    help="processes for json/jsonl records (raw streams are a single cipher pass)")
+    files.add_argument("-q", "--quiet", action="store_true", help="no progress or summary on stderr")
+    keys = files.add_mutually_exclusive_group()
+    keys.add_argument("--key-file", help="raw key bytes, e.g. from the keygen command")
+    keys.add_argument("--key-hex")
+    keys.add_argument("--uid", help="derive the key for this user from the local key store")
+    keys.add_argument("--per-user-keys", action="store_true",
+                      help="json/jsonl: derive each record's key from the local key store by uid")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("encrypt", parents=[files], help="encrypt a file, stdin or export")
+    commands.add_parser("decrypt", parents=[files], help="decrypt a file, stdin or export")
+    gen = commands.add_parser("keygen", parents=[common], help="write a random key")
+    gen.add_argument("-o", "--output", default="-", help="key file (created 0600), - prints hex")
+    args = parser.parse_args(argv)
+
+    if args.command == "keygen":
+        return keygen(args)
+    return _run(args, decrypting=args.command == "decrypt")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
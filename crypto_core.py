@@ -0,0 +1,395 @@
+from Crypto.Cipher import AES, DES, DES3
+from Crypto.Random import get_random_bytes
+from collections import OrderedDict
+import base64
+import mmap
+import os
+import threading
+from metrics import timed
+
+# -------------------
+# CONFIG
+# -------------------
+CIPHERS = {"AES": AES, "DES": DES, "3DES": DES3}
+BLOCK_SIZES = {"AES": 16, "DES": 8, "3DES": 8}   # DES needs 8-byte multiples, AES needs 16-byte multiples
+KEY_SIZES = {"AES": 16, "DES": 8, "3DES": 24}    # 128-bit AES key, 64-bit DES key, three-key 3DES
+STREAM_CHUNK_SIZE = 64 * 1024         # bytes read per step when streaming
+MMAP_CHUNK_SIZE = 1024 * 1024        # bytes handed to the cipher per step for mapped files
+CIPHER_CACHE_SIZE = 256               # prepared key schedules kept per process
+
+
+# -------------------
+# Byte helpers
+# -------------------
+def to_bytes(data):
+    """Return a bytes-like view of data, encoding str as UTF-8."""
+    if isinstance(data, str):
+        return data.encode()
+    return memoryview(data).cast("B")
+
+
+def pad(data, block_size):
+    """PKCS#7-pad data to a multiple of block_size and return bytes."""
+    data = to_bytes(data)
+    padding_len = block_size - len(data) % block_size
+    return b"".join((data, bytes((padding_len,)) * padding_len))
+
+
+def unpad(data, block_size=None):
+    """Strip PKCS#7 padding and return the unpadded bytes."""
+    data = to_bytes(data)
+    if not data:
+        raise ValueError("Cannot unpad empty data")
+    padding_len = data[-1]
+    if padding_len == 0 or padding_len > len(data) or (block_size and padding_len > block_size):
+        raise ValueError("Invalid padding")
+    if data[-padding_len:] != bytes((padding_len,)) * padding_len:
+        raise ValueError("Invalid padding")
+    return bytes(data[:-padding_len])
+
+
+def new_key(algorithm):
+    """Random key of the right size for algorithm."""
+    key = get_random_bytes(KEY_SIZES[algorithm])
+    if algorithm == "3DES":
+        key = DES3.adjust_key_parity(key)   # also rejects keys that degenerate to single DES
+    return key
+
+
+def new_cipher(algorithm, key):
+    """Create an ECB cipher object for algorithm ("AES", "DES" or "3DES")."""
+    return CIPHERS[algorithm].new(key, CIPHERS[algorithm].MODE_ECB)
+
+
+# -------------------
+# Cipher-context cache
+# -------------------
+class CipherCache:
+    """LRU cache of prepared ECB cipher objects keyed by (algorithm, key).
+
+    Building a cipher runs the key schedule, which is a noticeable share of the
+    cost for small payloads. ECB cipher objects keep no per-message state, so one
+    object can be reused for every encrypt and decrypt under the same key.
+    """
+
+    def __init__(self, maxsize=CIPHER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, algorithm, key):
+        cache_key = (algorithm, bytes(key))
+        with self._lock:
+            cipher = self._entries.get(cache_key)
+            if cipher is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return cipher
+            self.misses += 1
+        cipher = new_cipher(algorithm, key)
+        with self._lock:
+            self._entries[cache_key] = cipher
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return cipher
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {"size": len(self._entries), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cipher_cache = CipherCache()
+
+
+def get_cipher(algorithm, key, cache=cipher_cache):
+    """Cached cipher for (algorithm, key); pass cache=None to always build a fresh one."""
+    if cache is None:
+        return new_cipher(algorithm, key)
+    return cache.get(algorithm, key)
+
+
+# -------------------
+# One-shot API
+# -------------------
+@timed("crypto.encrypt")
+def encrypt_bytes(algorithm, key, data, cache=cipher_cache):
+    """Pad and encrypt data (bytes, bytearray, memoryview or str)."""
+    return get_cipher(algorithm, key, cache).encrypt(pad(data, BLOCK_SIZES[algorithm]))
+
+
+@timed("crypto.decrypt")
+def decrypt_bytes(algorithm, key, data, cache=cipher_cache):
+    """Decrypt data and strip its padding."""
+    return unpad(get_cipher(algorithm, key, cache).decrypt(to_bytes(data)), BLOCK_SIZES[algorithm])
+
+
+# -------------------
+# Zero-copy API: caller-supplied buffers, padding written in place
+# -------------------
+def padded_size(length, block_size):
+    """Ciphertext length for length plaintext bytes under PKCS#7."""
+    return length + block_size - length % block_size
+
+
+def encrypt_in_place(algorithm, key, buf, length, cache=cipher_cache):
+    """Pad buf[:length] in place and encrypt it in place; returns the ciphertext length.
+
+    buf must be writable with room for the padding (see padded_size).
+    """
+    block = BLOCK_SIZES[algorithm]
+    total = padded_size(length, block)
+    view = memoryview(buf).cast("B")
+    if len(view) < total:
+        raise ValueError(f"Buffer too small: need {total} bytes, have {len(view)}")
+    view[length:total] = bytes((total - length,)) * (total - length)
+    get_cipher(algorithm, key, cache).encrypt(view[:total], output=view[:total])
+    return total
+
+
+def encrypt_into(algorithm, key, data, out, cache=cipher_cache):
+    """Encrypt data into the writable buffer out (no intermediate objects); returns bytes written."""
+    data = to_bytes(data)
+    view = memoryview(out).cast("B")
+    if len(view) < padded_size(len(data), BLOCK_SIZES[algorithm]):
+        raise ValueError("Output buffer too small")
+    view[:len(data)] = data
+    return encrypt_in_place(algorithm, key, view, len(data), cache)
+
+
+def _padding_length(view, block_size):
+    """Validate PKCS#7 padding at the end of view and return its length."""
+    if not len(view) or len(view) % block_size:
+        raise ValueError("Ciphertext length is not a multiple of the block size")
+    n = view[-1]
+    if n == 0 or n > block_size or view[-n:] != bytes((n,)) * n:
+        raise ValueError("Invalid padding")
+    return n
+
+
+def decrypt_in_place(algorithm, key, buf, length=None, cache=cipher_cache):
+    """Decrypt buf[:length] in place; returns the plaintext length (padding left in the buffer)."""
+    view = memoryview(buf).cast("B")
+    view = view[:len(view) if length is None else length]
+    get_cipher(algorithm, key, cache).decrypt(view, output=view)
+    return len(view) - _padding_length(view, BLOCK_SIZES[algorithm])
+
+
+def decrypt_into(algorithm, key, data, out, cache=cipher_cache):
+    """Decrypt data into the writable buffer out; returns the plaintext length."""
+    data = to_bytes(data)
+    view = memoryview(out).cast("B")
+    if len(view) < len(data):
+        raise ValueError("Output buffer too small")
+    get_cipher(algorithm, key, cache).decrypt(data, output=view[:len(data)])
+    return len(data) - _padding_length(view[:len(data)], BLOCK_SIZES[algorithm])
+
+
+# -------------------
+# Memory-mapped file API
+# -------------------
+def encrypt_file(algorithm, key, src_path, dst_path, chunk_size=MMAP_CHUNK_SIZE):
+    """Encrypt a file to another through mmap: the cipher reads the source pages and
+    writes the destination pages directly, so no file-sized Python object is built.
+    Returns the ciphertext size."""
+    block = BLOCK_SIZES[algorithm]
+    check_chunk_size(chunk_size, block)
+    chunk_size -= chunk_size % block
+    cipher = get_cipher(algorithm, key)
+    size = os.path.getsize(src_path)
+    full = size - size % block
+    total = padded_size(size, block)
+    with open(src_path, "rb") as src, open(dst_path, "w+b") as dst:
+        dst.truncate(total)
+        with mmap.mmap(dst.fileno(), total) as out_map:
+            out = memoryview(out_map)
+            try:
+                if full:
+                    with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as in_map:
+                        inp = memoryview(in_map)
+                        try:
+                            for off in range(0, full, chunk_size):
+                                end = min(off + chunk_size, full)
+                                cipher.encrypt(inp[off:end], output=out[off:end])
+                        finally:
+                            inp.release()
+                src.seek(full)
+                tail = bytearray(block)
+                tail[:size - full] = src.read()
+                encrypt_in_place(algorithm, key, tail, size - full)
+                out[full:total] = tail
+            finally:
+                out.release()
+    return total
+
+
+def decrypt_file(algorithm, key, src_path, dst_path, chunk_size=MMAP_CHUNK_SIZE):
+    """Inverse of encrypt_file; the last block is decrypted first to size the output.
+    Returns the plaintext size."""
+    block = BLOCK_SIZES[algorithm]
+    check_chunk_size(chunk_size, block)
+    chunk_size -= chunk_size % block
+    cipher = get_cipher(algorithm, key)
+    size = os.path.getsize(src_path)
+    if size == 0 or size % block:
+        raise ValueError("Ciphertext length is not a multiple of the block size")
+    with open(src_path, "rb") as src, open(dst_path, "w+b") as dst, \
+            mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as in_map:
+        inp = memoryview(in_map)
+        try:
+            last = bytearray(block)
+            cipher.decrypt(inp[size - block:], output=last)
+            keep = block - _padding_length(last, block)
+            plain = size - block + keep
+            if plain:
+                dst.truncate(plain)
+                with mmap.mmap(dst.fileno(), plain) as out_map:
+                    out = memoryview(out_map)
+                    try:
+                        body = size - block
+                        for off in range(0, body, chunk_size):
+                            end = min(off + chunk_size, body)
+                            cipher.decrypt(inp[off:end], output=out[off:end])
+                        out[body:plain] = last[:keep]
+                    finally:
+                        out.release()
+        finally:
+            inp.release()
+    return plain
+
+
+# -------------------
+# Streaming API
+# -------------------
+class StreamEncryptor:
+    """Incremental encryptor: feed chunks to update(), then call finalize() once.
+
+    Only a partial block (< block size) is ever buffered between calls, so memory
+    use is bounded by the size of the chunks passed in. cipher overrides the
+    cached ECB cipher, e.g. with a stateful CBC cipher object.
+    """
+
+    def __init__(self, algorithm, key, cipher=None):
+        self.block_size = BLOCK_SIZES[algorithm]
+        self._cipher = cipher or get_cipher(algorithm, key)
+        self._buffer = b""
+
+    def update(self, chunk):
+        data = to_bytes(chunk)
+        if self._buffer:
+            data = memoryview(self._buffer + data)
+        n = len(data) - len(data) % self.block_size
+        self._buffer = bytes(data[n:])
+        return self._cipher.encrypt(data[:n]) if n else b""
+
+    def finalize(self):
+        out = self._cipher.encrypt(pad(self._buffer, self.block_size))
+        self._buffer = b""
+        return out
+
+
+class StreamDecryptor:
+    """Incremental decryptor: the last full block is held back until finalize()
+    so the padding can be stripped."""
+
+    def __init__(self, algorithm, key, cipher=None):
+        self.block_size = BLOCK_SIZES[algorithm]
+        self._cipher = cipher or get_cipher(algorithm, key)
+        self._buffer = b""
+
+    def update(self, chunk):
+        data = to_bytes(chunk)
+        if self._buffer:
+            data = memoryview(self._buffer + data)
+        n = len(data) - len(data) % self.block_size
+        if n == len(data):
+            n -= self.block_size   # keep the final block for unpadding
+        n = max(n, 0)
+        self._buffer = bytes(data[n:])
+        return self._cipher.decrypt(data[:n]) if n else b""
+
+    def finalize(self):
+        if len(self._buffer) != self.block_size:
+            raise ValueError("Ciphertext length is not a multiple of the block size")
+        out = unpad(self._cipher.decrypt(self._buffer), self.block_size)
+        self._buffer = b""
+        return out
+
+
+def check_chunk_size(chunk_size, block_size=1):
+    """Reject chunk sizes below one block (a zero step would never advance)."""
+    if chunk_size < block_size:
+        raise ValueError(f"chunk_size must be at least {block_size} bytes, got {chunk_size}")
+
+
+def iter_chunks(source, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield byte chunks from a file object, an iterable of chunks, or a single buffer."""
+    check_chunk_size(chunk_size)
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield to_bytes(chunk)
+    elif isinstance(source, (bytes, bytearray, memoryview, str)):
+        view = to_bytes(source)
+        for i in range(0, len(view), chunk_size):
+            yield view[i:i + chunk_size]
+    else:
+        for chunk in source:
+            yield to_bytes(chunk)
+
+
+def encrypt_stream(algorithm, key, source, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield ciphertext chunks for plaintext read from source."""
+    check_chunk_size(chunk_size, BLOCK_SIZES[algorithm])
+    enc = StreamEncryptor(algorithm, key)
+    for chunk in iter_chunks(source, chunk_size):
+        out = enc.update(chunk)
+        if out:
+            yield out
+    yield enc.finalize()
+
+
+def decrypt_stream(algorithm, key, source, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield plaintext chunks for ciphertext read from source."""
+    check_chunk_size(chunk_size, BLOCK_SIZES[algorithm])
+    dec = StreamDecryptor(algorithm, key)
+    for chunk in iter_chunks(source, chunk_size):
+        out = dec.update(chunk)
+        if out:
+            yield out
+    yield dec.finalize()
+
+
+# -------------------
+# Text round-trip helpers used by the scripts
+# -------------------
+def encrypt_decrypt(algorithm, plaintext, key=None):
+    """Encrypt then decrypt plaintext; return (base64 ciphertext, decrypted text)."""
+    cache = cipher_cache
+    if key is None:
+        # a throwaway key would only push real entries out of the shared cache
+        key, cache = new_key(algorithm), None
+    ciphertext = encrypt_bytes(algorithm, key, plaintext, cache)
+    b64 = base64.b64encode(ciphertext).decode()
+    decrypted = decrypt_bytes(algorithm, key, ciphertext, cache).decode()
+    return b64, decrypted
+
+
+def aes_encrypt_decrypt(plaintext, key=None):
+    return encrypt_decrypt("AES", plaintext, key)
+
+
+def des_encrypt_decrypt(plaintext, key=None):
+    return encrypt_decrypt("DES", plaintext, key)
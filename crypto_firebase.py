@@ -1,70 +1,58 @@
-from Crypto.Cipher import AES, DES
-from Crypto.Random import get_random_bytes
-import base64
-import requests
+import os
+from firebase_client import FirebaseClient
+from key_store import KeyStore
+from envelope import seal_text, open_text, size_report
+from portfolio_codec import Portfolio, encrypt_holdings, encrypt_holding, decrypt_holdings
 
 # -------------------
 # CONFIG
 # -------------------
-FIREBASE_URL = "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app"
+FIREBASE_URL = os.getenv("FIREBASE_URL", "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app")
 USER_ID = "UID12345"   # you can change this to another test user
 PORTFOLIO = "BTC=0.25, ETH=1.5"   # sample plaintext portfolio
 
-# -------------------
-# Helpers
-# -------------------
-def pad(data, block_size):
-    padding_len = block_size - len(data) % block_size
-    return data + chr(padding_len) * padding_len
-
-def unpad(data):
-    padding_len = ord(data[-1])
-    return data[:-padding_len]
-
-def aes_encrypt_decrypt(plaintext):
-    key = get_random_bytes(16)  # 128-bit AES key
-    cipher = AES.new(key, AES.MODE_ECB)
-    ciphertext = cipher.encrypt(pad(plaintext, 16).encode())
-    b64 = base64.b64encode(ciphertext).decode()
-
-    decipher = AES.new(key, AES.MODE_ECB)
-    decrypted = unpad(decipher.decrypt(ciphertext).decode())
-    return b64, decrypted
-
-def des_encrypt_decrypt(plaintext):
-    key = get_random_bytes(8)  # 64-bit DES key
-    cipher = DES.new(key, DES.MODE_ECB)
-    ciphertext = cipher.encrypt(pad(plaintext, 8).encode())
-    b64 = base64.b64encode(ciphertext).decode()
-
-    decipher = DES.new(key, DES.MODE_ECB)
-    decrypted = unpad(decipher.decrypt(ciphertext).decode())
-    return b64, decrypted
-
 # -------------------
 # MAIN
 # -------------------
 if __name__ == "__main__":
     print("Plaintext portfolio:", PORTFOLIO)
+    keys = KeyStore()   # per-user keys derived from the local master secret, so the data stays decryptable
 
-    # AES
-    aes_ct, aes_pt = aes_encrypt_decrypt(PORTFOLIO)
+    # AES (versioned envelope: header + optional compression + ciphertext, base85 text)
+    aes_version, aes_key = keys.latest(USER_ID, "AES")
+    aes_ct = seal_text("AES", aes_key, PORTFOLIO, key_version=aes_version)   # version survives key rotation
     print("\nAES Encrypted:", aes_ct)
-    print("AES Decrypted:", aes_pt)
+    print("AES Decrypted:", open_text(keys.resolver(USER_ID, "AES"), aes_ct).decode())
+    print("AES size:", size_report("AES", PORTFOLIO, aes_ct))
 
     # DES
-    des_ct, des_pt = des_encrypt_decrypt(PORTFOLIO)
+    des_version, des_key = keys.latest(USER_ID, "DES")
+    des_ct = seal_text("DES", des_key, PORTFOLIO, key_version=des_version)
     print("\nDES Encrypted:", des_ct)
-    print("DES Decrypted:", des_pt)
+    print("DES Decrypted:", open_text(keys.resolver(USER_ID, "DES"), des_ct).decode())
+    print("DES size:", size_report("DES", PORTFOLIO, des_ct))
+
+    # Field-level AES: one 16-byte ciphertext per asset, all under aes_version (stored alongside)
+    portfolio = Portfolio.from_string(PORTFOLIO)
+    holdings = encrypt_holdings("AES", aes_key, portfolio)
+    print("\nAES holdings:", holdings)
 
     # Push to Firebase
     data = {
         "portfolio_AES": aes_ct,
-        "portfolio_DES": des_ct
+        "portfolio_DES": des_ct,
+        "holdings_AES": holdings,
+        "holdings_AES_key_version": aes_version
     }
-    r = requests.put(f"{FIREBASE_URL}/users/{USER_ID}.json", json=data)
-    print("\nWrite status:", r.status_code)
-
-    # Read back from Firebase
-    r = requests.get(f"{FIREBASE_URL}/users/{USER_ID}.json")
-    print("Data read from Firebase:", r.json())
+    with FirebaseClient(FIREBASE_URL) as client:
+        r = client.request("PUT", f"users/{USER_ID}", json=data)
+        print("\nWrite status:", r.status_code)
+
+        # Update a single asset without re-encrypting the rest (same key version as the map)
+        client.patch(f"users/{USER_ID}/holdings_AES", {"BTC": encrypt_holding("AES", aes_key, "BTC", 0.3)})
+
+        # Read back from Firebase
+        stored = client.get(f"users/{USER_ID}")
+        print("Data read from Firebase:", stored)
+        holdings_key = keys.resolver(USER_ID, "AES")(stored.get("holdings_AES_key_version"))
+        print("Holdings decrypted:", decrypt_holdings("AES", holdings_key, stored["holdings_AES"]).to_string())
@@ -1,97 +1,381 @@
-from Crypto.Cipher import AES, DES
-from Crypto.Random import get_random_bytes
-import base64
-import requests
+import os
+import argparse
+import json
+import platform
+import statistics
+import sys
 import time
+from datetime import datetime, timezone
+from firebase_client import FirebaseClient
+from envelope import seal_text, size_report
+from crypto_core import (aes_encrypt_decrypt, des_encrypt_decrypt, encrypt_bytes, decrypt_bytes, cipher_cache,
+                         encrypt_into, decrypt_into, padded_size, BLOCK_SIZES)
+from cipher_registry import SCHEMES, get_scheme
+from bench_history import BenchHistory, FIREBASE_PATH, history_path, mirror_run, new_run_id
+from key_store import KDF_PARAMS, KeyStore
+from crypto_backends import WORKLOADS, available_backends, cpu_features, backend_versions, fastest, make_backend, supports
 
 # -------------------
 # CONFIG
 # -------------------
-FIREBASE_URL = "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app"
-USER_ID = "UID12345"  # you can change this to another test user
+FIREBASE_URL = os.getenv("FIREBASE_URL", "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app")
 PORTFOLIO = "BTC=0.25, ETH=1.5" * 5000  # large string for benchmark
 
+# Fixed keys for consistent comparison
+KEYS = {
+    "AES": b"1234567890abcdef",  # 16 bytes = 128-bit AES key
+    "DES": b"8bytekey",          # 8 bytes = 64-bit DES key
+}
+
+# Payload sweep: 16 B .. 4 MB
+SWEEP_SIZES = [16, 256, 4 * 1024, 64 * 1024, 1024 * 1024, 4 * 1024 * 1024]
+WARMUP = 5
+TRIALS = 30
+MIN_TRIAL_NS = 2_000_000  # batch small payloads so one trial lasts >= 2 ms
+REFERENCE_MAX_SIZE = 64 * 1024  # the pure-Python AES runs at well under 1 MB/s
+
+# time the cipher work itself, not the metrics wrapper around it
+_encrypt, _decrypt = encrypt_bytes.__wrapped__, decrypt_bytes.__wrapped__
+
 
 # -------------------
-# Helpers
+# Benchmark harness
 # -------------------
-def pad(data, block_size):
-    padding_len = block_size - len(data) % block_size
-    return data + chr(padding_len) * padding_len
+def make_payload(size):
+    """Portfolio-like plaintext of exactly size bytes."""
+    seed = b"BTC=0.25, ETH=1.5"
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+def time_call(fn, warmup=WARMUP, trials=TRIALS, min_trial_ns=MIN_TRIAL_NS):
+    """Run fn for warmup iterations, then time `trials` batches.
 
+    Returns (per-call latencies in ns, calls per batch).
+    """
+    for _ in range(warmup):
+        fn()
+    # calibrate batch size so tiny payloads are not dominated by timer resolution
+    start = time.perf_counter_ns()
+    fn()
+    single = max(time.perf_counter_ns() - start, 1)
+    iterations = max(1, min_trial_ns // single)
+
+    samples = []
+    for _ in range(trials):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter_ns() - start) / iterations)
+    return samples, iterations
+
+
+def summarize(samples, size):
+    """Latency percentiles (ns) and median throughput (MB/s) for one series."""
+    if len(samples) > 1:
+        q = statistics.quantiles(samples, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+        stdev = statistics.stdev(samples)
+    else:
+        p50 = p95 = p99 = samples[0]
+        stdev = 0.0
+    return {
+        "p50_ns": round(p50, 1),
+        "p95_ns": round(p95, 1),
+        "p99_ns": round(p99, 1),
+        "mean_ns": round(statistics.fmean(samples), 1),
+        "stdev_ns": round(stdev, 1),
+        "mb_per_s": round(size / p50 * 1e9 / 1e6, 3) if p50 else None,
+        "samples_ns": [round(s, 1) for s in samples],   # kept for the history store; not printed
+    }
 
-def unpad(data):
-    padding_len = ord(data[-1])
-    return data[:-padding_len]
 
+def run_sweep(sizes=SWEEP_SIZES, algorithms=("AES", "DES"), warmup=WARMUP, trials=TRIALS,
+              key_states=("warm",), zero_copy=False):
+    """Benchmark encrypt and decrypt separately for every algorithm and size.
 
-def aes_encrypt_decrypt(plaintext, key=None):
-    if key is None:
-        key = get_random_bytes(16)  # 128-bit AES key
-    cipher = AES.new(key, AES.MODE_ECB)
-    ciphertext = cipher.encrypt(pad(plaintext, 16).encode())
-    b64 = base64.b64encode(ciphertext).decode()
+    key_states picks how the cipher is obtained: "warm" reuses the cached key
+    schedule, "cold" builds a fresh cipher (full key expansion) on every call.
+    zero_copy adds encrypt_into/decrypt_into directions writing into buffers
+    preallocated once per series.
+    """
+    results = []
+    for size in sizes:
+        payload = make_payload(size)
+        for algorithm in algorithms:
+            key = KEYS[algorithm]
+            ciphertext = encrypt_bytes(algorithm, key, payload)
+            for key_state in key_states:
+                cache = cipher_cache if key_state == "warm" else None
+                directions = {
+                    "encrypt": lambda: _encrypt(algorithm, key, payload, cache),
+                    "decrypt": lambda: _decrypt(algorithm, key, ciphertext, cache),
+                }
+                if zero_copy:
+                    buf = bytearray(padded_size(size, BLOCK_SIZES[algorithm]))
+                    directions.update({
+                        "encrypt_into": lambda: encrypt_into(algorithm, key, payload, buf, cache),
+                        "decrypt_into": lambda: decrypt_into(algorithm, key, ciphertext, buf, cache),
+                    })
+                for direction, fn in directions.items():
+                    samples, iterations = time_call(fn, warmup, trials)
+                    row = {
+                        "algorithm": algorithm,
+                        "direction": direction,
+                        "key_state": key_state,
+                        "size_bytes": size,
+                        "iterations": iterations,
+                        "trials": trials,
+                    }
+                    row.update(summarize(samples, size))
+                    results.append(row)
+    return results
 
-    decipher = AES.new(key, AES.MODE_ECB)
-    decrypted = unpad(decipher.decrypt(ciphertext).decode())
-    return b64, decrypted
 
+def run_matrix(sizes=SWEEP_SIZES, schemes=None, warmup=WARMUP, trials=TRIALS):
+    """Benchmark encrypt and decrypt for every registered cipher/mode scheme and size.
 
-def des_encrypt_decrypt(plaintext, key=None):
-    if key is None:
-        key = get_random_bytes(8)  # 64-bit DES key
-    cipher = DES.new(key, DES.MODE_ECB)
-    ciphertext = cipher.encrypt(pad(plaintext, 8).encode())
-    b64 = base64.b64encode(ciphertext).decode()
+    Each encrypt draws a fresh IV/nonce, as a real message would; AEAD decrypt
+    includes tag verification.
+    """
+    results = []
+    for name in schemes or list(SCHEMES):
+        scheme = get_scheme(name)
+        key = scheme.new_key()
+        for size in sizes:
+            payload = make_payload(size)
+            nonce, ciphertext = scheme.encrypt(key, payload)
+            directions = {
+                "encrypt": lambda: scheme.encrypt(key, payload),
+                "decrypt": lambda: scheme.decrypt(key, nonce, ciphertext),
+            }
+            for direction, fn in directions.items():
+                samples, iterations = time_call(fn, warmup, trials)
+                row = {
+                    "scheme": scheme.name,
+                    "algorithm": scheme.algorithm,
+                    "mode": scheme.mode,
+                    "key_bits": scheme.key_size * 8,
+                    "direction": direction,
+                    "size_bytes": size,
+                    "iterations": iterations,
+                    "trials": trials,
+                }
+                row.update(summarize(samples, size))
+                results.append(row)
+    return results
 
-    decipher = DES.new(key, DES.MODE_ECB)
-    decrypted = unpad(decipher.decrypt(ciphertext).decode())
-    return b64, decrypted
+
+def run_backends(sizes=SWEEP_SIZES, workloads=None, backends=None, warmup=WARMUP, trials=TRIALS,
+                 reference_max_size=REFERENCE_MAX_SIZE):
+    """Run the same raw workloads through every available crypto backend.
+
+    Sizes are rounded down to whole AES blocks; the pure-Python reference only
+    runs ECB/CBC/CTR and sizes up to reference_max_size.
+    """
+    results = []
+    for workload in workloads or list(WORKLOADS):
+        key = bytes(range(WORKLOADS[workload]))
+        for backend in backends or available_backends():
+            if not supports(backend, workload):
+                continue
+            encrypt, decrypt = make_backend(backend, workload, key)
+            for size in sizes:
+                size = max(16, size - size % 16)
+                if backend == "reference" and size > reference_max_size:
+                    continue
+                payload = make_payload(size)
+                ciphertext = encrypt(payload)
+                for direction, fn in (("encrypt", lambda: encrypt(payload)), ("decrypt", lambda: decrypt(ciphertext))):
+                    samples, iterations = time_call(fn, warmup, trials)
+                    row = {
+                        "backend": backend,
+                        "workload": workload,
+                        "direction": direction,
+                        "size_bytes": size,
+                        "iterations": iterations,
+                        "trials": trials,
+                    }
+                    row.update(summarize(samples, size))
+                    results.append(row)
+    return results
+
+
+def run_kdf(kdfs=None, users=1000, records_per_user=10, warmup=WARMUP, trials=TRIALS):
+    """Cost of fetching a per-user key with and without the derived-key cache.
+
+    "uncached" is a metadata lookup plus a full KDF run on every call; "cached"
+    is an LRU hit for the current version and another for the key. bulk_ms projects a job of users x records_per_user records:
+    uncached pays the KDF per record, cached once per user.
+    """
+    results = []
+    master = bytes(32)
+    for kdf in kdfs or list(KDF_PARAMS):
+        for key_state, cache_size in (("uncached", 0), ("cached", 16)):
+            with KeyStore(":memory:", master, kdf, cache_size) as store:
+                store.key_for("UID00000001")
+                samples, iterations = time_call(lambda: store.key_for("UID00000001"), warmup, trials)
+            row = {
+                "kdf": kdf,
+                "direction": "derive",
+                "key_state": key_state,
+                "size_bytes": 16,
+                "iterations": iterations,
+                "trials": trials,
+            }
+            row.update(summarize(samples, 16))
+            row["mb_per_s"] = None
+            results.append(row)
+        uncached, cached = results[-2]["p50_ns"], results[-1]["p50_ns"]
+        records = users * records_per_user
+        results[-2]["bulk_ms"] = round(records * uncached / 1e6, 1)
+        results[-1]["bulk_ms"] = round((users * uncached + (records - users) * cached) / 1e6, 1)
+        for row in results[-2:]:
+            row.update(users=users, records_per_user=records_per_user)
+    return results
+
+
+def run_metadata(warmup, trials):
+    import Crypto
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "pycryptodome": Crypto.__version__,
+        "versions": backend_versions(),
+        "warmup": warmup,
+        "trials": trials,
+        "clock": "perf_counter_ns",
+    }
 
 
 # -------------------
-# MAIN
+# Legacy single-number benchmark
 # -------------------
-if __name__ == "__main__":
+LEGACY_RUNS = 1000
+LEGACY_BATCHES = 10   # the 1000 runs are timed in batches so runs can be compared statistically
+
+
+def time_legacy(fn):
+    """Time LEGACY_RUNS calls of fn; returns (total ms, per-call ns per batch, last result)."""
+    per_batch = LEGACY_RUNS // LEGACY_BATCHES
+    samples = []
+    for _ in range(LEGACY_BATCHES):
+        start = time.perf_counter_ns()
+        for _ in range(per_batch):
+            result = fn()
+        samples.append((time.perf_counter_ns() - start) / per_batch)
+    return sum(samples) * per_batch / 1e6, samples, result
+
+
+def run_legacy():
+    """The original 1000-run AES vs DES timing; returns result rows for the history store."""
     print("Plaintext portfolio:", PORTFOLIO[:50] + "...")  # preview only
 
-    # Fixed keys for consistent comparison
-    aes_key = b"1234567890abcdef"  # 16 bytes = 128-bit AES key
-    des_key = b"8bytekey"          # 8 bytes = 64-bit DES key
-
-    # AES benchmark
-    start = time.time()
-    for _ in range(1000):
-        aes_ct, aes_pt = aes_encrypt_decrypt(PORTFOLIO, key=aes_key)
-    end = time.time()
-    aes_time = (end - start) * 1000  # ms
-    print(f"\nAES (1000 runs): {aes_time:.2f} ms")
-    print("AES sample ciphertext:", aes_ct[:100] + "...")
-    print("AES final decrypted:", aes_pt[:50] + "...")
-
-    # DES benchmark
-    start = time.time()
-    for _ in range(1000):
-        des_ct, des_pt = des_encrypt_decrypt(PORTFOLIO, key=des_key)
-    end = time.time()
-    des_time = (end - start) * 1000  # ms
-    print(f"\nDES (1000 runs): {des_time:.2f} ms")
-    print("DES sample ciphertext:", des_ct[:100] + "...")
-    print("DES final decrypted:", des_pt[:50] + "...")
-
-    # Push only truncated ciphertext to Firebase
-    data = {
-        "portfolio_AES": aes_ct[:100] + "...",  # 👈 safely truncated
-        "portfolio_DES": des_ct[:100] + "...",  # 👈 safely truncated
-        "benchmark": {
-            "AES_ms": round(aes_time, 2),
-            "DES_ms": round(des_time, 2)
+    results = []
+    for algorithm, fn in (("AES", aes_encrypt_decrypt), ("DES", des_encrypt_decrypt)):
+        key = KEYS[algorithm]
+        total_ms, samples, (ct, pt) = time_legacy(lambda: fn(PORTFOLIO, key=key))
+        print(f"\n{algorithm} ({LEGACY_RUNS} runs): {total_ms:.2f} ms")
+        print(f"{algorithm} sample ciphertext:", ct[:100] + "...")
+        print(f"{algorithm} final decrypted:", pt[:50] + "...")
+        print(f"{algorithm} envelope size:", size_report(algorithm, PORTFOLIO, seal_text(algorithm, key, PORTFOLIO)))
+        row = {
+            "algorithm": algorithm,
+            "direction": "roundtrip",
+            "size_bytes": len(PORTFOLIO),
+            "iterations": LEGACY_RUNS // LEGACY_BATCHES,
+            "trials": LEGACY_BATCHES,
+            "total_ms": round(total_ms, 2),
         }
-    }
+        row.update(summarize(samples, len(PORTFOLIO)))
+        results.append(row)
+    return results
 
-    r = requests.put(f"{FIREBASE_URL}/users/{USER_ID}.json", json=data)
-    print("\nWrite status:", r.status_code)
 
-    # Read back from Firebase
-    r = requests.get(f"{FIREBASE_URL}/users/{USER_ID}.json")
-    print("Data read from Firebase:", r.json())
+# -------------------
+# MAIN
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AES vs DES benchmark")
+    parser.add_argument("--sweep", action="store_true",
+                        help="run the payload-size sweep and print JSON instead of the legacy Firebase run")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SWEEP_SIZES, help="payload sizes in bytes")
+    parser.add_argument("--algorithms", nargs="+", default=["AES", "DES"], choices=sorted(KEYS))
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--trials", type=int, default=TRIALS)
+    parser.add_argument("--key-cost", action="store_true",
+                        help="also time cold-key calls (fresh key schedule every call) next to warm, cached ones")
+    parser.add_argument("--zero-copy", action="store_true",
+                        help="also time encrypt_into/decrypt_into with preallocated output buffers")
+    parser.add_argument("--matrix", action="store_true",
+                        help="run every registered cipher/mode scheme (AES-128/192/256 ECB/CBC/CTR/GCM, "
+                             "DES, 3DES, ChaCha20-Poly1305) instead of the AES/DES ECB sweep")
+    parser.add_argument("--schemes", nargs="+", choices=list(SCHEMES), help="subset of schemes for --matrix")
+    parser.add_argument("--backends", nargs="*", metavar="BACKEND",
+                        help="compare crypto backends (pycryptodome, cryptography, reference) on the same "
+                             "workloads and report detected CPU features; no names = all available")
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), help="subset of workloads for --backends")
+    parser.add_argument("--kdf", nargs="*", metavar="KDF",
+                        help="time per-user key derivation (hkdf, pbkdf2, scrypt) with and without "
+                             "the key cache; no names = all")
+    parser.add_argument("--kdf-users", type=int, default=1000, help="users in the --kdf bulk projection")
+    parser.add_argument("--kdf-records", type=int, default=10, help="records per user in the --kdf bulk projection")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--history", help="SQLite file every run is appended to "
+                                           "(default: $BENCH_HISTORY or the per-user data directory)")
+    parser.add_argument("--no-history", action="store_true", help="do not record this run")
+    parser.add_argument("--mirror", action=argparse.BooleanOptionalAction, default=None,
+                        help=f"also PUT the run to Firebase under {FIREBASE_PATH}/ (default: on for the legacy run)")
+    args = parser.parse_args(argv)
+
+    meta = run_metadata(args.warmup, args.trials)
+    report = {"meta": meta}
+    if args.kdf is not None:
+        kind = "kdf"
+        results = run_kdf(args.kdf or None, args.kdf_users, args.kdf_records, args.warmup, args.trials)
+    elif args.backends is not None:
+        kind = "backends"
+        results = run_backends(args.sizes, args.workloads, args.backends or None, args.warmup, args.trials)
+        report.update(cpu=cpu_features(), fastest=fastest(results))
+        meta["cpu"] = report["cpu"]
+    elif args.matrix:
+        kind = "matrix"
+        results = run_matrix(args.sizes, args.schemes, args.warmup, args.trials)
+    elif args.sweep:
+        kind = "sweep"
+        results = run_sweep(args.sizes, args.algorithms, args.warmup, args.trials,
+                            ("cold", "warm") if args.key_cost else ("warm",), args.zero_copy)
+    else:
+        kind = "legacy"
+        meta.update(warmup=0, trials=LEGACY_BATCHES)
+        results = run_legacy()
+    report["results"] = results
+
+    run_id = new_run_id(meta["timestamp"])
+    if not args.no_history:
+        args.history = args.history or history_path()
+        with BenchHistory(args.history) as history:
+            history.record(meta, results, kind, run_id)
+        print(f"Recorded {kind} run {run_id} in {args.history}", file=sys.stderr)
+    if args.mirror or (args.mirror is None and kind == "legacy"):
+        with FirebaseClient(FIREBASE_URL) as client:
+            mirror_run(client, run_id, meta, results, kind)
+        print(f"Mirrored run to {FIREBASE_PATH}/{run_id}", file=sys.stderr)
+    if kind != "legacy":
+        write_report(report, args.output)
+
+
+def write_report(report, output=None):
+    report = dict(report, results=[{k: v for k, v in r.items() if k != "samples_ns"} for r in report["results"]])
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(report['results'])} results to {output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+
+# -------------------
+# CONFIG
+# -------------------
+APP_NAME = "pocs"
+DATA_DIR = os.getenv("POCS_DATA") or os.path.join(
+    os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"), APP_NAME)
+
+
+def data_path(name, create=True):
+    """Path for a local state file (history, key store, master key) outside the checkout.
+
+    Call it when the file is about to be used, not at import: with create the
+    directory is made on the spot.
+    """
+    if create:
+        os.makedirs(DATA_DIR, mode=0o700, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
@@ -0,0 +1,316 @@
+import base64
+import json
+import struct
+import zlib
+from collections import namedtuple
+from crypto_core import (BLOCK_SIZES, STREAM_CHUNK_SIZE, check_chunk_size, encrypt_bytes, decrypt_bytes,
+                         iter_chunks, to_bytes)
+from cipher_registry import find_scheme
+from metrics import timed
+
+try:
+    import zstandard
+except ImportError:   # zstd is optional; zlib is always available
+    zstandard = None
+
+# -------------------
+# Format
+# -------------------
+# magic "PE" | version | algorithm id | mode id | flags | iv length | iv | [varint key version] |
+# varint original length | ciphertext
+MAGIC = b"PE"
+STREAM_MAGIC = b"PS"    # same header, then ciphertext of unknown length (and the AEAD tag last)
+VERSION = 1
+HEADER = struct.Struct(">2sBBBBB")
+
+ALGORITHMS = {"AES": 1, "DES": 2, "3DES": 3, "ChaCha20": 4}
+MODES = {"ECB": 1, "CBC": 2, "CTR": 3, "GCM": 4, "Poly1305": 5}   # the IV/nonce goes in the iv field
+COMPRESSORS = {None: 0, "zlib": 1, "zstd": 2}   # stored in the low bits of flags
+COMPRESSION_MASK = 0x03
+KEY_VERSION_FLAG = 0x04   # a varint key version follows the iv (per-user keys that rotate)
+JSON_FLAG = 0x08          # the plaintext is compact JSON for a non-string value (see seal_value)
+
+MAX_VARINT_BYTES = 10     # enough for any 64-bit value
+
+HEADER_TEXT_CHARS = 5 * -(-(HEADER.size + 255 + MAX_VARINT_BYTES) // 4)   # base85 chars covering any header
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+Header = namedtuple("Header", "version algorithm mode compression iv key_version is_json original_length body_offset")
+
+
+class EnvelopeError(ValueError):
+    pass
+
+
+def _lookup(table, value):
+    for name, ident in table.items():
+        if ident == value:
+            return name
+    raise EnvelopeError(f"Unknown id {value}")
+
+
+# -------------------
+# Varints (LEB128) keep small lengths to 1-2 bytes
+# -------------------
+def _encode_varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _decode_varint(buf, offset):
+    shift = result = 0
+    while True:
+        if offset >= len(buf):
+            raise EnvelopeError("Truncated length field")
+        byte = buf[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, offset
+        shift += 7
+
+
+# -------------------
+# Compression
+# -------------------
+def compress(data, method):
+    if method == "zlib":
+        return zlib.compress(data, ZLIB_LEVEL)
+    if method == "zstd":
+        if zstandard is None:
+            raise EnvelopeError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+
+def decompress(data, method):
+    """Inverse of compress(); corrupt input (e.g. decrypted with the wrong key) raises EnvelopeError."""
+    if method == "zlib":
+        try:
+            return zlib.decompress(data)
+        except zlib.error as exc:
+            raise EnvelopeError(f"Corrupt zlib body (wrong key?): {exc}") from None
+    if method == "zstd":
+        if zstandard is None:
+            raise EnvelopeError("zstd decompression needs the zstandard package")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data)
+        except zstandard.ZstdError as exc:
+            raise EnvelopeError(f"Corrupt zstd body (wrong key?): {exc}") from None
+    return data
+
+
+def default_compression():
+    return "zstd" if zstandard is not None else "zlib"
+
+
+# -------------------
+# Seal / open
+# -------------------
+@timed("envelope.seal")
+def seal(algorithm, key, plaintext, compression="auto", mode="ECB", iv=b"", key_version=None, is_json=False):
+    """Encrypt plaintext into a binary envelope.
+
+    compression is None, "zlib", "zstd" or "auto" (compress with the best
+    available codec, but only keep the result if it is smaller). Modes other
+    than ECB go through cipher_registry; a fresh IV/nonce is drawn unless iv is given.
+    key_version (e.g. from KeyStore.latest()) is recorded so the right key can
+    be found after a rotation.
+    """
+    data = to_bytes(plaintext)
+    method = default_compression() if compression == "auto" else compression
+    body = compress(data, method) if method else data
+    if compression == "auto" and len(body) >= len(data):
+        method, body = None, data
+    if mode == "ECB":
+        ciphertext = encrypt_bytes(algorithm, key, body)
+    else:
+        iv, ciphertext = find_scheme(algorithm, mode, len(key)).encrypt(key, body, iv or None)
+    flags = COMPRESSORS[method] | (JSON_FLAG if is_json else 0)
+    header = _pack_header(MAGIC, algorithm, mode, flags, iv, key_version)
+    return b"".join((header, _encode_varint(len(data)), ciphertext))
+
+
+def _pack_header(magic, algorithm, mode, flags, iv, key_version):
+    if key_version is None:
+        return HEADER.pack(magic, VERSION, ALGORITHMS[algorithm], MODES[mode], flags, len(iv)) + iv
+    return (HEADER.pack(magic, VERSION, ALGORITHMS[algorithm], MODES[mode], flags | KEY_VERSION_FLAG, len(iv))
+            + iv + _encode_varint(key_version))
+
+
+def _unpack_header(blob, magic):
+    """Fixed fields, iv and key version; returns (algorithm, mode, flags, iv, key_version, offset)."""
+    if len(blob) < HEADER.size:
+        raise EnvelopeError("Too short to be an envelope")
+    found, version, alg_id, mode_id, flags, iv_len = HEADER.unpack_from(blob)
+    if found != magic:
+        raise EnvelopeError("Not an envelope (bad magic)")
+    if version != VERSION:
+        raise EnvelopeError(f"Unsupported envelope version {version}")
+    offset = HEADER.size + iv_len
+    iv = bytes(blob[HEADER.size:offset])
+    if len(iv) != iv_len:
+        raise EnvelopeError("Truncated IV")
+    key_version = None
+    if flags & KEY_VERSION_FLAG:
+        key_version, offset = _decode_varint(blob, offset)
+    return _lookup(ALGORITHMS, alg_id), _lookup(MODES, mode_id), flags, iv, key_version, offset
+
+
+def _resolve_key(key, key_version):
+    """key is bytes, or a key_version -> key callable (e.g. KeyStore.resolver()); None means unrecorded."""
+    return key(key_version) if callable(key) else key
+
+
+def parse_header(blob):
+    blob = to_bytes(blob)
+    algorithm, mode, flags, iv, key_version, offset = _unpack_header(blob, MAGIC)
+    original_length, offset = _decode_varint(blob, offset)
+    return Header(VERSION, algorithm, mode, _lookup(COMPRESSORS, flags & COMPRESSION_MASK), iv,
+                  key_version, bool(flags & JSON_FLAG), original_length, offset)
+
+
+@timed("envelope.open")
+def open_envelope(key, blob):
+    """Decrypt an envelope and return the original plaintext bytes.
+
+    key may be a key_version -> key callable, for envelopes sealed under rotating per-user keys.
+    """
+    blob = to_bytes(blob)
+    header = parse_header(blob)
+    key = _resolve_key(key, header.key_version)
+    if header.mode == "ECB":
+        body = decrypt_bytes(header.algorithm, key, blob[header.body_offset:])
+    else:
+        scheme = find_scheme(header.algorithm, header.mode, len(key))
+        body = scheme.decrypt(key, header.iv, blob[header.body_offset:])
+    data = decompress(body, header.compression)
+    if len(data) != header.original_length:
+        raise EnvelopeError("Length mismatch after decryption")
+    return data
+
+
+# -------------------
+# Streams: files and pipes of any size, constant memory
+# -------------------
+def seal_stream(algorithm, key, source, mode="ECB", chunk_size=STREAM_CHUNK_SIZE, key_version=None):
+    """Yield a stream envelope (header, then ciphertext chunks) for plaintext read from source.
+
+    No length or compression field: the input size need not be known up front.
+    """
+    check_chunk_size(chunk_size, BLOCK_SIZES.get(algorithm, 1))
+    iv, enc = find_scheme(algorithm, mode, len(key)).encryptor(key)
+    yield _pack_header(STREAM_MAGIC, algorithm, mode, 0, iv, key_version)
+    for chunk in iter_chunks(source, chunk_size):
+        out = enc.update(chunk)
+        if out:
+            yield out
+    yield enc.finalize()
+
+
+def open_stream(key, source, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield plaintext chunks from a stream envelope.
+
+    For GCM/ChaCha20-Poly1305 the tag is only checked when the last chunk is
+    produced; an exception at that point means everything yielded must be discarded.
+    """
+    chunks = iter_chunks(source, chunk_size)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= HEADER.size and len(head) >= HEADER.size + head[HEADER.size - 1] + MAX_VARINT_BYTES:
+            break
+    algorithm, mode, _, iv, key_version, offset = _unpack_header(head, STREAM_MAGIC)
+    check_chunk_size(chunk_size, BLOCK_SIZES.get(algorithm, 1))
+    key = _resolve_key(key, key_version)
+    dec = find_scheme(algorithm, mode, len(key)).decryptor(key, iv)
+    rest = head[offset:]
+    if rest:
+        out = dec.update(rest)
+        if out:
+            yield out
+    for chunk in chunks:
+        out = dec.update(chunk)
+        if out:
+            yield out
+    yield dec.finalize()
+
+
+# -------------------
+# Transport encoding (Firebase stores strings)
+# -------------------
+def to_text(blob):
+    """Base85: 25% overhead instead of base64's 33%, and no characters JSON must escape."""
+    return base64.b85encode(blob).decode("ascii")
+
+
+def from_text(text):
+    return base64.b85decode(text)
+
+
+def seal_text(algorithm, key, plaintext, compression="auto", mode="ECB", key_version=None):
+    return to_text(seal(algorithm, key, plaintext, compression, mode, key_version=key_version))
+
+
+def open_text(key, text):
+    return open_envelope(key, from_text(text))
+
+
+def seal_value(algorithm, key, value, compression="auto", mode="ECB", key_version=None):
+    """seal_text() for a record value: strings as-is, anything else as compact JSON,
+    flagged so open_value() gives back the same type."""
+    if isinstance(value, str):
+        return seal_text(algorithm, key, value, compression, mode, key_version)
+    plaintext = json.dumps(value, separators=(",", ":"), sort_keys=True)
+    return to_text(seal(algorithm, key, plaintext, compression, mode, key_version=key_version, is_json=True))
+
+
+def open_value(key, text):
+    """Inverse of seal_value(): the string, or the decoded JSON value."""
+    blob = from_text(text)
+    data = open_envelope(key, blob)
+    if not parse_header(blob).is_json:
+        return data.decode()
+    try:
+        return json.loads(data)
+    except ValueError as exc:
+        raise EnvelopeError(f"Corrupt JSON body: {exc}") from None
+
+
+def describe(text):
+    """Header of a stored envelope string, or None for legacy base64 ciphertext."""
+    try:
+        return parse_header(from_text(text))
+    except (ValueError, EnvelopeError):
+        return None
+
+
+def key_version(text):
+    """Key version recorded in a stored envelope string (None if absent); decodes only the header."""
+    try:
+        return _unpack_header(from_text(text[:HEADER_TEXT_CHARS]), MAGIC)[4]
+    except (ValueError, EnvelopeError):
+        return None
+
+
+def size_report(algorithm, plaintext, text):
+    """Bytes stored for one record as an envelope vs. the legacy base64(ECB ciphertext)."""
+    n = len(to_bytes(plaintext))
+    block = BLOCK_SIZES[algorithm]
+    legacy = 4 * -(-(n + block - n % block) // 3)    # base64 of the padded ciphertext
+    return {
+        "plaintext_bytes": n,
+        "legacy_bytes": legacy,
+        "envelope_bytes": len(text),
+        "saved_bytes": legacy - len(text),
+        "saved_pct": round(100 * (legacy - len(text)) / legacy, 1) if legacy else 0.0,
+    }
@@ -0,0 +1,132 @@
+import asyncio
+import aiohttp
+import metrics
+from firebase_client import FIREBASE_URL, RETRIES, BACKOFF, RETRY_STATUS
+
+# -------------------
+# CONFIG
+# -------------------
+CONCURRENCY = 64              # max requests in flight at once
+DEADLINE = 10.0               # seconds per request, including retries
+
+
+class FirebaseRequestError(Exception):
+    """Non-retryable (or retried-out) HTTP error from the RTDB."""
+
+    def __init__(self, status, path):
+        super().__init__(f"Firebase returned status code {status} for {path}")
+        self.status = status
+        self.path = path
+
+
+# -------------------
+# Client
+# -------------------
+class AsyncFirebaseClient:
+    """asyncio RTDB client: one aiohttp session, a semaphore bounding in-flight
+    requests, and a per-request deadline.
+
+    Use as `async with AsyncFirebaseClient(url) as client: ...`.
+    """
+
+    def __init__(self, base_url=FIREBASE_URL, concurrency=CONCURRENCY, deadline=DEADLINE,
+                 retries=RETRIES, backoff=BACKOFF, auth=None):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.auth = auth
+        self._sem = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def url(self, path):
+        path = path.strip("/")
+        return f"{self.base_url}/{path}.json" if path else f"{self.base_url}/.json"
+
+    async def _attempts(self, method, path, params, data):
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                async with self._session.request(method, self.url(path), params=params, json=data) as res:
+                    if res.status < 400:
+                        return await res.json(content_type=None)
+                    if res.status not in RETRY_STATUS or last:
+                        raise FirebaseRequestError(res.status, path)
+            except aiohttp.ClientError:
+                if last:
+                    raise
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def request(self, method, path, params=None, data=None, deadline=None):
+        """Send one request and return the decoded JSON body."""
+        params = dict(params or {})
+        if self.auth:
+            params["auth"] = self.auth
+        async with self._sem:
+            with metrics.span(f"firebase_async.{method}"):
+                return await asyncio.wait_for(self._attempts(method, path, params, data),
+                                              deadline or self.deadline)
+
+    async def get(self, path, deadline=None, **params):
+        return await self.request("GET", path, params, deadline=deadline)
+
+    async def put(self, path, data, deadline=None):
+        return await self.request("PUT", path, data=data, deadline=deadline)
+
+    async def patch(self, path, data, deadline=None):
+        return await self.request("PATCH", path, data=data, deadline=deadline)
+
+    async def get_many(self, paths, deadline=None):
+        """GET every path concurrently; failures come back as exception objects."""
+        paths = list(paths)
+        results = await asyncio.gather(*(self.get(p, deadline) for p in paths), return_exceptions=True)
+        return dict(zip(paths, results))
+
+    async def put_many(self, items, deadline=None):
+        """PUT {path: value} concurrently; returns {path: result or exception}."""
+        items = list(items.items())
+        results = await asyncio.gather(*(self.put(p, v, deadline) for p, v in items), return_exceptions=True)
+        return {p: r for (p, _), r in zip(items, results)}
+
+
+# -------------------
+# Blocking wrappers (scripts and Streamlit pages)
+# -------------------
+def fetch_paths(paths, base_url=FIREBASE_URL, concurrency=CONCURRENCY, deadline=DEADLINE):
+    """GET every path concurrently; returns {path: data or exception}."""
+    async def run():
+        async with AsyncFirebaseClient(base_url, concurrency, deadline) as client:
+            return await client.get_many(paths)
+
+    return asyncio.run(run())
+
+
+def fetch_users(uids, base_url=FIREBASE_URL, concurrency=CONCURRENCY, deadline=DEADLINE):
+    """Fetch users/<uid> for every uid concurrently; returns {uid: data or exception}."""
+    uids = list(uids)
+
+    async def run():
+        async with AsyncFirebaseClient(base_url, concurrency, deadline) as client:
+            return await client.get_many(f"users/{uid}" for uid in uids)
+
+    results = asyncio.run(run())
+    return {uid: results[f"users/{uid}"] for uid in uids}
+
+
+def put_users(records, base_url=FIREBASE_URL, concurrency=CONCURRENCY, deadline=DEADLINE):
+    """PUT users/<uid> for every {uid: data} item concurrently."""
+    async def run():
+        async with AsyncFirebaseClient(base_url, concurrency, deadline) as client:
+            return await client.put_many({f"users/{uid}": data for uid, data in records.items()})
+
+    results = asyncio.run(run())
+    return {uid: results[f"users/{uid}"] for uid in records}
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+from itertools import islice
+import requests
+import metrics
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# -------------------
+# CONFIG
+# -------------------
+FIREBASE_URL = os.getenv("FIREBASE_URL", "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app")
+TIMEOUT = (3.05, 10)          # (connect, read) seconds
+RETRIES = 3
+BACKOFF = 0.3                 # sleeps 0.3s, 0.6s, 1.2s between retries
+POOL_SIZE = 20                # keep-alive connections per host
+PATCH_BATCH_SIZE = 500        # paths per multi-path PATCH request
+RETRY_STATUS = (429, 500, 502, 503, 504)
+PAGE_SIZE = 100               # children per page when walking large trees
+
+
+def query_params(order_by=None, start_at=None, end_at=None, equal_to=None,
+                 limit_to_first=None, limit_to_last=None, shallow=False):
+    """RTDB query string values; orderBy/startAt/... must be JSON-encoded."""
+    params = {}
+    if shallow:
+        params["shallow"] = "true"
+    for name, value in (("orderBy", order_by), ("startAt", start_at), ("endAt", end_at),
+                        ("equalTo", equal_to), ("limitToFirst", limit_to_first),
+                        ("limitToLast", limit_to_last)):
+        if value is not None:
+            params[name] = json.dumps(value)
+    return params
+
+
+# -------------------
+# Client
+# -------------------
+class FirebaseClient:
+    """Realtime Database REST client on one keep-alive requests.Session.
+
+    Paths are relative to the database root, e.g. "users/UID12345"; the ".json"
+    suffix is added here. Failed connections and 429/5xx responses are retried
+    with exponential backoff.
+    """
+
+    def __init__(self, base_url=FIREBASE_URL, timeout=TIMEOUT, retries=RETRIES,
+                 backoff=BACKOFF, pool_size=POOL_SIZE, auth=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.auth = auth
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=frozenset({"GET", "PUT", "PATCH", "DELETE"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path):
+        path = path.strip("/")
+        return f"{self.base_url}/{path}.json" if path else f"{self.base_url}/.json"
+
+    def request(self, method, path, params=None, **kwargs):
+        """Send one request and return the raw Response (no status check)."""
+        params = dict(params or {})
+        if self.auth:
+            params["auth"] = self.auth
+        kwargs.setdefault("timeout", self.timeout)
+        with metrics.span(f"firebase.{method}") as span:
+            res = self.session.request(method, self.url(path), params=params, **kwargs)
+            if res.status_code >= 400:
+                span.fail()
+            return res
+
+    def _json(self, method, path, params=None, **kwargs):
+        res = self.request(method, path, params, **kwargs)
+        res.raise_for_status()
+        return res.json()
+
+    def get(self, path, **params):
+        return self._json("GET", path, params)
+
+    def put(self, path, data):
+        return self._json("PUT", path, json=data)
+
+    def shallow(self, path):
+        """Child keys of path without their contents (sorted)."""
+        return sorted((self._json("GET", path, query_params(shallow=True)) or {}).keys())
+
+    def query(self, path, **query):
+        """Filtered/limited GET, e.g. query("users", order_by="$key", limit_to_first=10).
+
+        The RTDB returns an unordered object; the result is re-sorted by key here.
+        """
+        result = self._json("GET", path, query_params(**query)) or {}
+        return dict(sorted(result.items())) if isinstance(result, dict) else result
+
+    def iter_children(self, path, page_size=PAGE_SIZE, start_after=None):
+        """Yield (key, value) for every child of path, one orderBy="$key" page at a time.
+
+        Only page_size children are held in memory or sent per response.
+        """
+        cursor = start_after
+        while True:
+            if cursor is None:
+                page = self.query(path, order_by="$key", limit_to_first=page_size)
+            else:
+                page = self.query(path, order_by="$key", start_at=cursor, limit_to_first=page_size + 1)
+                page.pop(cursor, None)   # startAt is inclusive
+            for key, value in page.items():
+                yield key, value
+            if len(page) < page_size:
+                return
+            cursor = next(reversed(page))
+
+    def iter_projected(self, path, fields, page_size=PAGE_SIZE, start_after=None):
+        """Yield (key, {field: value}) with only the listed fields of each child.
+
+        The RTDB cannot project fields or combine shallow=true with a cursor, so
+        children are read with the same orderBy="$key" pages as iter_children
+        (each response bounded by page_size, one request per page) and projected
+        here. A field may be a nested path such as "benchmark/AES_ms".
+        """
+        for key, value in self.iter_children(path, page_size, start_after):
+            yield key, {f: _lookup_path(value, f) for f in fields}
+
+    def patch(self, path, data):
+        return self._json("PATCH", path, json=data)
+
+    def delete(self, path):
+        return self._json("DELETE", path)
+
+    def patch_many(self, updates, root="", batch_size=PATCH_BATCH_SIZE):
+        """Write many paths with multi-path PATCH requests.
+
+        updates maps paths under root (e.g. "users/UID12345") to their new values.
+        Each request carries up to batch_size paths; returns the number of requests sent.
+        """
+        it = iter(updates.items())
+        sent = 0
+        while True:
+            batch = dict(islice(it, batch_size))
+            if not batch:
+                return sent
+            self.patch(root, batch)
+            sent += 1
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _lookup_path(node, path):
+    for part in path.strip("/").split("/"):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return node
+
+
+# -------------------
+# Shared instances
+# -------------------
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url=FIREBASE_URL):
+    """Process-wide client per base URL so every caller shares one connection pool."""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = FirebaseClient(base_url)
+        return client
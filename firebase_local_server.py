@@ -0,0 +1,366 @@
+import argparse
+import copy
+import json
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, unquote
+
+# -------------------
+# CONFIG
+# -------------------
+SEED_FILE = "POC_Database.json"
+HOST = "127.0.0.1"
+PORT = 9000
+KEEPALIVE = 30.0              # seconds between keep-alive events on a stream, like the RTDB
+
+
+# -------------------
+# In-memory tree
+# -------------------
+def split_path(path):
+    return [unquote(p) for p in path.strip("/").split("/") if p]
+
+
+class Database:
+    """Thread-safe JSON tree with the RTDB write semantics the scripts rely on:
+    PUT replaces a node, PATCH merges children (keys may be multi-part paths),
+    writing null deletes and empty parents disappear.
+
+    Subscribers get RTDB streaming events (kind, path relative to them, data) on a queue.
+    """
+
+    def __init__(self, data=None):
+        self.root = data or {}
+        self.lock = threading.RLock()
+        self.listeners = []
+
+    @classmethod
+    def from_file(cls, path=SEED_FILE):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def get(self, parts):
+        with self.lock:
+            node = self.root
+            for p in parts:
+                if not isinstance(node, dict) or p not in node:
+                    return None
+                node = node[p]
+            return copy.deepcopy(node)
+
+    def _set(self, parts, value):
+        if not parts:
+            self.root = value if isinstance(value, dict) else {} if value is None else value
+            return
+        node = self.root
+        trail = []
+        for p in parts[:-1]:
+            if not isinstance(node.get(p), dict):
+                if value is None:
+                    return
+                node[p] = {}
+            trail.append((node, p))
+            node = node[p]
+        if value is None:
+            node.pop(parts[-1], None)
+            # prune now-empty parents, like the RTDB does
+            for parent, key in reversed(trail):
+                if parent[key]:
+                    break
+                del parent[key]
+        else:
+            node[parts[-1]] = value
+
+    def put(self, parts, value):
+        with self.lock:
+            self._set(parts, copy.deepcopy(value))
+            self._notify("put", parts, value)
+
+    def patch(self, parts, updates):
+        with self.lock:
+            for key, value in updates.items():
+                self._set(parts + split_path(key), copy.deepcopy(value))
+            self._notify("patch", parts, updates)
+
+    # ---- streaming listeners ----
+    def subscribe(self, parts):
+        """Queue of events for the subtree at parts, starting with a full put of it."""
+        events = queue.Queue()
+        with self.lock:
+            events.put(("put", "/", self.get(parts)))
+            self.listeners.append((parts, events))
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            self.listeners = [(p, q) for p, q in self.listeners if q is not events]
+
+    def _notify(self, kind, parts, data):
+        for listen, events in self.listeners:
+            if parts[:len(listen)] == listen:
+                events.put((kind, "/" + "/".join(parts[len(listen):]), data))
+            elif listen[:len(parts)] == parts:
+                # a write above the listener replaces its whole subtree
+                events.put(("put", "/", self.get(listen)))
+
+    def push(self, parts, value):
+        key = f"-{uuid.uuid4().hex[:19]}"
+        self.put(parts + [key], value)
+        return key
+
+
+# -------------------
+# Query parameters
+# -------------------
+def _param(params, name):
+    """RTDB query values are JSON-encoded (orderBy="$key", limitToFirst=10)."""
+    if name not in params:
+        return None
+    raw = params[name][0]
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def apply_query(node, params):
+    """Apply shallow / orderBy / startAt / endAt / equalTo / limitTo* to a node."""
+    if not isinstance(node, dict):
+        return node
+    if _param(params, "shallow") in (True, "true"):
+        return {k: (True if isinstance(v, (dict, list)) else v) for k, v in node.items()}
+
+    order_by = _param(params, "orderBy")
+    if order_by is None:
+        return node
+    if order_by == "$key":
+        sort_key = lambda item: item[0]
+    elif order_by == "$value":
+        sort_key = lambda item: item[1]
+    else:
+        sort_key = lambda item: item[1].get(order_by) if isinstance(item[1], dict) else None
+
+    def rank(value):
+        # nulls first, then booleans, numbers, strings, objects (RTDB ordering)
+        if value is None:
+            return (0, 0)
+        if isinstance(value, bool):
+            return (1, value)
+        if isinstance(value, (int, float)):
+            return (2, value)
+        if isinstance(value, str):
+            return (3, value)
+        return (4, 0)
+
+    items = sorted(node.items(), key=lambda item: rank(sort_key(item)))
+    start, end, equal = _param(params, "startAt"), _param(params, "endAt"), _param(params, "equalTo")
+    if equal is not None:
+        start = end = equal
+    if start is not None:
+        items = [i for i in items if rank(sort_key(i)) >= rank(start)]
+    if end is not None:
+        items = [i for i in items if rank(sort_key(i)) <= rank(end)]
+    first, last = _param(params, "limitToFirst"), _param(params, "limitToLast")
+    if first is not None:
+        items = items[:int(first)]
+    if last is not None:
+        items = items[-int(last):] if int(last) else []
+    return dict(items)
+
+
+# -------------------
+# HTTP handler
+# -------------------
+class RTDBHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "LocalRTDB/1.0"
+    disable_nagle_algorithm = True   # headers and body go out as separate writes; avoid 40 ms delayed-ACK stalls
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body=None):
+        payload = b"" if body is None and status == 204 else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _reject(self, status, body):
+        # drain the request body first, or the next request on this keep-alive connection is misparsed
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send(status, body)
+
+    def _route(self):
+        """Inject latency/errors, then return (path parts, query params) or None."""
+        srv = self.server
+        delay = srv.latency + random.uniform(-srv.jitter, srv.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if srv.error_rate and random.random() < srv.error_rate:
+            self._reject(503, {"error": "injected failure"})
+            return None
+        url = urlsplit(self.path)
+        if not url.path.endswith(".json"):
+            self._reject(404, {"error": "paths must end in .json"})
+            return None
+        return split_path(url.path[:-len(".json")]), parse_qs(url.query)
+
+    def _reply(self, params, body):
+        if _param(params, "print") == "silent":
+            self._send(204)
+        else:
+            self._send(200, body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, parts):
+        """Server-sent events for parts: put/patch deltas plus periodic keep-alives."""
+        events = self.server.db.subscribe(parts)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                try:
+                    kind, path, data = events.get(timeout=self.server.keepalive)
+                    message = f"event: {kind}\ndata: {json.dumps({'path': path, 'data': data})}\n\n"
+                except queue.Empty:
+                    message = "event: keep-alive\ndata: null\n\n"
+                self._write_chunk(message.encode())
+        except (BrokenPipeError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            self.server.db.unsubscribe(events)
+
+    def do_GET(self):
+        route = self._route()
+        if route:
+            parts, params = route
+            if "text/event-stream" in self.headers.get("Accept", ""):
+                return self._stream(parts)
+            self._send(200, apply_query(self.server.db.get(parts), params))
+
+    def do_PUT(self):
+        route = self._route()
+        if route:
+            parts, params = route
+            try:
+                value = self._read_body()
+            except ValueError:
+                return self._send(400, {"error": "Invalid data; couldn't parse JSON object."})
+            self.server.db.put(parts, value)
+            self._reply(params, value)
+
+    def do_PATCH(self):
+        route = self._route()
+        if route:
+            parts, params = route
+            try:
+                updates = self._read_body()
+            except ValueError:
+                updates = None
+            if not isinstance(updates, dict):
+                return self._send(400, {"error": "Invalid data; couldn't parse JSON object."})
+            self.server.db.patch(parts, updates)
+            self._reply(params, updates)
+
+    def do_POST(self):
+        route = self._route()
+        if route:
+            parts, params = route
+            try:
+                value = self._read_body()
+            except ValueError:
+                return self._send(400, {"error": "Invalid data; couldn't parse JSON object."})
+            self._reply(params, {"name": self.server.db.push(parts, value)})
+
+    def do_DELETE(self):
+        route = self._route()
+        if route:
+            parts, params = route
+            self.server.db.put(parts, None)
+            self._reply(params, None)
+
+
+class LocalRTDBServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address=(HOST, PORT), db=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, verbose=False, keepalive=KEEPALIVE):
+        super().__init__(address, RTDBHandler)
+        self.db = db if db is not None else Database()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.keepalive = keepalive
+
+    def handle_error(self, request, client_address):
+        # clients dropping idle keep-alive connections are routine, not server errors
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(seed=SEED_FILE, host=HOST, port=0, **options):
+    """Start a stand-in on a background thread (port=0 picks a free one).
+
+    options are latency/jitter (seconds), error_rate, verbose and keepalive. Returns the
+    server; use server.url as FIREBASE_URL and server.shutdown() to stop.
+    """
+    db = Database.from_file(seed) if seed else Database()
+    server = LocalRTDBServer((host, port), db, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# -------------------
+# MAIN
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Firebase RTDB REST + streaming stand-in")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--seed", default=SEED_FILE, help="JSON export to load ('' for an empty db)")
+    parser.add_argument("--latency", type=float, default=0.0, help="added delay per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random delay (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    db = Database.from_file(args.seed) if args.seed else Database()
+    server = LocalRTDBServer((args.host, args.port), db, args.latency / 1000, args.jitter / 1000,
+                             args.error_rate, args.verbose)
+    print(f"Local RTDB listening on {server.url}  (export FIREBASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
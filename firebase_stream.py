@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+import requests
+import metrics
+from firebase_client import FIREBASE_URL
+from firebase_local_server import Database, split_path
+
+# -------------------
+# CONFIG
+# -------------------
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 90             # > the RTDB's 30 s keep-alive interval
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def iter_events(lines):
+    """Parse server-sent-event lines into (event, data) pairs."""
+    event, data = None, []
+    for line in lines:
+        if line == "":
+            if event is not None:
+                yield event, "\n".join(data)
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+class FirebaseMirror:
+    """Local copy of RTDB subtrees, kept current by the streaming (SSE) endpoint.
+
+    One background thread per watched path holds a text/event-stream GET open
+    and applies the put/patch deltas to an in-memory tree, reconnecting with
+    backoff if the stream drops. Reads (get) never touch the network; version
+    counts applied deltas, so a reader can poll it cheaply to see if anything changed.
+    """
+
+    def __init__(self, base_url=FIREBASE_URL, paths=("users",), auth=None):
+        self.base_url = base_url.rstrip("/")
+        self.paths = [p.strip("/") for p in paths]
+        self.auth = auth
+        self.db = Database()
+        self.version = 0
+        self.errors = 0
+        self._version_lock = threading.Lock()
+        self._ready = {p: threading.Event() for p in self.paths}
+        self._halt = threading.Event()
+        self._responses = {}
+        self._threads = []
+
+    # ---- lifecycle ----
+    def start(self):
+        for path in self.paths:
+            t = threading.Thread(target=self._listen, args=(path,), name=f"mirror-{path}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        self._halt.set()
+        for res in list(self._responses.values()):
+            res.close()
+
+    def wait_ready(self, timeout=None):
+        """Block until every path has received its initial snapshot."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in self._ready.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not event.wait(remaining):
+                return False
+        return True
+
+    # ---- reads ----
+    def covers(self, path):
+        parts = split_path(path)
+        return any(parts[:len(split_path(p))] == split_path(p) for p in self.paths)
+
+    def is_ready(self, path):
+        parts = split_path(path)
+        return any(parts[:len(split_path(p))] == split_path(p) and self._ready[p].is_set()
+                   for p in self.paths)
+
+    def get(self, path):
+        return self.db.get(split_path(path))
+
+    # ---- stream handling ----
+    def _apply(self, base, event, payload):
+        message = json.loads(payload)
+        parts = base + split_path(message["path"])
+        if event == "put":
+            self.db.put(parts, message["data"])
+        elif event == "patch":
+            self.db.patch(parts, message["data"])
+        with self._version_lock:
+            self.version += 1
+
+    def _listen(self, path):
+        base = split_path(path)
+        url = f"{self.base_url}/{path}.json" if path else f"{self.base_url}/.json"
+        params = {"auth": self.auth} if self.auth else None
+        delay = RECONNECT_DELAY
+        session = requests.Session()
+        while not self._halt.is_set():
+            try:
+                res = session.get(url, params=params, stream=True, headers={"Accept": "text/event-stream"},
+                                  timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                self._responses[path] = res
+                res.raise_for_status()
+                lines = res.iter_lines(chunk_size=None, decode_unicode=True)
+                for event, payload in iter_events(lines):
+                    if event in ("put", "patch"):
+                        metrics.count(f"mirror.{event}")
+                        self._apply(base, event, payload)
+                        self._ready[path].set()
+                        delay = RECONNECT_DELAY
+                    elif event in ("cancel", "auth_revoked"):
+                        break
+            except Exception:
+                if self._halt.is_set():
+                    break
+                self.errors += 1
+                metrics.count("mirror.reconnect")
+            finally:
+                self._responses.pop(path, None)
+            self._halt.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
@@ -1,7 +1,8 @@
-import requests # library to send http requests to firebase
+import os
+from firebase_client import FirebaseClient # pooled REST client for firebase
 
 # Replace with your database URL
-FIREBASE_URL = FIREBASE_URL = "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app"
+FIREBASE_URL = os.getenv("FIREBASE_URL", "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app")
 
 # Write some test data
 data = {
@@ -10,10 +11,11 @@ data = {
     "value": "U2FsdGVkX19a3hJ4Nv9qkqvK2uF1zM3n"
 }
 
+client = FirebaseClient(FIREBASE_URL)
+
 # PUT request to write under /users/UID12345
-r = requests.put(f"{FIREBASE_URL}/users/UID12345.json", json=data)
+r = client.request("PUT", "users/UID12345", json=data)
 print("Write status:", r.status_code)
 
-# GET request to read back
-r = requests.get(f"{FIREBASE_URL}/users/UID12345.json")
-print("Data read:", r.json())
+# GET request to read back (reuses the same keep-alive connection)
+print("Data read:", client.get("users/UID12345"))
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from Crypto.Cipher import DES3
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+from Crypto.Random import get_random_bytes
+from crypto_core import KEY_SIZES
+from data_dir import data_path
+import metrics
+
+# -------------------
+# CONFIG
+# -------------------
+KEYSTORE_DB = os.getenv("KEYSTORE")               # default: keystore.sqlite3 in the data directory
+MASTER_KEY_FILE = os.getenv("MASTER_KEY_FILE")    # default: master.key in the data directory
+KEY_CACHE_SIZE = 10_000              # derived keys kept per process
+VERSION_TTL = 30.0                   # seconds a cached current key version is trusted; another
+                                     # process's rotate() is picked up within this (older versions stay valid)
+SALT_SIZE = 16
+DEFAULT_KDF = "hkdf"
+
+# Parameters are stored with every user's metadata, so changing these only
+# affects users created afterwards.
+KDF_PARAMS = {
+    "hkdf": {"hash": "sha256"},                      # master secret is already high-entropy
+    "pbkdf2": {"hash": "sha256", "iterations": 200_000},
+    "scrypt": {"n": 2 ** 14, "r": 8, "p": 1},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_keys (
+    uid     TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    kdf     TEXT NOT NULL,
+    params  TEXT NOT NULL,
+    salt    BLOB NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (uid, version)
+);
+"""
+
+
+def master_key_path(create=True):
+    """MASTER_KEY_FILE, else master.key in the data directory (resolved on use, not at import)."""
+    return MASTER_KEY_FILE or data_path("master.key", create)
+
+
+def load_master_secret(path=None):
+    """MASTER_KEY env var (hex), else the key file, created with 0600 permissions on first use."""
+    env = os.getenv("MASTER_KEY")
+    if env:
+        return bytes.fromhex(env)
+    path = path or master_key_path()
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        secret = get_random_bytes(32)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secret)
+        return secret
+
+
+def derive(kdf, master, salt, context, length, params):
+    """Run one KDF; context binds the key to (uid, algorithm, size, version)."""
+    with metrics.span(f"kdf.{kdf}"):
+        if kdf == "hkdf":
+            return HKDF(master, length, salt, SHA256, context=context)
+        if kdf == "pbkdf2":
+            return hashlib.pbkdf2_hmac(params["hash"], master, salt + context, params["iterations"], length)
+        if kdf == "scrypt":
+            return hashlib.scrypt(master, salt=salt + context, n=params["n"], r=params["r"], p=params["p"],
+                                  maxmem=256 * params["n"] * params["r"], dklen=length)
+    raise ValueError(f"Unknown KDF {kdf!r}; choose from {', '.join(KDF_PARAMS)}")
+
+
+def fit_key(algorithm, key):
+    """3DES keys need valid parity and must not collapse to single DES."""
+    return DES3.adjust_key_parity(key) if algorithm == "3DES" else key
+
+
+# -------------------
+# Derived-key cache
+# -------------------
+class KeyCache:
+    """LRU cache of derived keys keyed by (uid, version, algorithm, key size)."""
+
+    def __init__(self, maxsize=KEY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            key = self._entries.get(cache_key)
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return key
+
+    def put(self, cache_key, key):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = key
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, uid):
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == uid]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {"size": len(self._entries), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# -------------------
+# Key store
+# -------------------
+class KeyStore:
+    """Per-user keys derived from one master secret.
+
+    Only metadata (KDF, parameters, salt, version) is persisted, in SQLite;
+    keys are re-derived on demand and kept in a bounded KeyCache, so a bulk
+    job pays the KDF once per user rather than once per record.
+    """
+
+    def __init__(self, path=None, master=None, kdf=DEFAULT_KDF, cache_size=KEY_CACHE_SIZE):
+        if kdf not in KDF_PARAMS:
+            raise ValueError(f"Unknown KDF {kdf!r}; choose from {', '.join(KDF_PARAMS)}")
+        path = path or KEYSTORE_DB or data_path("keystore.sqlite3")
+        self.path = path
+        self.kdf = kdf
+        self.master = master if master is not None else load_master_secret()
+        self.cache = KeyCache(cache_size)
+        self.versions = KeyCache(cache_size)     # (uid,) -> (current version, monotonic time read)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- metadata ----
+    def _new_entry(self, uid, version):
+        return (uid, version, self.kdf, json.dumps(KDF_PARAMS[self.kdf]), get_random_bytes(SALT_SIZE), time.time())
+
+    def entry(self, uid, version=None):
+        """Metadata row for uid (latest version unless given), created on first use."""
+        with self._lock:
+            sql = "SELECT uid, version, kdf, params, salt, created FROM user_keys WHERE uid = ?"
+            args = [uid]
+            if version is not None:
+                sql += " AND version = ?"
+                args.append(version)
+            row = self.conn.execute(sql + " ORDER BY version DESC LIMIT 1", args).fetchone()
+            if row is None:
+                if version not in (None, 1):
+                    raise KeyError(f"No key version {version} for {uid}")
+                row = self._new_entry(uid, 1)
+                with self.conn:
+                    self.conn.execute("INSERT INTO user_keys VALUES (?, ?, ?, ?, ?, ?)", row)
+        return {"uid": row[0], "version": row[1], "kdf": row[2], "params": json.loads(row[3]),
+                "salt": row[4], "created": row[5]}
+
+    def prepare(self, uids):
+        """Create metadata for every new uid in one transaction (bulk onboarding)."""
+        uids = list(uids)
+        with self._lock:
+            known = set()
+            for i in range(0, len(uids), 500):
+                batch = uids[i:i + 500]
+                known.update(r[0] for r in self.conn.execute(
+                    f"SELECT DISTINCT uid FROM user_keys WHERE uid IN ({','.join('?' * len(batch))})", batch))
+            rows = [self._new_entry(uid, 1) for uid in dict.fromkeys(uids) if uid not in known]
+            with self.conn:
+                self.conn.executemany("INSERT INTO user_keys VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def rotate(self, uid):
+        """Start a new key version for uid (fresh salt); older versions stay derivable."""
+        current = self.entry(uid)["version"]
+        with self._lock, self.conn:
+            self.conn.execute("INSERT INTO user_keys VALUES (?, ?, ?, ?, ?, ?)", self._new_entry(uid, current + 1))
+        self.cache.discard(uid)
+        self.versions.discard(uid)
+        return current + 1
+
+    def current_version(self, uid):
+        """Latest key version for uid: cached next to the derived keys, re-read from the
+        store after VERSION_TTL so rotations by other processes are seen."""
+        cached = self.versions.get((uid,))
+        if cached is not None and time.monotonic() - cached[1] < VERSION_TTL:
+            return cached[0]
+        with self._lock:
+            row = self.conn.execute("SELECT MAX(version) FROM user_keys WHERE uid = ?", (uid,)).fetchone()
+        version = row[0] if row[0] is not None else self.entry(uid)["version"]
+        self.versions.put((uid,), (version, time.monotonic()))
+        return version
+
+    def users(self):
+        return [r[0] for r in self.conn.execute("SELECT DISTINCT uid FROM user_keys ORDER BY uid")]
+
+    # ---- keys ----
+    def key_for(self, uid, algorithm="AES", key_size=None, version=None):
+        """Derived key for uid (latest version unless given); key_size defaults to KEY_SIZES[algorithm]."""
+        key_size = key_size or KEY_SIZES[algorithm]
+        if version is None:
+            version = self.current_version(uid)   # keys are cached by concrete version, never "latest"
+        cache_key = (uid, version, algorithm, key_size)
+        key = self.cache.get(cache_key)
+        if key is not None:
+            return key
+        meta = self.entry(uid, version)
+        context = f"{uid}|{algorithm}|{key_size}|v{meta['version']}".encode()
+        key = fit_key(algorithm, derive(meta["kdf"], self.master, meta["salt"], context, key_size, meta["params"]))
+        self.cache.put(cache_key, key)
+        return key
+
+    def latest(self, uid, algorithm="AES", key_size=None):
+        """(version, key) to seal with; pass the version to envelope.seal(key_version=...)."""
+        version = self.current_version(uid)
+        return version, self.key_for(uid, algorithm, key_size, version)
+
+    def resolver(self, uid, algorithm="AES", key_size=None):
+        """key_version -> key callable for envelope.open_envelope(); unversioned envelopes get the latest key."""
+        return lambda version: self.key_for(uid, algorithm, key_size, version)
+
+    def keyring(self, algorithm="AES", key_size=None):
+        """(uid[, key version]) -> (key, version) callable for one algorithm, e.g. for
+        bulk_crypto.encrypt_records. Without a version it is the latest, and the version
+        travels with the key so sealed records name it and still open after rotate()."""
+        def ring(uid, version=None):
+            if version is None:
+                version = self.current_version(uid)
+            return self.key_for(uid, algorithm, key_size, version), version
+        return ring
@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from cipher_registry import find_scheme
+from envelope import ALGORITHMS, MODES, open_text, seal_text
+from firebase_async import AsyncFirebaseClient, FirebaseRequestError
+
+# -------------------
+# CONFIG
+# -------------------
+USERS = 100                   # virtual users
+DURATION = 30.0               # seconds, ramp-up included
+RAMP_UP = 10.0                # seconds to reach full load
+WINDOW = 1.0                  # seconds per timeline bucket
+THINK_TIME = 0.0              # closed model: mean pause between one user's cycles
+MAX_IN_FLIGHT = 1_000         # open model: arrivals beyond this are dropped, not queued
+TIMEOUT = 10.0                # seconds per request
+ROOT = "loadtest"             # each run writes, and cleans up, only loadtest/<run id>
+PORTFOLIO = "BTC=0.25, ETH=1.5"
+STAGES = ("encrypt", "put", "get", "decrypt", "cycle")
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentiles(values, qs=PERCENTILES):
+    """Nearest-rank percentiles in ms for latencies given in seconds."""
+    if not values:
+        return {f"p{q}_ms": None for q in qs}
+    ordered = sorted(values)
+    return {f"p{q}_ms": round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000, 3)
+            for q in qs}
+
+
+# -------------------
+# Results
+# -------------------
+class Recorder:
+    """Per-window cycle counts, errors and stage latencies, plus whole-run totals."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.start = time.perf_counter()
+        self.windows = defaultdict(lambda: {"cycles": 0, "errors": 0, "dropped": 0, "cycle": [], "active": 0})
+        self.latencies = {stage: [] for stage in STAGES}
+        self.errors = Counter()
+        self.cycles = self.failed = self.dropped = 0
+        self.active = 0
+
+    def _bucket(self):
+        return self.windows[int((time.perf_counter() - self.start) / self.window)]
+
+    def success(self, stages):
+        bucket = self._bucket()
+        bucket["cycles"] += 1
+        bucket["cycle"].append(stages["cycle"])
+        self.cycles += 1
+        for stage, seconds in stages.items():
+            self.latencies[stage].append(seconds)
+
+    def failure(self, stage, exc):
+        bucket = self._bucket()
+        bucket["cycles"] += 1
+        bucket["errors"] += 1
+        self.cycles += 1
+        self.failed += 1
+        detail = f"HTTP {exc.status}" if isinstance(exc, FirebaseRequestError) else type(exc).__name__
+        self.errors[f"{stage}: {detail}"] += 1
+
+    def drop(self):
+        self._bucket()["dropped"] += 1
+        self.dropped += 1
+
+    def sample_active(self):
+        bucket = self._bucket()
+        bucket["active"] = max(bucket["active"], self.active)
+
+    def window_row(self, n):
+        bucket = self.windows[n]
+        row = {
+            "t": round((n + 1) * self.window, 3),
+            "active": bucket["active"],
+            "cycles_per_s": round(bucket["cycles"] / self.window, 2),
+            "errors": bucket["errors"],
+            "error_rate": round(bucket["errors"] / bucket["cycles"], 4) if bucket["cycles"] else 0.0,
+            "dropped": bucket["dropped"],
+        }
+        row.update(percentiles(bucket["cycle"]))
+        return row
+
+    def timeline(self):
+        return [self.window_row(n) for n in range(max(self.windows, default=-1) + 1)]
+
+    def summary(self, elapsed):
+        out = {
+            "cycles": self.cycles,
+            "errors": self.failed,
+            "error_rate": round(self.failed / self.cycles, 4) if self.cycles else 0.0,
+            "dropped": self.dropped,
+            "seconds": round(elapsed, 3),
+            "cycles_per_s": round(self.cycles / elapsed, 2) if elapsed else None,
+            "requests_per_s": round(2 * (self.cycles - self.failed) / elapsed, 2) if elapsed else None,
+            "error_kinds": dict(self.errors.most_common()),
+        }
+        out["latency"] = {stage: percentiles(values) for stage, values in self.latencies.items()}
+        return out
+
+
+# -------------------
+# One virtual-user cycle: encrypt -> PUT -> GET -> decrypt (as in crypto_firebase.py)
+# -------------------
+def run_root(run_id):
+    """Tree one run writes under; run ids are generated, never taken from a path."""
+    return f"{ROOT}/{run_id}"
+
+
+async def run_cycle(client, recorder, uid, key, algorithm, mode, payload, root):
+    recorder.active += 1
+    stage, stages = "encrypt", {}
+    start = mark = time.perf_counter()
+    field = f"portfolio_{algorithm}"
+    try:
+        text = seal_text(algorithm, key, payload, mode=mode)
+        stages["encrypt"], mark = time.perf_counter() - mark, time.perf_counter()
+        stage = "put"
+        await client.put(f"{root}/{uid}", {field: text})
+        stages["put"], mark = time.perf_counter() - mark, time.perf_counter()
+        stage = "get"
+        stored = await client.get(f"{root}/{uid}")
+        stages["get"], mark = time.perf_counter() - mark, time.perf_counter()
+        stage = "decrypt"
+        if open_text(key, stored[field]) != payload:
+            raise ValueError("round trip mismatch")
+        stages["decrypt"] = time.perf_counter() - mark
+    except Exception as exc:    # every failure is a data point, including timeouts
+        recorder.failure(stage, exc)
+    else:
+        stages["cycle"] = time.perf_counter() - start
+        recorder.success(stages)
+    finally:
+        recorder.active -= 1
+
+
+# -------------------
+# Load models
+# -------------------
+async def closed_model(client, recorder, vus, end, ramp_up, think_time, **cycle):
+    """Fixed population: each user runs cycles back to back (plus think time);
+    user i starts at i/N of the ramp-up, so load grows linearly."""
+    async def user(i, uid, key):
+        await asyncio.sleep(ramp_up * i / len(vus))
+        while time.perf_counter() < end:
+            await run_cycle(client, recorder, uid, key, **cycle)
+            if think_time:
+                await asyncio.sleep(random.expovariate(1 / think_time))
+
+    await asyncio.gather(*(user(i, uid, key) for i, (uid, key) in enumerate(vus)))
+
+
+async def open_model(client, recorder, vus, end, ramp_up, rate, max_in_flight, **cycle):
+    """Poisson arrivals at `rate` cycles/s, independent of how fast the server
+    answers; users take turns. During ramp-up candidate arrivals are thinned in
+    proportion to elapsed time. Arrivals over max_in_flight are dropped."""
+    tasks = set()
+    start = next_at = time.perf_counter()
+    n = 0
+    while True:
+        # never fall more than 1 s behind schedule, so a stalled loop does not release a huge burst
+        next_at = max(next_at, time.perf_counter() - 1.0) + random.expovariate(rate)
+        if next_at >= end:
+            break
+        await asyncio.sleep(next_at - time.perf_counter())
+        if ramp_up and random.random() * ramp_up > next_at - start:
+            continue
+        if len(tasks) >= max_in_flight:
+            recorder.drop()
+            continue
+        uid, key = vus[n % len(vus)]
+        n += 1
+        task = asyncio.create_task(run_cycle(client, recorder, uid, key, **cycle))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def report_windows(recorder, stream=sys.stderr):
+    """Print each finished window as it closes."""
+    n = 0
+    while True:
+        await asyncio.sleep(recorder.window / 10)
+        recorder.sample_active()
+        while (time.perf_counter() - recorder.start) / recorder.window >= n + 1:
+            row = recorder.window_row(n)
+            stream.write(f"t={row['t']:>6.1f}s  active={row['active']:>4}  {row['cycles_per_s']:>8.1f} cycles/s  "
+                         f"p50={row['p50_ms']} ms  p99={row['p99_ms']} ms  errors={row['errors']}\n")
+            stream.flush()
+            n += 1
+
+
+async def run_load(base_url, model="closed", users=USERS, duration=DURATION, ramp_up=RAMP_UP, rate=None,
+                   think_time=THINK_TIME, max_in_flight=MAX_IN_FLIGHT, algorithm="AES", mode="ECB",
+                   payload_size=len(PORTFOLIO), timeout=TIMEOUT, retries=0, window=WINDOW,
+                   live=True, cleanup=True):
+    """Run one load test and return {"meta", "summary", "timeline"}.
+
+    Records go to a fresh loadtest/<run id> tree, and cleanup deletes only that tree.
+    """
+    run_id = uuid.uuid4().hex[:12]
+    root = run_root(run_id)
+    scheme = find_scheme(algorithm, mode)
+    payload = (PORTFOLIO.encode() * (payload_size // len(PORTFOLIO) + 1))[:payload_size]
+    vus = [(f"VU{i:06d}", scheme.new_key()) for i in range(users)]
+    cycle = {"algorithm": algorithm, "mode": mode, "payload": payload, "root": root}
+    concurrency = users if model == "closed" else max_in_flight
+    recorder = Recorder(window)
+    async with AsyncFirebaseClient(base_url, concurrency, timeout, retries) as client:
+        reporter = asyncio.create_task(report_windows(recorder)) if live else None
+        recorder.start = time.perf_counter()
+        end = recorder.start + duration
+        if model == "closed":
+            await closed_model(client, recorder, vus, end, ramp_up, think_time, **cycle)
+        else:
+            await open_model(client, recorder, vus, end, ramp_up, rate, max_in_flight, **cycle)
+        elapsed = time.perf_counter() - recorder.start
+        if reporter:
+            reporter.cancel()
+        if cleanup:
+            try:
+                await client.request("DELETE", root)
+            except Exception as exc:
+                print(f"cleanup of {root} failed: {exc}", file=sys.stderr)
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": base_url, "root": root, "model": model, "users": users, "rate": rate, "duration_s": duration,
+        "ramp_up_s": ramp_up, "think_time_s": think_time, "scheme": scheme.name,
+        "payload_bytes": payload_size, "timeout_s": timeout, "retries": retries, "window_s": window,
+    }
+    return {"meta": meta, "summary": recorder.summary(elapsed), "timeline": recorder.timeline()}
+
+
+# -------------------
+# Local stand-in (separate process, so it does not share the load generator's GIL)
+# -------------------
+def free_port(host="127.0.0.1"):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, wait=10.0):
+    """Launch firebase_local_server.py with an empty database; returns (process, url)."""
+    port = free_port()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "firebase_local_server.py")
+    proc = subprocess.Popen([sys.executable, script, "--port", str(port), "--seed", "",
+                             "--latency", str(latency_ms), "--jitter", str(jitter_ms),
+                             "--error-rate", str(error_rate)], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Local RTDB stand-in did not start")
+
+
+# -------------------
+# MAIN
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-user load test of the encrypt -> PUT -> GET -> "
+                                                 "decrypt pipeline")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help=f"RTDB base URL to load; records go under /{ROOT}/<run id> only")
+    target.add_argument("--local", action="store_true",
+                        help="start a local RTDB stand-in (firebase_local_server.py) and target it")
+    parser.add_argument("--latency", type=float, default=0.0, help="--local: added server delay (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="--local: +/- random delay (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="--local: fraction answered with 503")
+    parser.add_argument("--model", choices=("closed", "open"), default="closed",
+                        help="closed: N users loop back to back; open: Poisson arrivals at --rate")
+    parser.add_argument("-u", "--users", type=int, default=USERS, help="virtual users")
+    parser.add_argument("--rate", type=float, help="open model: target cycles/s (required)")
+    parser.add_argument("-d", "--duration", type=float, default=DURATION, help="seconds, ramp-up included")
+    parser.add_argument("--ramp-up", type=float, default=RAMP_UP, help="seconds to reach full load")
+    parser.add_argument("--think-time", type=float, default=THINK_TIME,
+                        help="closed model: mean pause between a user's cycles (s)")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT,
+                        help="open model: drop arrivals beyond this many running cycles")
+    parser.add_argument("-a", "--algorithm", default="AES", choices=list(ALGORITHMS))
+    parser.add_argument("-m", "--mode", default=None, choices=list(MODES), help="default: ECB (Poly1305 for ChaCha20)")
+    parser.add_argument("--payload-size", type=int, default=len(PORTFOLIO), help="plaintext bytes per cycle")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per request")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="client retries on 429/5xx (default 0, so failures are reported, not hidden)")
+    parser.add_argument("--window", type=float, default=WINDOW, help="timeline bucket (s)")
+    parser.add_argument("--keep", action="store_true", help="leave the written records in place")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no per-window lines on stderr")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.model == "open" and not args.rate:
+        parser.error("--model open needs --rate")
+    mode = args.mode or ("Poly1305" if args.algorithm == "ChaCha20" else "ECB")
+
+    server, url = None, args.url
+    if args.local:
+        server, url = start_local_server(args.latency, args.jitter, args.error_rate)
+    try:
+        report = asyncio.run(run_load(
+            url, args.model, args.users, args.duration, args.ramp_up, args.rate, args.think_time,
+            args.max_in_flight, args.algorithm, mode, args.payload_size, args.timeout,
+            args.retries, args.window, live=not args.quiet, cleanup=not args.keep))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    if args.local:
+        report["meta"]["target"] = f"local stand-in (latency {args.latency} ms, jitter {args.jitter} ms, " \
+                                   f"error rate {args.error_rate})"
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    s = report["summary"]
+    print(f"{s['cycles']} cycles, {s['cycles_per_s']} cycles/s, error rate {s['error_rate']:.2%}, "
+          f"cycle p50 {s['latency']['cycle']['p50_ms']} ms, p99 {s['latency']['cycle']['p99_ms']} ms",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import requests
 import pytz
 from datetime import datetime
 import os
 import time
 from dotenv import load_dotenv
 import streamlit.components.v1 as components
+from weather_cache import WeatherCache
+from price_feed import PriceFeed
+from timeseries_buffer import TimeSeriesBuffer
+from metrics_panel import enable_metrics, show_metrics_panel
 
 def show_local_clock():
     clock_html = """
@@ -32,7 +34,7 @@ def show_local_clock():
 # -------------------------------
 load_dotenv()
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")      
-FIREBASE_URL = "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app"
+FIREBASE_URL = os.getenv("FIREBASE_URL", "https://pocs-project-68633-default-rtdb.asia-southeast1.firebasedatabase.app")
 USER_ID = "UID12345"
 
 # -------------------------------
@@ -40,6 +42,7 @@ USER_ID = "UID12345"
 # -------------------------------
 st.set_page_config(page_title="🌍 Global Dashboard", page_icon="💹", layout="wide")
 st.title("🌍 Unified Real-Time Dashboard")
+enable_metrics()
 
 # -------------------------------
 # STYLES
@@ -70,22 +73,15 @@ timezones = {
     "New Delhi": "Asia/Kolkata",
 }
 
-def fetch_weather(city):
-    try:
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={WEATHER_API_KEY}&units=metric"
-        res = requests.get(url, timeout=5)
-        data = res.json()
-        if res.status_code != 200:
-            return None, None, None
-        temp = data["main"]["temp"]
-        desc = data["weather"][0]["description"].title()
-        icon = data["weather"][0]["icon"]
-        return temp, desc, icon
-    except Exception:
-        return None, None, None
-
-# pre-fetch weather once (no repeated API calls)
-weather_data = {c: fetch_weather(c) for c in cities}
+@st.cache_resource
+def get_weather_cache():
+    """Shared across reruns and sessions; cities refresh in parallel once their TTL expires."""
+    cache = WeatherCache(WEATHER_API_KEY, cities)
+    cache.prime()
+    return cache
+
+# served from the TTL cache (no API call per rerun)
+weather_data = get_weather_cache().get_all()
 
 wc1, wc2, wc3, wc4 = st.columns(4)
 cols = [wc1, wc2, wc3]
@@ -153,30 +149,26 @@ st.subheader("💹 Live Indian Stock Prices (Yahoo Finance)")
 
 tickers = [f"{s}.NS" for s in ["RELIANCE", "TCS", "INFY"]]
 
-def fetch_stock_price(symbol):
-    try:
-        ticker = yf.Ticker(symbol)
-        data = ticker.history(period="1d", interval="1m")
-        if data.empty:
-            return None, None, None
-        latest_price = data["Close"].iloc[-1]
-        open_price = data["Open"].iloc[0]
-        prev_close = ticker.history(period="2d", interval="1d")["Close"].iloc[-2]
-        return latest_price, open_price, prev_close
-    except Exception:
-        return None, None, None
+@st.cache_resource
+def get_price_feed():
+    """Batched, incremental Yahoo Finance feed shared across reruns and sessions."""
+    return PriceFeed(tickers)
+
+price_feed = get_price_feed()
+price_feed.refresh()   # no-op if refreshed within the last few seconds
 
 if "prices" not in st.session_state:
-    st.session_state.prices = {t: [] for t in tickers}
-    st.session_state.timestamps = []
+    st.session_state.prices = TimeSeriesBuffer(tickers)   # fixed-size ring buffer, one row per tick
+
+quotes = price_feed.quotes()
+latest = {t: q[0] for t, q in quotes.items() if q[0] is not None}
+if latest:
+    st.session_state.prices.append(pd.Timestamp.now(), latest)   # one timestamp per tick
 
 for t in tickers:
-    current, open_price, prev_close = fetch_stock_price(t)
+    current, open_price, prev_close = quotes[t]
     if current is None:
         continue
-    st.session_state.prices[t].append(current)
-    st.session_state.timestamps.append(pd.Timestamp.now())
-
     change = current - prev_close
     pct_change = (change / prev_close) * 100 if prev_close else 0
     delta_color_class = "delta-green" if change >= 0 else "delta-red"
@@ -193,21 +185,15 @@ for t in tickers:
         unsafe_allow_html=True
     )
 
-if len(st.session_state.timestamps) > 1:
-    min_len = min([len(st.session_state.timestamps)] + [len(st.session_state.prices[t]) for t in tickers])
-    trimmed_timestamps = st.session_state.timestamps[:min_len]
-    df = pd.DataFrame(index=trimmed_timestamps)
-    for t in tickers:
-        df[t] = st.session_state.prices[t][:min_len]
-    st.line_chart(df)
+if len(st.session_state.prices) > 1:
+    st.line_chart(st.session_state.prices.to_frame())
 
 # ==========================================================
 # 🔐 AES vs DES Encryption / Decryption Comparison (True Timings)
 # ==========================================================
 import base64
 import time
-from Crypto.Cipher import AES, DES
-from Crypto.Random import get_random_bytes
+from crypto_core import new_key, encrypt_bytes, decrypt_bytes
 
 st.markdown("---")
 st.markdown("## 🔐 AES vs DES Encryption & Decryption Comparison")
@@ -218,51 +204,31 @@ of **AES (Advanced Encryption Standard)** and **DES (Data Encryption Standard)**
 """)
 
 # --- Helper Functions ---
-def pad(data, block_size):
-    padding_len = block_size - len(data) % block_size
-    return data + chr(padding_len) * padding_len
-
-def unpad(data):
-    padding_len = ord(data[-1])
-    return data[:-padding_len]
-
-def aes_encrypt_decrypt(plaintext):
-    """Encrypts and decrypts text using AES (ECB, 128-bit key)"""
-    key = get_random_bytes(16)
-    cipher = AES.new(key, AES.MODE_ECB)
+def timed_encrypt_decrypt(algorithm, plaintext):
+    """Encrypts and decrypts text with algorithm (ECB); returns timings in ms"""
+    key = new_key(algorithm)
+    data = plaintext.encode()
 
     # Measure encryption time
     start = time.perf_counter()
-    ciphertext = cipher.encrypt(pad(plaintext, 16).encode())
+    ciphertext = encrypt_bytes(algorithm, key, data, cache=None)   # one-off key: keep it out of the cache
     enc_time = (time.perf_counter() - start) * 1000
 
     # Measure decryption time
-    decipher = AES.new(key, AES.MODE_ECB)
     start = time.perf_counter()
-    decrypted = unpad(decipher.decrypt(ciphertext).decode())
+    decrypted = decrypt_bytes(algorithm, key, ciphertext, cache=None).decode()
     dec_time = (time.perf_counter() - start) * 1000
 
     b64 = base64.b64encode(ciphertext).decode()
     return b64, decrypted, enc_time, dec_time
 
+def aes_encrypt_decrypt(plaintext):
+    """Encrypts and decrypts text using AES (ECB, 128-bit key)"""
+    return timed_encrypt_decrypt("AES", plaintext)
+
 def des_encrypt_decrypt(plaintext):
     """Encrypts and decrypts text using DES (ECB, 64-bit key)"""
-    key = get_random_bytes(8)
-    cipher = DES.new(key, DES.MODE_ECB)
-
-    # Measure encryption time
-    start = time.perf_counter()
-    ciphertext = cipher.encrypt(pad(plaintext, 8).encode())
-    enc_time = (time.perf_counter() - start) * 1000
-
-    # Measure decryption time
-    decipher = DES.new(key, DES.MODE_ECB)
-    start = time.perf_counter()
-    decrypted = unpad(decipher.decrypt(ciphertext).decode())
-    dec_time = (time.perf_counter() - start) * 1000
-
-    b64 = base64.b64encode(ciphertext).decode()
-    return b64, decrypted, enc_time, dec_time
+    return timed_encrypt_decrypt("DES", plaintext)
 
 # --- Input Box ---
 user_text = st.text_area("✍️ Enter text to encrypt:", "This is a secret message!")
@@ -308,4 +274,39 @@ if st.button("Encrypt & Compare"):
         elif total_aes > total_des:
             st.warning("⚠️ DES was faster in this run — due to timing jitter or small input size.")
         else:
-            st.info("Both performed equally fast in this run.")
\ No newline at end of file
+            st.info("Both performed equally fast in this run.")
+# ==========================================================
+# 🧮 Cipher / Mode Matrix Throughput
+# ==========================================================
+from cipher_registry import SCHEMES
+from crypto_firebase_benchmark import run_matrix
+
+st.markdown("---")
+st.markdown("## 🧮 Cipher / Mode Matrix")
+st.markdown("""
+ECB only shows the raw block cipher. Compare what would actually be deployed:
+**AES-128/192/256** in ECB, CBC, CTR and GCM, **DES** and **3DES**, and **ChaCha20-Poly1305**.
+Every encrypt draws a fresh IV/nonce and AEAD decrypts verify the tag.
+""")
+
+@st.cache_data(show_spinner="Benchmarking cipher/mode matrix...")
+def mode_matrix(schemes, size, trials):
+    """Per-scheme throughput (MB/s, median of trials) for one payload size."""
+    rows = run_matrix([size], list(schemes), warmup=2, trials=trials)
+    return pd.DataFrame(rows).pivot(index="scheme", columns="direction", values="mb_per_s").loc[list(schemes)]
+
+matrix_schemes = st.multiselect("Schemes", list(SCHEMES), default=list(SCHEMES))
+matrix_size = st.select_slider("Payload size", options=[256, 4096, 65536, 1048576], value=65536,
+                               format_func=lambda n: f"{n // 1024} KB" if n >= 1024 else f"{n} B")
+matrix_trials = st.slider("Trials per scheme", 3, 30, 10)
+
+if st.button("Run Matrix") and matrix_schemes:
+    throughput = mode_matrix(tuple(matrix_schemes), matrix_size, matrix_trials)
+    st.bar_chart(throughput, horizontal=True, stack=False, x_label="MB/s")
+    st.dataframe(throughput.rename(columns={"encrypt": "encrypt MB/s", "decrypt": "decrypt MB/s"}))
+
+# ==========================================================
+# 📊 Live Performance
+# ==========================================================
+st.markdown("---")
+show_metrics_panel()
@@ -0,0 +1,286 @@
+import atexit
+import bisect
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -------------------
+# CONFIG
+# -------------------
+# Latency bucket upper bounds in seconds (Prometheus "le"), 10 us .. 30 s
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_WINDOW = 60        # seconds of per-second call/error counts kept for rates
+PREFIX = "pocs"
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class Operation:
+    """Latency histogram plus call/error counts for one named operation."""
+
+    def __init__(self, name):
+        self.name = name
+        self.buckets = [0] * (len(BUCKETS) + 1)    # last slot is +Inf
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self._slots = [[0, 0, 0] for _ in range(RATE_WINDOW)]    # [second, calls, errors]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        now = int(time.time())
+        with self._lock:
+            self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            slot = self._slots[now % RATE_WINDOW]
+            if slot[0] != now:
+                slot[:] = [now, 0, 0]
+            slot[1] += 1
+            if error:
+                self.errors += 1
+                slot[2] += 1
+
+    def quantile(self, q):
+        """Estimate from the histogram, interpolating linearly inside the bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lo = BUCKETS[i - 1] if i else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+    def rates(self, window=RATE_WINDOW):
+        """(calls/s, errors/s) over the last window seconds."""
+        cutoff = int(time.time()) - window
+        calls = errors = 0
+        for second, c, e in self._slots:
+            if second > cutoff:
+                calls += c
+                errors += e
+        return calls / window, errors / window
+
+    def summary(self):
+        calls_per_s, errors_per_s = self.rates()
+        p50, p99 = self.quantile(0.5), self.quantile(0.99)
+        return {
+            "operation": self.name,
+            "calls": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.count, 4) if self.count else 0.0,
+            "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            "calls_per_s": round(calls_per_s, 3),
+            "errors_per_s": round(errors_per_s, 3),
+        }
+
+
+class _Span:
+    __slots__ = ("op", "start", "failed")
+
+    def __init__(self, op):
+        self.op = op
+        self.failed = False
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.op.observe(time.perf_counter() - self.start, self.failed or exc_type is not None)
+        return False
+
+    def fail(self):
+        """Count this call as an error even though no exception escapes the block."""
+        self.failed = True
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def fail(self):
+        pass
+
+
+class Registry:
+    """Process-wide operations and counters.
+
+    While disabled, span() returns a shared no-op context manager and timed()
+    wrappers fall straight through to the wrapped function after one flag check.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.operations = {}
+        self.counters = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._noop = _NoopSpan()
+
+    def operation(self, name):
+        op = self.operations.get(name)
+        if op is None:
+            with self._lock:
+                op = self.operations.setdefault(name, Operation(name))
+        return op
+
+    def span(self, name):
+        if not self.enabled:
+            return self._noop
+        return _Span(self.operation(name))
+
+    def observe(self, name, seconds, error=False):
+        if self.enabled:
+            self.operation(name).observe(seconds, error)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.operations.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """One summary dict per operation, busiest first."""
+        return sorted((op.summary() for op in list(self.operations.values())), key=lambda r: -r["calls"])
+
+    # ---- export ----
+    def prometheus_text(self):
+        lines = [f"# HELP {PREFIX}_operation_seconds Latency of instrumented operations",
+                 f"# TYPE {PREFIX}_operation_seconds histogram"]
+        for name, op in sorted(self.operations.items()):
+            label = _label(name)
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), op.buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{PREFIX}_operation_seconds_bucket{{op="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{PREFIX}_operation_seconds_sum{{op="{label}"}} {op.total}')
+            lines.append(f'{PREFIX}_operation_seconds_count{{op="{label}"}} {op.count}')
+        lines += [f"# HELP {PREFIX}_operation_errors_total Failed calls of instrumented operations",
+                  f"# TYPE {PREFIX}_operation_errors_total counter"]
+        for name, op in sorted(self.operations.items()):
+            lines.append(f'{PREFIX}_operation_errors_total{{op="{_label(name)}"}} {op.errors}')
+        lines += [f"# HELP {PREFIX}_events_total Event counters", f"# TYPE {PREFIX}_events_total counter"]
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{PREFIX}_events_total{{name="{_label(name)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the Prometheus text atomically (node_exporter textfile collector format)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+registry = Registry(enabled=os.getenv("METRICS", "") not in ("", "0") or bool(os.getenv("METRICS_FILE")))
+
+
+# -------------------
+# Module-level shortcuts
+# -------------------
+def enable():
+    registry.enabled = True
+
+
+def disable():
+    registry.enabled = False
+
+
+def span(name):
+    """with span("firebase.GET"): ... times the block and counts raised exceptions as errors."""
+    return registry.span(name)
+
+
+def count(name, n=1):
+    registry.count(name, n)
+
+
+def observe(name, seconds, error=False):
+    registry.observe(name, seconds, error)
+
+
+def timed(name=None):
+    """Decorator form of span(); name defaults to module.qualname."""
+    def decorate(fn):
+        op_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            op = registry.operation(op_name)
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                op.observe(time.perf_counter() - start, True)
+                raise
+            op.observe(time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def prometheus_text():
+    return registry.prometheus_text()
+
+
+# -------------------
+# Exposition: HTTP endpoint and dump-at-exit
+# -------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def start_http_server(port=9108, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; returns the server (port=0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def dump_at_exit(path):
+    atexit.register(lambda: registry.dump(path))
+
+
+if os.getenv("METRICS_FILE"):
+    dump_at_exit(os.environ["METRICS_FILE"])
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+import streamlit as st
+import metrics
+
+# -------------------
+# CONFIG
+# -------------------
+METRICS_PORT = os.getenv("METRICS_PORT")   # e.g. 9108 to also serve /metrics for Prometheus
+
+
+@st.cache_resource
+def _exporter(port):
+    return metrics.start_http_server(int(port))
+
+
+def enable_metrics():
+    """Turn instrumentation on for this server process (and the /metrics endpoint if configured)."""
+    metrics.enable()
+    if METRICS_PORT:
+        _exporter(METRICS_PORT)
+
+
+def show_metrics_panel():
+    """p50/p99 latency, call rate and error rate per instrumented operation."""
+    st.subheader("📊 Live Performance")
+    rows = metrics.snapshot()
+    if not rows:
+        st.info("No instrumented calls yet.")
+        return
+    df = pd.DataFrame(rows).set_index("operation")
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Operations", len(df))
+    c2.metric("Calls / s (last 60 s)", f"{df['calls_per_s'].sum():.2f}")
+    c3.metric("Errors / s (last 60 s)", f"{df['errors_per_s'].sum():.2f}")
+    st.bar_chart(df[["p50_ms", "p99_ms"]], horizontal=True, stack=False, x_label="latency (ms)")
+    st.dataframe(df[["calls", "calls_per_s", "p50_ms", "p99_ms", "mean_ms", "errors", "error_rate"]])
+    st.download_button("⬇️ Prometheus metrics", metrics.prometheus_text(), file_name="metrics.prom",
+                       mime="text/plain")
@@ -0,0 +1,160 @@
+import struct
+import numpy as np
+from crypto_core import BLOCK_SIZES, get_cipher
+from envelope import to_text, from_text
+from metrics import timed
+
+# -------------------
+# Layout
+# -------------------
+# One holding = 8-byte ASCII asset code + little-endian float64 quantity = 16 bytes,
+# i.e. exactly one AES block (two DES blocks), so a holding encrypts without padding.
+HOLDING = np.dtype([("asset", "S8"), ("qty", "<f8")])
+COUNT = struct.Struct("<H")
+
+
+def asset_code(asset):
+    """Asset symbol as the fixed-width field value (ASCII, at most 8 characters)."""
+    code = asset.encode("ascii")
+    if not 0 < len(code) <= HOLDING["asset"].itemsize:
+        raise ValueError(f"Asset code must be 1-8 ASCII characters: {asset!r}")
+    return code
+
+
+class Portfolio:
+    """Holdings as a NumPy structured array with a fixed-width binary codec."""
+
+    def __init__(self, holdings=None):
+        self.holdings = np.zeros(0, HOLDING) if holdings is None else np.asarray(holdings, HOLDING)
+
+    # ---- conversions ----
+    @classmethod
+    def from_dict(cls, mapping):
+        arr = np.zeros(len(mapping), HOLDING)
+        for i, (asset, qty) in enumerate(mapping.items()):
+            arr[i] = (asset_code(asset), qty)
+        return cls(arr)
+
+    @classmethod
+    def from_string(cls, text):
+        """Parse the legacy "BTC=0.25, ETH=1.5" format."""
+        pairs = (item.split("=") for item in text.split(",") if item.strip())
+        return cls.from_dict({asset.strip(): float(qty) for asset, qty in pairs})
+
+    def to_dict(self):
+        return {a.decode("ascii"): float(q) for a, q in zip(self.holdings["asset"], self.holdings["qty"])}
+
+    def to_string(self):
+        return ", ".join(f"{a}={q:g}" for a, q in self.to_dict().items())
+
+    # ---- access ----
+    def __len__(self):
+        return len(self.holdings)
+
+    def _index(self, asset):
+        hits = np.flatnonzero(self.holdings["asset"] == asset_code(asset))
+        return int(hits[0]) if len(hits) else None
+
+    def get(self, asset, default=0.0):
+        i = self._index(asset)
+        return default if i is None else float(self.holdings["qty"][i])
+
+    def set(self, asset, qty):
+        i = self._index(asset)
+        if i is None:
+            self.holdings = np.append(self.holdings, np.array([(asset_code(asset), qty)], HOLDING))
+        else:
+            self.holdings["qty"][i] = qty
+
+    # ---- binary codec ----
+    def encode(self):
+        """uint16 count followed by count 16-byte holding records."""
+        return COUNT.pack(len(self.holdings)) + self.holdings.tobytes()
+
+    @classmethod
+    def decode(cls, buf):
+        (count,) = COUNT.unpack_from(buf)
+        return cls(np.frombuffer(buf, HOLDING, count, COUNT.size).copy())
+
+
+def decode_many(buffers):
+    """Decode many encoded portfolios into one holdings array plus an owner index array."""
+    parts, owners = [], []
+    for i, buf in enumerate(buffers):
+        (count,) = COUNT.unpack_from(buf)
+        parts.append(np.frombuffer(buf, HOLDING, count, COUNT.size))
+        owners.append(np.full(count, i, dtype=np.int32))
+    if not parts:
+        return np.zeros(0, HOLDING), np.zeros(0, np.int32)
+    return np.concatenate(parts), np.concatenate(owners)
+
+
+# -------------------
+# Field-level encryption: one ciphertext per holding
+# -------------------
+def _check_layout(algorithm):
+    if HOLDING.itemsize % BLOCK_SIZES[algorithm]:
+        raise ValueError(f"{algorithm} block size does not divide the holding record")
+
+
+def encrypt_holding(algorithm, key, asset, qty):
+    """Encrypt one holding record; the asset code is inside the ciphertext too, so a
+    value copied to another asset's slot is detected on decrypt."""
+    _check_layout(algorithm)
+    record = np.array([(asset_code(asset), qty)], HOLDING).tobytes()
+    return to_text(get_cipher(algorithm, key).encrypt(record))
+
+
+def decrypt_holding(algorithm, key, asset, text):
+    rec = np.frombuffer(get_cipher(algorithm, key).decrypt(from_text(text)), HOLDING)[0]
+    if rec["asset"] != asset_code(asset):
+        raise ValueError(f"Holding ciphertext for {asset} does not belong to that asset")
+    return float(rec["qty"])
+
+
+def encrypt_holdings(algorithm, key, portfolio):
+    """{asset: ciphertext text} so each asset can be PATCHed on its own."""
+    _check_layout(algorithm)
+    blocks = get_cipher(algorithm, key).encrypt(portfolio.holdings.tobytes())
+    size = HOLDING.itemsize
+    return {asset.decode("ascii"): to_text(blocks[i * size:(i + 1) * size])
+            for i, asset in enumerate(portfolio.holdings["asset"])}
+
+
+def decrypt_holdings(algorithm, key, fields):
+    """Decrypt a {asset: ciphertext} map with a single cipher call."""
+    return Portfolio(decrypt_many(algorithm, key, [fields])[0])
+
+
+@timed("portfolio.decrypt_many")
+def decrypt_many(algorithm, key, field_maps):
+    """Bulk-decrypt many users' {asset: ciphertext} maps.
+
+    All holdings are joined and decrypted in one call and land directly in a
+    HOLDING array; returns (holdings, owner index per row). key is one key for
+    everyone or a sequence with one key per field map (per-user keys); then each
+    user's holdings are decrypted in one call, without filling the shared
+    cipher cache with keys used once.
+    """
+    _check_layout(algorithm)
+    keys = None if isinstance(key, (bytes, bytearray)) else list(key)
+    chunks, owners, expected, spans = [], [], [], []
+    for i, fields in enumerate(field_maps):
+        start = len(chunks)
+        for asset, text in fields.items():
+            chunks.append(from_text(text))
+            owners.append(i)
+            expected.append(asset_code(asset))
+        if len(chunks) > start:
+            spans.append((i, start, len(chunks)))
+    if not chunks:
+        return np.zeros(0, HOLDING), np.zeros(0, np.int32)
+    if keys is None:
+        plain = get_cipher(algorithm, key).decrypt(b"".join(chunks))
+    else:
+        plain = b"".join(get_cipher(algorithm, keys[i], None).decrypt(b"".join(chunks[lo:hi]))
+                         for i, lo, hi in spans)
+    holdings = np.frombuffer(plain, HOLDING).copy()
+    if not np.array_equal(holdings["asset"], np.array(expected, dtype="S8")):
+        raise ValueError("Holding ciphertext does not match its asset key")
+    return holdings, np.asarray(owners, dtype=np.int32)
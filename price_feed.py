@@ -0,0 +1,145 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+import pytz
+import yfinance as yf
+import metrics
+
+# -------------------
+# CONFIG
+# -------------------
+MARKET_TZ = "Asia/Kolkata"    # NSE tickers (*.NS)
+MIN_INTERVAL = 5              # seconds between network refreshes
+INTERVAL = "1m"
+PREV_CLOSE_RETRY = 60         # seconds between retries for tickers still missing prev_close
+
+
+def _ticker_frame(frame, ticker, tickers):
+    """Slice one ticker's OHLC columns out of a yf.download result."""
+    if frame is None or frame.empty:
+        return None
+    if isinstance(frame.columns, pd.MultiIndex):
+        if ticker not in frame.columns.get_level_values(0):
+            return None
+        sub = frame[ticker]
+    elif len(tickers) == 1:
+        sub = frame
+    else:
+        return None
+    sub = sub.dropna(subset=["Close"])
+    return None if sub.empty else sub
+
+
+class PriceFeed:
+    """Batched, incremental intraday prices for a fixed set of tickers.
+
+    Every refresh is one yf.download call for all tickers. After the first
+    refresh it only asks for bars starting at the last bar already seen (that
+    bar is still forming, so it is re-read and overwritten). prev_close is
+    downloaded once per trading day; tickers it could not be found for are
+    retried on their own every PREV_CLOSE_RETRY seconds.
+    """
+
+    def __init__(self, tickers, market_tz=MARKET_TZ, min_interval=MIN_INTERVAL):
+        self.tickers = list(tickers)
+        self.tz = pytz.timezone(market_tz)
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._day = None
+        self._last_refresh = 0.0
+        self._prev_close_at = None               # monotonic time of the last prev_close download
+        self._last_ts = None                     # newest bar timestamp across tickers
+        self.latest = {}                         # ticker -> last close
+        self.open = {}                           # ticker -> first open of the day
+        self.prev_close = {}                     # ticker -> previous session close
+        self.bar_times = {}                      # ticker -> timestamp of its newest bar
+
+    def _download(self, tickers=None, **kwargs):
+        with metrics.span("prices.download"):
+            return yf.download(tickers or self.tickers, interval=kwargs.pop("interval", INTERVAL),
+                               group_by="ticker", progress=False, threads=True, auto_adjust=False, **kwargs)
+
+    def _load_prev_close(self, tickers):
+        self._prev_close_at = time.monotonic()
+        daily = self._download(tickers, period="5d", interval="1d")
+        today = datetime.now(self.tz).date()
+        for t in tickers:
+            sub = _ticker_frame(daily, t, tickers)
+            if sub is None:
+                continue
+            dates = [ts.date() for ts in sub.index]
+            earlier = [i for i, d in enumerate(dates) if d < today]
+            if earlier:
+                self.prev_close[t] = float(sub["Close"].iloc[earlier[-1]])
+            elif len(sub) > 1:
+                self.prev_close[t] = float(sub["Close"].iloc[-2])
+
+    def _start_day(self, day):
+        self._day = day
+        self._last_ts = None
+        self.latest.clear()
+        self.open.clear()
+        self.bar_times.clear()
+        self.prev_close.clear()
+        self._prev_close_at = None
+
+    def refresh(self, force=False):
+        """Pull new bars if min_interval has passed.
+
+        Returns {ticker: [(timestamp, close), ...]} for bars that are new or were
+        updated by this call.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.min_interval:
+                return {}
+            self._last_refresh = now
+
+            day = datetime.now(self.tz).date()
+            if day != self._day:
+                self._start_day(day)
+
+            missing = [t for t in self.tickers if t not in self.prev_close]
+            if missing and (self._prev_close_at is None or now - self._prev_close_at >= PREV_CLOSE_RETRY):
+                try:   # once per trading day, then only the tickers that are still missing
+                    self._load_prev_close(missing)
+                except Exception:
+                    pass
+            try:
+                if self._last_ts is None:
+                    frame = self._download(period="1d")
+                else:
+                    # yfinance's start is inclusive; re-read the still-forming bar
+                    frame = self._download(start=self._last_ts.to_pydatetime(),
+                                           end=datetime.now(self.tz) + timedelta(minutes=1))
+            except Exception:
+                return {}
+
+            updates = {}
+            for t in self.tickers:
+                sub = _ticker_frame(frame, t, self.tickers)
+                if sub is None:
+                    continue
+                seen = self.bar_times.get(t)
+                if seen is not None:
+                    sub = sub[sub.index >= seen]
+                    if sub.empty:
+                        continue
+                if t not in self.open:
+                    self.open[t] = float(sub["Open"].iloc[0])
+                self.latest[t] = float(sub["Close"].iloc[-1])
+                self.bar_times[t] = sub.index[-1]
+                updates[t] = list(zip(sub.index, sub["Close"].astype(float)))
+            if self.bar_times:
+                self._last_ts = min(self.bar_times.values())
+            return updates
+
+    def quote(self, ticker):
+        """(latest_price, open_price, prev_close) — same shape fetch_stock_price returned."""
+        if ticker not in self.latest or ticker not in self.prev_close:
+            return None, None, None
+        return self.latest[ticker], self.open.get(ticker), self.prev_close.get(ticker)
+
+    def quotes(self):
+        return {t: self.quote(t) for t in self.tickers}
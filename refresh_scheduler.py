@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import namedtuple
+
+Snapshot = namedtuple("Snapshot", "value updated_at error")
+
+
+class SharedState:
+    """Latest value per data source, shared by every viewer session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def publish(self, name, value):
+        """Store a source's new value; returns True if it differs from the previous one."""
+        with self._lock:
+            old = self._data.get(name)
+            self._data[name] = Snapshot(value, time.time(), None)
+            return old is None or old.value != value
+
+    def fail(self, name, error):
+        """Record a failed poll; the last good value stays visible."""
+        with self._lock:
+            old = self._data.get(name)
+            self._data[name] = Snapshot(old.value if old else None, old.updated_at if old else None, error)
+
+    def get(self, name):
+        return self._data.get(name) or Snapshot(None, None, None)
+
+
+class Poller(threading.Thread):
+    """Background thread that runs fn every interval seconds and publishes the result.
+
+    on_change, if given, is called with the new value only when it differs from the last one.
+    """
+
+    def __init__(self, name, fn, interval, state, on_change=None):
+        super().__init__(name=f"poller-{name}", daemon=True)
+        self.source = name
+        self.fn = fn
+        self.interval = interval
+        self.state = state
+        self.on_change = on_change
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            started = time.monotonic()
+            try:
+                value = self.fn()
+                if self.state.publish(self.source, value) and self.on_change:
+                    self.on_change(value)
+            except Exception as e:
+                self.state.fail(self.source, e)
+            self._halt.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self._halt.set()
+
+
+class RefreshScheduler:
+    """One poller per data source, each with its own cadence, all publishing
+    into the same SharedState."""
+
+    def __init__(self):
+        self.state = SharedState()
+        self.pollers = {}
+
+    def every(self, interval, name, fn, on_change=None):
+        self.pollers[name] = Poller(name, fn, interval, self.state, on_change)
+        return self
+
+    def start(self):
+        for poller in self.pollers.values():
+            if not poller.is_alive():
+                poller.start()
+        return self
+
+    def stop(self):
+        for poller in self.pollers.values():
+            poller.stop()
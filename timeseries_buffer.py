@@ -0,0 +1,97 @@
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+# -------------------
+# CONFIG
+# -------------------
+CAPACITY = 3600               # one hour of 1 Hz ticks
+
+
+class TimeSeriesBuffer:
+    """Fixed-capacity ring buffer of aligned (timestamp, price per series) rows.
+
+    Storage is preallocated NumPy arrays, so memory stays constant however long
+    a session runs. Each row is written twice, at i and at i + capacity. That way
+    the newest `capacity` rows always form one contiguous slice, and timestamps()
+    and values() can return views without copying.
+
+    The views are only safe on the thread that appends. When a background
+    poller appends, other threads use window(), which holds the buffer's lock
+    while they read the views, or snapshot()/to_frame(), which copy.
+    """
+
+    def __init__(self, names, capacity=CAPACITY):
+        self.names = list(names)
+        self.capacity = capacity
+        self._ts = np.zeros(2 * capacity, dtype="datetime64[ns]")
+        self._values = np.full((2 * capacity, len(self.names)), np.nan, dtype=np.float64)
+        self._next = 0            # slot for the next row, in [0, capacity)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, values):
+        """Add one row; values is a sequence (ordered like names) or a {name: value} dict."""
+        if isinstance(values, dict):
+            values = [values.get(n, np.nan) for n in self.names]
+        ts = pd.Timestamp(timestamp)
+        if ts.tzinfo is not None:
+            ts = ts.tz_localize(None)   # keep wall-clock time, like pd.Timestamp.now()
+        with self._lock:
+            i = self._next
+            self._ts[i] = self._ts[i + self.capacity] = ts.to_datetime64()
+            self._values[i] = self._values[i + self.capacity] = values
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _window(self):
+        end = self._next if self._size < self.capacity else self._next + self.capacity
+        return slice(end - self._size, end)
+
+    def timestamps(self):
+        """Read-only view of timestamps, oldest first."""
+        view = self._ts[self._window()]
+        view.flags.writeable = False
+        return view
+
+    def values(self):
+        """Read-only (rows, series) view of prices, oldest first."""
+        view = self._values[self._window()]
+        view.flags.writeable = False
+        return view
+
+    @contextmanager
+    def window(self):
+        """(timestamps, values) views, kept stable by holding the lock until the block exits.
+
+        For readers that copy the data anyway (e.g. chart serialization); keep the block short,
+        since append() waits on it.
+        """
+        with self._lock:
+            yield self.timestamps(), self.values()
+
+    def snapshot(self):
+        """(timestamps, values) copies of the window, consistent with each other."""
+        with self._lock:
+            window = self._window()
+            return self._ts[window].copy(), self._values[window].copy()
+
+    def latest(self):
+        with self._lock:
+            if not self._size:
+                return None
+            i = (self._next - 1) % self.capacity
+            return {n: float(v) for n, v in zip(self.names, self._values[i])}
+
+    def to_frame(self):
+        """DataFrame of a snapshot for st.line_chart; safe while another thread appends."""
+        timestamps, values = self.snapshot()
+        return pd.DataFrame(values, index=pd.DatetimeIndex(timestamps), columns=self.names, copy=False)
+
+    def clear(self):
+        with self._lock:
+            self._next = self._size = 0
@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from firebase_client import FIREBASE_URL, PAGE_SIZE, get_client
+from firebase_async import CONCURRENCY, fetch_paths
+
+# -------------------
+# CONFIG
+# -------------------
+RECORD_CACHE_SIZE = 2_000      # user records kept in memory
+RECORD_TTL = 60                # seconds before a cached record is re-fetched
+KEYS_TTL = 300                 # seconds before the uid listing is refreshed
+
+
+class UserDirectory:
+    """Lazily loaded, page-at-a-time view of the users tree for dashboards.
+
+    The uid list comes from one shallow GET (keys only). Records are fetched a
+    page at a time with concurrent GETs, kept in an LRU cache with a TTL, and
+    the next page is prefetched in the background, so paging and switching
+    users are normally served from memory.
+    """
+
+    def __init__(self, base_url=FIREBASE_URL, root="users", page_size=PAGE_SIZE,
+                 cache_size=RECORD_CACHE_SIZE, ttl=RECORD_TTL, concurrency=CONCURRENCY):
+        self.base_url = base_url
+        self.root = root
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.client = get_client(base_url)
+        self._uids = None
+        self._uids_at = 0.0
+        self._records = OrderedDict()          # uid -> (record, fetched_at)
+        self._lock = threading.Lock()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-prefetch")
+
+    # ---- listing ----
+    def uids(self, refresh=False):
+        if refresh or self._uids is None or time.monotonic() - self._uids_at > KEYS_TTL:
+            self._uids = self.client.shallow(self.root)
+            self._uids_at = time.monotonic()
+        return self._uids
+
+    def __len__(self):
+        return len(self.uids())
+
+    def page_count(self):
+        return max(1, -(-len(self) // self.page_size))
+
+    def page_uids(self, n):
+        return self.uids()[n * self.page_size:(n + 1) * self.page_size]
+
+    def search(self, prefix, limit=PAGE_SIZE):
+        """uids starting with prefix (binary search over the sorted listing)."""
+        uids = self.uids()
+        start = bisect.bisect_left(uids, prefix)
+        out = []
+        for uid in uids[start:]:
+            if not uid.startswith(prefix) or len(out) >= limit:
+                break
+            out.append(uid)
+        return out
+
+    # ---- records ----
+    def _cached(self, uid):
+        with self._lock:
+            entry = self._records.get(uid)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                return None
+            self._records.move_to_end(uid)
+            return entry
+
+    def _store(self, records):
+        now = time.monotonic()
+        with self._lock:
+            for uid, record in records.items():
+                self._records[uid] = (record, now)
+                self._records.move_to_end(uid)
+            while len(self._records) > self.cache_size:
+                self._records.popitem(last=False)
+
+    def fetch(self, uids):
+        """{uid: record} for uids, fetching only the missing or stale ones (concurrently)."""
+        found, missing = {}, []
+        for uid in uids:
+            entry = self._cached(uid)
+            if entry is None:
+                missing.append(uid)
+            else:
+                found[uid] = entry[0]
+        if missing:
+            results = fetch_paths([f"{self.root}/{uid}" for uid in missing], self.base_url, self.concurrency)
+            fetched = {uid: results[f"{self.root}/{uid}"] for uid in missing}
+            ok = {uid: rec for uid, rec in fetched.items() if not isinstance(rec, Exception)}
+            self._store(ok)
+            found.update(fetched)
+        return {uid: found[uid] for uid in uids}
+
+    def get(self, uid):
+        record = self.fetch([uid])[uid]
+        if isinstance(record, Exception):
+            raise record
+        return record
+
+    def page(self, n, prefetch=True):
+        """Records for page n; the following page is fetched in the background."""
+        records = self.fetch(self.page_uids(n))
+        if prefetch and n + 1 < self.page_count():
+            self.prefetch(self.page_uids(n + 1))
+        return records
+
+    def prefetch(self, uids):
+        """Fetch uids into the record cache in the background."""
+        self._prefetcher.submit(self.fetch, uids)
+
+    def invalidate(self, uid=None):
+        with self._lock:
+            if uid is None:
+                self._records.clear()
+            else:
+                self._records.pop(uid, None)
+
+    # ---- aggregates ----
+    def benchmarks(self, field="benchmark", batch=1000):
+        """[(uid, {AES_ms, DES_ms, ...})] for every user, reading only that field of each
+        (concurrent small GETs, batch uids at a time)."""
+        rows = []
+        uids = self.uids()
+        for i in range(0, len(uids), batch):
+            paths = {f"{self.root}/{uid}/{field}": uid for uid in uids[i:i + batch]}
+            for path, value in fetch_paths(list(paths), self.base_url, self.concurrency).items():
+                if isinstance(value, dict):
+                    rows.append((paths[path], value))
+        return rows
+
+    def stats(self):
+        return {"users": len(self._uids or ()), "cached_records": len(self._records)}
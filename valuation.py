@@ -0,0 +1,139 @@
+import argparse
+import json
+import time
+import numpy as np
+from portfolio_codec import HOLDING, Portfolio, decrypt_many, encrypt_holdings
+
+# -------------------
+# CONFIG
+# -------------------
+DB_FILE = "POC_Database.json"
+
+
+def prices_from_tree(tree):
+    """{asset: price_usd} from a database export's public/prices node."""
+    prices = (tree.get("public") or {}).get("prices") or {}
+    return {asset: float(node["price_usd"]) for asset, node in prices.items() if "price_usd" in node}
+
+
+class ValuationEngine:
+    """Vectorized portfolio valuation for many users against one price table.
+
+    Holdings live in a dense (users x assets) float64 matrix, so a full
+    revaluation is one matrix-vector product. A single price tick only adds
+    qty[:, j] * (new - old) to the value vector.
+    """
+
+    def __init__(self, prices):
+        self.assets = sorted(prices)
+        self.asset_index = {a: j for j, a in enumerate(self.assets)}
+        self.prices = np.array([prices[a] for a in self.assets], dtype=np.float64)
+        self.uids = []
+        self.user_index = {}
+        self.quantities = np.zeros((0, len(self.assets)))
+        self.values = np.zeros(0)
+        self.unpriced = set()        # assets held but missing from the price table
+
+    # ---- loading ----
+    def load_holdings(self, uids, holdings, owners):
+        """Load a HOLDING array with an owner index (positions into uids)."""
+        self.uids = list(uids)
+        self.user_index = {u: i for i, u in enumerate(self.uids)}
+        codes = np.array([a.encode("ascii") for a in self.assets], dtype=HOLDING["asset"])
+        if len(codes):
+            cols = np.minimum(np.searchsorted(codes, holdings["asset"]), len(codes) - 1)
+            known = codes[cols] == holdings["asset"]
+        else:
+            cols = np.zeros(len(holdings), dtype=np.intp)
+            known = np.zeros(len(holdings), dtype=bool)
+        self.unpriced = {a.decode("ascii") for a in np.unique(holdings["asset"][~known])}
+        self.quantities = np.zeros((len(self.uids), len(self.assets)))
+        np.add.at(self.quantities, (owners[known], cols[known]), holdings["qty"][known])
+        self.revalue()
+        return self
+
+    def load_encrypted(self, users, algorithm, key):
+        """Decrypt {uid: {asset: ciphertext}} for every user in one bulk call and load it.
+
+        key is one key for every user or a uid -> key callable; KeyStore.keyring()
+        gives (key, version) pairs and the key is taken from each.
+        """
+        uids = list(users)
+        if callable(key):
+            key = [k[0] if isinstance(k, tuple) else k for k in map(key, uids)]
+        holdings, owners = decrypt_many(algorithm, key, (users[u] for u in uids))
+        return self.load_holdings(uids, holdings, owners)
+
+    # ---- valuation ----
+    def revalue(self):
+        self.values = self.quantities @ self.prices
+        return self.values
+
+    def update_price(self, asset, price):
+        """Apply one price tick incrementally (O(users) instead of O(users x assets))."""
+        j = self.asset_index[asset]
+        delta = price - self.prices[j]
+        if delta:
+            self.values += self.quantities[:, j] * delta
+            self.prices[j] = price
+        return self.values
+
+    def update_holding(self, uid, asset, qty):
+        i, j = self.user_index[uid], self.asset_index[asset]
+        self.values[i] += (qty - self.quantities[i, j]) * self.prices[j]
+        self.quantities[i, j] = qty
+
+    def value(self, uid):
+        return float(self.values[self.user_index[uid]])
+
+    def snapshot(self):
+        """{uid: portfolio value in USD}."""
+        return dict(zip(self.uids, self.values.tolist()))
+
+    def total(self):
+        return float(self.values.sum())
+
+    def top(self, n=10):
+        order = np.argsort(self.values)[::-1][:n]
+        return [(self.uids[i], float(self.values[i])) for i in order]
+
+
+# -------------------
+# MAIN: synthetic timing run
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized portfolio valuation benchmark")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--db", default=DB_FILE, help="export whose public/prices is used")
+    args = parser.parse_args(argv)
+
+    with open(args.db) as f:
+        prices = prices_from_tree(json.load(f))
+    key = b"1234567890abcdef"
+    rng = np.random.default_rng(0)
+    users = {}
+    for i in range(args.users):
+        p = Portfolio.from_dict({a: float(rng.uniform(0, 5)) for a in prices})
+        users[f"UID{i:08d}"] = encrypt_holdings("AES", key, p)
+
+    engine = ValuationEngine(prices)
+    start = time.perf_counter()
+    engine.load_encrypted(users, "AES", key)
+    load_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    engine.revalue()
+    full_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    engine.update_price("BTC", prices["BTC"] * 1.01)
+    tick_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({
+        "users": args.users,
+        "decrypt_and_load_ms": round(load_ms, 2),
+        "full_revalue_ms": round(full_ms, 3),
+        "single_tick_ms": round(tick_ms, 3),
+        "total_usd": round(engine.total(), 2),
+    }))
+
+
+if __name__ == "__main__":
+    main()
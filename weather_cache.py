@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+import metrics
+
+# -------------------
+# CONFIG
+# -------------------
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+TTL = 600                     # OpenWeatherMap updates roughly every 10 minutes
+TIMEOUT = 5
+MAX_WORKERS = 8
+EMPTY = (None, None, None)
+
+
+def fetch_weather(city, api_key, session=requests):
+    """Return (temp, description, icon) for city, or (None, None, None) on failure."""
+    with metrics.span("weather.fetch") as span:
+        try:
+            params = {"q": city, "appid": api_key, "units": "metric"}
+            res = session.get(WEATHER_URL, params=params, timeout=TIMEOUT)
+            data = res.json()
+            if res.status_code != 200:
+                span.fail()
+                return EMPTY
+            temp = data["main"]["temp"]
+            desc = data["weather"][0]["description"].title()
+            icon = data["weather"][0]["icon"]
+            return temp, desc, icon
+        except Exception:
+            span.fail()
+            return EMPTY
+
+
+class WeatherCache:
+    """In-memory weather cache with a refresh schedule per city.
+
+    get()/get_all() never touch the network: they return the cached value and
+    queue a background refresh for any city whose entry is due. All due cities
+    are fetched in parallel, and a failed fetch keeps the last good value.
+    """
+
+    def __init__(self, api_key, cities, ttl=TTL, intervals=None, max_workers=MAX_WORKERS):
+        self.api_key = api_key
+        self.cities = list(cities)
+        self.ttl = ttl
+        self.intervals = dict(intervals or {})   # per-city override of ttl, in seconds
+        self._session = requests.Session()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather")
+        self._lock = threading.Lock()
+        self._entries = {}                       # city -> (value, fetched_at)
+        self._inflight = {}                      # city -> Future
+
+    def interval(self, city):
+        return self.intervals.get(city, self.ttl)
+
+    def is_due(self, city, now=None):
+        entry = self._entries.get(city)
+        return entry is None or (now or time.monotonic()) - entry[1] >= self.interval(city)
+
+    def _fetch(self, city):
+        value = fetch_weather(city, self.api_key, self._session)
+        with self._lock:
+            old = self._entries.get(city)
+            if value != EMPTY or old is None:
+                self._entries[city] = (value, time.monotonic())
+            else:
+                # keep serving the last good value, retry after a short back-off
+                self._entries[city] = (old[0], time.monotonic() - self.interval(city) + 30)
+            self._inflight.pop(city, None)
+        return value
+
+    def refresh(self, cities=None, force=False):
+        """Queue parallel fetches for due (or all, if force) cities; returns the futures."""
+        now = time.monotonic()
+        futures = []
+        with self._lock:
+            for city in cities or self.cities:
+                if city in self._inflight:
+                    futures.append(self._inflight[city])
+                elif force or self.is_due(city, now):
+                    self._inflight[city] = self._pool.submit(self._fetch, city)
+                    futures.append(self._inflight[city])
+        return futures
+
+    def prime(self, timeout=TIMEOUT + 1):
+        """Blocking first fill: fetch every missing city in parallel, waiting at most timeout."""
+        wait(self.refresh([c for c in self.cities if c not in self._entries]), timeout=timeout)
+
+    def get(self, city):
+        self.refresh([city])
+        entry = self._entries.get(city)
+        return entry[0] if entry else EMPTY
+
+    def get_all(self):
+        self.refresh()
+        return {city: (self._entries[city][0] if city in self._entries else EMPTY) for city in self.cities}
+
+    def age(self, city):
+        """Seconds since the cached value was fetched, or None."""
+        entry = self._entries.get(city)
+        return None if entry is None else time.monotonic() - entry[1]